@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import Any, Callable, List
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item requests into one batched model call.
+
+    Requests are queued; a single worker takes the first waiting item, then
+    keeps collecting until it has max_batch_size items or max_wait_ms has
+    passed, runs fn(items) once in a worker thread and resolves each
+    request's future with its own output. While a batch is running, new
+    requests pile up in the queue, so batch size grows with load.
+    """
+
+    def __init__(self, name: str, fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.name = name
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._task = None
+        self._inflight = []  # batch being computed, failed by stop()
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.errors = 0
+        self.queue_wait_total = 0.0
+        self.compute_total = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail every queued or in-flight request."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        error = RuntimeError(f"{self.name} batcher stopped")
+        pending = [future for _, future, _ in self._inflight]
+        self._inflight = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait()[1])
+        for future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        if self._task is None:
+            raise RuntimeError(f"{self.name} batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        # Tracked while collecting too, so stop() can fail items already dequeued
+        batch = self._inflight = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Skip requests whose caller already went away
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            self._inflight = batch
+            started = time.perf_counter()
+            self.queue_wait_total += sum(started - queued for _, _, queued in batch)
+            try:
+                outputs = await loop.run_in_executor(None, self.fn, [item for item, _, _ in batch])
+                for (_, future, _), output in zip(batch, outputs):
+                    if not future.done():
+                        future.set_result(output)
+            except Exception as e:
+                self.errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self._inflight = []
+
+            self.compute_total += time.perf_counter() - started
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "avg_queue_wait_ms": self.queue_wait_total / self.items * 1000.0 if self.items else 0.0,
+            "avg_batch_compute_ms": self.compute_total / self.batches * 1000.0 if self.batches else 0.0,
+        }
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+KEY_BYTES = 20  # sha1 digest
+# Rough per-entry bookkeeping cost on top of the vector itself
+ENTRY_OVERHEAD_BYTES = 200
+
+class DiskTier:
+    """
+    Fixed-capacity ring of embeddings in memory-mapped files, so the cache
+    survives restarts. keys.bin holds one digest per row, vectors.f32 the
+    float32 rows; meta.json records the shape and the next row to write.
+    A larger capacity grows the files and keeps the rows; a different dim
+    or a smaller capacity starts over.
+    """
+
+    def __init__(self, path: str, dim: int, capacity: int, flush_every: int = 256):
+        self.path = path
+        self.dim = dim
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self._pending = 0
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, "meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        keys_path = os.path.join(path, "keys.bin")
+        vectors_path = os.path.join(path, "vectors.f32")
+        old_capacity = meta.get("capacity")
+        fresh = (meta.get("dim") != dim or old_capacity is None or old_capacity > capacity
+                 or not os.path.exists(keys_path) or not os.path.exists(vectors_path))
+        if not fresh and old_capacity < capacity:
+            os.truncate(keys_path, capacity * KEY_BYTES)
+            os.truncate(vectors_path, capacity * dim * 4)
+        mode = "w+" if fresh else "r+"
+
+        self.keys = np.memmap(keys_path, dtype=np.uint8, mode=mode, shape=(capacity, KEY_BYTES))
+        self.vectors = np.memmap(vectors_path, dtype="<f4", mode=mode, shape=(capacity, dim))
+        self.cursor = 0 if fresh else meta.get("cursor", 0)
+
+        self.index = {}
+        if not fresh:
+            for row in np.flatnonzero(self.keys.any(axis=1)):
+                self.index[self.keys[row].tobytes()] = int(row)
+            if old_capacity < capacity and len(self.index) == old_capacity:
+                # The old ring was full: fill the new rows before overwriting any
+                self.cursor = old_capacity
+        if fresh or old_capacity != capacity:
+            self.flush()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self.index.get(key)
+        if row is None:
+            return None
+        return np.array(self.vectors[row])
+
+    def put(self, key: bytes, vector: np.ndarray):
+        if key in self.index:
+            return
+        row = self.cursor
+        # Overwrite the oldest row once the ring is full
+        old_key = self.keys[row].tobytes()
+        if self.index.get(old_key) == row:
+            del self.index[old_key]
+        self.keys[row] = np.frombuffer(key, dtype=np.uint8)
+        self.vectors[row] = vector
+        self.index[key] = row
+        self.cursor = (row + 1) % self.capacity
+
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.keys.flush()
+        self.vectors.flush()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity, "cursor": self.cursor}, f)
+        self._pending = 0
+
+class EmbeddingCache:
+    """
+    Content-hash keyed cache in front of the sentence encoder.
+
+    Keys are sha1(model name + text), so a model change never serves stale
+    vectors. The in-memory tier is an LRU bounded by max_bytes; the optional
+    disk tier is a DiskTier. Only texts missing from both are encoded, in a
+    single batch.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], model_name: str, dim: int,
+                 max_bytes: int, disk_path: Optional[str] = None, disk_capacity: int = 100_000):
+        self.encode_fn = encode_fn
+        self.model_name = model_name
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.entry_bytes = dim * 4 + ENTRY_OVERHEAD_BYTES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskTier(disk_path, dim, disk_capacity) if disk_path else None
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        # Caller holds the lock
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) * self.entry_bytes > self.max_bytes and self._entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings for texts as an (n x dim) float32 matrix."""
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing = {}  # key -> (text, [row indices])
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = self.key(text)
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                elif self.disk is not None and (vector := self.disk.get(key)) is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                if vector is not None:
+                    out[i] = vector
+                else:
+                    missing.setdefault(key, (text, []))[1].append(i)
+
+        if missing:
+            keys = list(missing)
+            vectors = np.asarray(self.encode_fn([missing[k][0] for k in keys]), dtype=np.float32)
+            if vectors.shape != (len(keys), self.dim):
+                raise ValueError(f"Encoder returned shape {vectors.shape}, expected ({len(keys)}, {self.dim})")
+            with self._lock:
+                self.misses += len(keys)
+                for key, vector in zip(keys, vectors):
+                    out[missing[key][1]] = vector
+                    self._remember(key, vector)
+                    if self.disk is not None:
+                        self.disk.put(key, vector)
+        return out
+
+    def flush(self):
+        if self.disk is not None:
+            with self._lock:
+                self.disk.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": len(self._entries) * self.entry_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_entries": len(self.disk.index) if self.disk is not None else 0,
+        }
@@ -1,14 +1,22 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from sentence_transformers import SentenceTransformer, util
 from transformers import pipeline
 import torch
+import numpy as np
+import asyncio
+import base64
+import os
+from batching import MicroBatcher
+from embedding_cache import EmbeddingCache
 
 app = FastAPI(title="AI Duplicate Detection Service")
 
 # Load models at startup
-model = SentenceTransformer('all-MiniLM-L6-v2')
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+model = SentenceTransformer(EMBEDDING_MODEL)
+EMBEDDING_DIM = model.get_sentence_embedding_dimension()
 
 # Zero-shot classifier for category prediction (no training needed!)
 try:
@@ -19,18 +27,120 @@ except Exception as e:
     category_classifier = None
     CATEGORIES = []
 
+HYPOTHESIS_TEMPLATE = "This example is {}."
+SEVERITY_LABELS = ["critical", "high", "medium", "low"]
+URGENCY_LABELS = ["urgent", "critical", "dangerous", "emergency", "not urgent"]
+
+def zero_shot_batch(items: list) -> list:
+    """
+    Score several candidate label sets against each premise.
+
+    items is a list of (text, {name: labels}). Equivalent to calling the
+    zero-shot pipeline once per text and label set, but all
+    (premise, hypothesis) pairs are tokenized together and scored in a
+    single NLI forward pass. Returns one {name: {"labels", "scores"}} dict
+    per item, sorted by score like the pipeline output.
+    """
+    premises, hypotheses, spans = [], [], []
+    for text, label_sets in items:
+        item_spans = {}
+        for name, labels in label_sets.items():
+            start = len(hypotheses)
+            for label in labels:
+                premises.append(text)
+                hypotheses.append(HYPOTHESIS_TEMPLATE.format(label))
+            item_spans[name] = (start, len(hypotheses))
+        spans.append(item_spans)
+
+    inputs = category_classifier.tokenizer(
+        premises, hypotheses,
+        padding=True, truncation="only_first", return_tensors="pt"
+    ).to(category_classifier.device)
+    with torch.no_grad():
+        logits = category_classifier.model(**inputs).logits
+    entail_logits = logits[:, category_classifier.entailment_id]
+
+    outputs = []
+    for (_, label_sets), item_spans in zip(items, spans):
+        results = {}
+        for name, (start, end) in item_spans.items():
+            scores = torch.softmax(entail_logits[start:end], dim=0).tolist()
+            ranked = sorted(zip(label_sets[name], scores), key=lambda x: x[1], reverse=True)
+            results[name] = {
+                "labels": [label for label, _ in ranked],
+                "scores": [score for _, score in ranked],
+            }
+        outputs.append(results)
+    return outputs
+
+# Repeated texts (e.g. the same nearby candidates in every duplicate check)
+# are served from a content-hash keyed cache instead of being re-encoded
+EMBED_CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", 64))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR")  # enables the on-disk tier
+EMBED_CACHE_DISK_ENTRIES = int(os.getenv("EMBED_CACHE_DISK_ENTRIES", 200_000))
+
+embedding_cache = EmbeddingCache(
+    lambda texts: model.encode(texts, batch_size=len(texts), convert_to_numpy=True),
+    EMBEDDING_MODEL,
+    EMBEDDING_DIM,
+    max_bytes=int(EMBED_CACHE_MAX_MB * 1024 * 1024),
+    disk_path=EMBED_CACHE_DIR,
+    disk_capacity=EMBED_CACHE_DISK_ENTRIES,
+)
+
+def encode_batch(texts: list) -> list:
+    return list(embedding_cache.encode(texts))
+
+# Concurrent requests are coalesced into batched forward passes
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 5.0))
+
+embed_batcher = MicroBatcher("embed", encode_batch, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+nli_batcher = MicroBatcher("nli", zero_shot_batch, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+
+async def zero_shot(text: str, label_sets: dict) -> dict:
+    return await nli_batcher.submit((text, label_sets))
+
+@app.on_event("startup")
+async def startup():
+    await embed_batcher.start()
+    await nli_batcher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await embed_batcher.stop()
+    await nli_batcher.stop()
+    embedding_cache.flush()
+
 class EmbedRequest(BaseModel):
     text: str
 
 class EmbedResponse(BaseModel):
     embedding: List[float]
 
+class EmbedBatchRequest(BaseModel):
+    texts: List[str]
+
+class EmbedBatchResponse(BaseModel):
+    model: str
+    count: int
+    dim: int
+    dtype: str = "float32"
+    # base64 of the row-major little-endian float32 matrix (count x dim)
+    data: str
+
+EMBED_BATCH_MAX_TEXTS = int(os.getenv("EMBED_BATCH_MAX_TEXTS", 1024))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+
 class Candidate(BaseModel):
     id: int
-    text: str
+    # Either the text or a precomputed embedding (e.g. Report.embedding)
+    text: Optional[str] = None
+    embedding: Optional[List[float]] = None
 
 class DuplicateCheckRequest(BaseModel):
-    new_report_text: str
+    new_report_text: Optional[str] = None
+    new_report_embedding: Optional[List[float]] = None
     candidates: List[Candidate]
 
 class DuplicateMatch(BaseModel):
@@ -40,29 +150,83 @@ class DuplicateMatch(BaseModel):
 class DuplicateCheckResponse(BaseModel):
     matches: List[DuplicateMatch]
 
+def check_dimension(embedding: Optional[List[float]], what: str):
+    if embedding is not None and len(embedding) != EMBEDDING_DIM:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{what} has {len(embedding)} dimensions, expected {EMBEDDING_DIM} ({EMBEDDING_MODEL})"
+        )
+
 @app.get("/")
 def root():
     return {"message": "ai-duplicate service is running"}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "embed": embed_batcher.stats(),
+        "nli": nli_batcher.stats(),
+        "embedding_cache": embedding_cache.stats(),
+    }
+
 @app.post("/embed", response_model=EmbedResponse)
-def embed(request: EmbedRequest):
-    embedding = model.encode(request.text)
+async def embed(request: EmbedRequest):
+    embedding = await embed_batcher.submit(request.text)
     return {"embedding": embedding.tolist()}
 
+@app.post("/embed_batch", response_model=EmbedBatchResponse)
+def embed_batch(request: EmbedBatchRequest):
+    """
+    Embed many texts in one call (backfills, model changes).
+    Returns a packed float32 matrix instead of JSON float lists.
+    """
+    if len(request.texts) > EMBED_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {EMBED_BATCH_MAX_TEXTS} texts per request")
+
+    dim = EMBEDDING_DIM
+    if request.texts:
+        matrix = model.encode(request.texts, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True)
+    else:
+        matrix = np.zeros((0, dim))
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+
+    return {
+        "model": EMBEDDING_MODEL,
+        "count": matrix.shape[0],
+        "dim": dim,
+        "data": base64.b64encode(matrix.tobytes()).decode("ascii"),
+    }
+
 @app.post("/check_duplicates", response_model=DuplicateCheckResponse)
 def check_duplicates(request: DuplicateCheckRequest):
+    if request.new_report_text is None and request.new_report_embedding is None:
+        raise HTTPException(status_code=422, detail="new_report_text or new_report_embedding is required")
+    if any(c.text is None and c.embedding is None for c in request.candidates):
+        raise HTTPException(status_code=422, detail="Each candidate needs text or embedding")
+    check_dimension(request.new_report_embedding, "new_report_embedding")
+    for c in request.candidates:
+        check_dimension(c.embedding, f"Embedding of candidate {c.id}")
     if not request.candidates:
         return {"matches": []}
 
-    # Encode new report
-    new_embedding = model.encode(request.new_report_text, convert_to_tensor=True)
-    
-    # Encode candidates
-    candidate_texts = [c.text for c in request.candidates]
-    candidate_embeddings = model.encode(candidate_texts, convert_to_tensor=True)
-    
+    # Precomputed embeddings are used as-is; every text goes through the
+    # cache, so only texts never seen before are encoded (in one batch)
+    texts = [c.text for c in request.candidates if c.embedding is None]
+    if request.new_report_embedding is None:
+        texts.append(request.new_report_text)
+    encoded = iter(embedding_cache.encode(texts)) if texts else iter(())
+
+    candidate_embeddings = np.array(
+        [c.embedding if c.embedding is not None else next(encoded) for c in request.candidates],
+        dtype=np.float32
+    )
+    if request.new_report_embedding is not None:
+        new_embedding = np.array(request.new_report_embedding, dtype=np.float32)
+    else:
+        new_embedding = next(encoded)
+
     # Compute cosine similarity
-    cosine_scores = util.cos_sim(new_embedding, candidate_embeddings)[0]
+    cosine_scores = util.cos_sim(torch.from_numpy(new_embedding), torch.from_numpy(candidate_embeddings))[0]
     
     matches = []
     for i, score in enumerate(cosine_scores):
@@ -84,12 +248,14 @@ class CategoryResponse(BaseModel):
     all_scores: dict
 
 @app.post("/predict_category", response_model=CategoryResponse)
-def predict_category(request: CategoryRequest):
+async def predict_category(request: CategoryRequest):
     if not category_classifier:
         raise HTTPException(status_code=503, detail="Category classifier not available")
     
-    result = category_classifier(request.text, candidate_labels=CATEGORIES)
-    
+    result = (await zero_shot(request.text, {"category": CATEGORIES}))["category"]
+    return category_response(result)
+
+def category_response(result: dict) -> dict:
     # Return top prediction
     return {
         "category": result['labels'][0],
@@ -105,14 +271,15 @@ class SeverityResponse(BaseModel):
     confidence: float
 
 @app.post("/predict_severity", response_model=SeverityResponse)
-def predict_severity(request: SeverityRequest):
+async def predict_severity(request: SeverityRequest):
     if not category_classifier:
         # Fallback if model not loaded
         return {"severity": "medium", "confidence": 0.0}
     
-    severity_labels = ["critical", "high", "medium", "low"]
-    result = category_classifier(request.text, candidate_labels=severity_labels)
-    
+    result = (await zero_shot(request.text, {"severity": SEVERITY_LABELS}))["severity"]
+    return severity_response(result)
+
+def severity_response(result: dict) -> dict:
     return {
         "severity": result['labels'][0],
         "confidence": float(result['scores'][0])
@@ -137,19 +304,26 @@ SENSITIVE_LOCATIONS = {
 }
 
 @app.post("/predict_priority", response_model=PriorityResponse)
-def predict_priority(request: PriorityRequest):
+async def predict_priority(request: PriorityRequest):
     """
     Calculate priority based on:
     1. Location sensitivity (schools, hospitals = high priority)
     2. Upvote count (community concern)
     3. Text content analysis
     """
+    urgency = None
+    if category_classifier:
+        urgency = (await zero_shot(request.text, {"urgency": URGENCY_LABELS}))["urgency"]
+    return score_priority(request.text, request.upvotes, urgency)
+
+def score_priority(text: str, upvotes: int, urgency: dict = None) -> dict:
+    """Combine location, upvote and urgency factors into a priority level."""
     priority_score = 0.0
     factors = {}
     
     # Factor 1: Location-based priority (40% weight)
     location_priority = 0.0
-    text_lower = request.text.lower()
+    text_lower = text.lower()
     
     for loc_type, keywords in SENSITIVE_LOCATIONS.items():
         if any(keyword in text_lower for keyword in keywords):
@@ -160,22 +334,24 @@ def predict_priority(request: PriorityRequest):
     priority_score += location_priority * 0.4
     
     # Factor 2: Upvote-based priority (30% weight)
-    upvote_priority = min(request.upvotes / 20.0, 1.0)  # Normalize to 0-1, cap at 20 upvotes
-    factors["upvote_count"] = request.upvotes
+    upvote_priority = min(upvotes / 20.0, 1.0)  # Normalize to 0-1, cap at 20 upvotes
+    factors["upvote_count"] = upvotes
     factors["upvote_score"] = upvote_priority
     priority_score += upvote_priority * 0.3
     
     # Factor 3: Content-based urgency (30% weight)
     content_priority = 0.0
-    if category_classifier:
-        urgency_labels = ["urgent", "critical", "dangerous", "emergency", "not urgent"]
-        result = category_classifier(request.text, candidate_labels=urgency_labels)
-        if result['labels'][0] in ["urgent", "critical", "dangerous", "emergency"]:
-            content_priority = float(result['scores'][0])
-            factors["content_urgency"] = result['labels'][0]
+    if urgency:
+        if urgency['labels'][0] in ["urgent", "critical", "dangerous", "emergency"]:
+            content_priority = float(urgency['scores'][0])
+            factors["content_urgency"] = urgency['labels'][0]
     
     priority_score += content_priority * 0.3
     
+    # Text-only part of the score; callers can re-score upvote changes
+    # without running the model again
+    factors["text_score"] = location_priority * 0.4 + content_priority * 0.3
+    
     # Map score to priority level
     if priority_score >= 0.7:
         priority_level = "critical"
@@ -193,3 +369,43 @@ def predict_priority(request: PriorityRequest):
         "confidence": priority_score,
         "factors": factors
     }
+
+class AnalyzeRequest(BaseModel):
+    text: str
+    latitude: float
+    longitude: float
+    upvotes: int = 0
+
+class AnalyzeResponse(BaseModel):
+    category: Optional[CategoryResponse]
+    severity: SeverityResponse
+    priority: PriorityResponse
+    embedding: List[float]
+
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze(request: AnalyzeRequest):
+    """
+    Everything the backend needs for a new report in one call:
+    category, severity and urgency are scored in a single NLI pass,
+    and the embedding is computed from the same text.
+    """
+    category = None
+    severity = {"severity": "medium", "confidence": 0.0}
+    urgency = None
+    embedding_task = asyncio.create_task(embed_batcher.submit(request.text))
+    if category_classifier:
+        results = await zero_shot(request.text, {
+            "category": CATEGORIES,
+            "severity": SEVERITY_LABELS,
+            "urgency": URGENCY_LABELS,
+        })
+        category = category_response(results["category"])
+        severity = severity_response(results["severity"])
+        urgency = results["urgency"]
+
+    return {
+        "category": category,
+        "severity": severity,
+        "priority": score_priority(request.text, request.upvotes, urgency),
+        "embedding": (await embedding_task).tolist(),
+    }
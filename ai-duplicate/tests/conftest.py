@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Service modules are imported top-level, as uvicorn does from the service directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_concurrent_submits_share_a_batch():
+    calls = []
+
+    def fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher("test", fn, max_batch_size=8, max_wait_ms=50)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = run(main())
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert stats["batches"] == 1 and stats["items"] == 5
+
+def test_batches_are_capped_at_max_batch_size():
+    calls = []
+
+    def fn(items):
+        calls.append(len(items))
+        return items
+
+    async def main():
+        batcher = MicroBatcher("test", fn, max_batch_size=3, max_wait_ms=50)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+        await batcher.stop()
+        return results
+
+    assert run(main()) == list(range(7))
+    assert calls == [3, 3, 1]
+
+def test_partial_batch_flushes_after_max_wait():
+    async def main():
+        batcher = MicroBatcher("test", lambda items: items, max_batch_size=100, max_wait_ms=20)
+        await batcher.start()
+        started = time.perf_counter()
+        result = await asyncio.wait_for(batcher.submit("x"), 1.0)
+        elapsed = time.perf_counter() - started
+        await batcher.stop()
+        return result, elapsed
+
+    result, elapsed = run(main())
+    assert result == "x"
+    assert 0.015 <= elapsed < 0.5
+
+def test_exception_fails_the_whole_batch_and_worker_keeps_going():
+    def fn(items):
+        if "bad" in items:
+            raise ValueError("boom")
+        return items
+
+    async def main():
+        batcher = MicroBatcher("test", fn, max_batch_size=8, max_wait_ms=20)
+        await batcher.start()
+        results = await asyncio.gather(batcher.submit("bad"), batcher.submit("ok"), return_exceptions=True)
+        after = await batcher.submit("later")
+        await batcher.stop()
+        return results, after, batcher.stats()
+
+    results, after, stats = run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert after == "later"
+    assert stats["errors"] == 1
+
+def test_stop_fails_in_flight_and_queued_requests():
+    release = threading.Event()
+
+    def fn(items):
+        release.wait(5)
+        return items
+
+    async def main():
+        batcher = MicroBatcher("test", fn, max_batch_size=1, max_wait_ms=0)
+        await batcher.start()
+        in_flight = asyncio.create_task(batcher.submit(1))
+        await asyncio.sleep(0.05)  # worker is now blocked in fn
+        queued = asyncio.create_task(batcher.submit(2))
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        release.set()
+        return await asyncio.wait_for(
+            asyncio.gather(in_flight, queued, return_exceptions=True), 1.0
+        )
+
+    results = run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_submit_after_stop_raises():
+    async def main():
+        batcher = MicroBatcher("test", lambda items: items)
+        await batcher.start()
+        await batcher.stop()
+        with pytest.raises(RuntimeError):
+            await batcher.submit(1)
+
+    run(main())
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from embedding_cache import ENTRY_OVERHEAD_BYTES, DiskTier, EmbeddingCache
+
+DIM = 4
+
+class FakeEncoder:
+    def __init__(self, dim=DIM):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t) + i for i in range(self.dim)] for t in texts], dtype=np.float32)
+
+def key(n: int) -> bytes:
+    return n.to_bytes(20, "big")
+
+def make_cache(encoder, entries=100, model="model-a", **kwargs):
+    return EmbeddingCache(encoder, model, DIM, max_bytes=entries * (DIM * 4 + ENTRY_OVERHEAD_BYTES), **kwargs)
+
+def test_only_missing_texts_are_encoded_once():
+    encoder = FakeEncoder()
+    cache = make_cache(encoder)
+    first = cache.encode(["a", "bb", "a"])
+    second = cache.encode(["bb", "ccc"])
+    assert encoder.calls == [["a", "bb"], ["ccc"]]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(first[1], second[0])
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+def test_lru_evicts_least_recently_used():
+    encoder = FakeEncoder()
+    cache = make_cache(encoder, entries=2)
+    cache.encode(["a"])
+    cache.encode(["b"])
+    cache.encode(["a"])  # a is now more recent than b
+    cache.encode(["c"])  # evicts b
+    assert cache.stats()["evictions"] == 1
+    cache.encode(["a", "b"])
+    assert encoder.calls[-1] == ["b"]
+
+def test_model_name_is_part_of_the_key(tmp_path):
+    encoder = FakeEncoder()
+    make_cache(encoder, disk_path=str(tmp_path)).encode(["a"])
+    other = make_cache(encoder, model="model-b", disk_path=str(tmp_path))
+    other.encode(["a"])
+    assert encoder.calls == [["a"], ["a"]]
+    assert other.stats()["disk_hits"] == 0
+
+def test_wrong_encoder_dimension_raises():
+    cache = make_cache(FakeEncoder(dim=DIM + 1))
+    with pytest.raises(ValueError):
+        cache.encode(["a"])
+
+def test_disk_tier_survives_reopen(tmp_path):
+    encoder = FakeEncoder()
+    cache = make_cache(encoder, disk_path=str(tmp_path))
+    expected = cache.encode(["a", "bb"])
+    cache.flush()
+
+    reopened = make_cache(encoder, disk_path=str(tmp_path))
+    np.testing.assert_array_equal(reopened.encode(["a", "bb"]), expected)
+    assert len(encoder.calls) == 1
+    assert reopened.stats()["disk_hits"] == 2
+
+def test_disk_ring_overwrites_oldest_row(tmp_path):
+    tier = DiskTier(str(tmp_path), DIM, capacity=3)
+    for n in range(4):
+        tier.put(key(n), np.full(DIM, n, dtype=np.float32))
+    assert tier.get(key(0)) is None
+    assert [tier.get(key(n))[0] for n in (1, 2, 3)] == [1, 2, 3]
+    assert tier.cursor == 1
+
+def test_disk_tier_grows_and_keeps_rows(tmp_path):
+    tier = DiskTier(str(tmp_path), DIM, capacity=2)
+    tier.put(key(1), np.full(DIM, 1, dtype=np.float32))
+    tier.put(key(2), np.full(DIM, 2, dtype=np.float32))
+    tier.flush()
+    del tier
+
+    grown = DiskTier(str(tmp_path), DIM, capacity=4)
+    assert grown.get(key(1))[0] == 1 and grown.get(key(2))[0] == 2
+    assert grown.cursor == 2  # new rows are filled before the old ones are overwritten
+    grown.put(key(3), np.full(DIM, 3, dtype=np.float32))
+    assert grown.get(key(1)) is not None
+
+def test_disk_tier_starts_over_on_dim_change_or_shrink(tmp_path):
+    tier = DiskTier(str(tmp_path), DIM, capacity=4)
+    tier.put(key(1), np.ones(DIM, dtype=np.float32))
+    tier.flush()
+    del tier
+
+    assert DiskTier(str(tmp_path), DIM + 2, capacity=4).get(key(1)) is None
+    tier = DiskTier(str(tmp_path), DIM, capacity=4)
+    tier.put(key(1), np.ones(DIM, dtype=np.float32))
+    tier.flush()
+    del tier
+    assert DiskTier(str(tmp_path), DIM, capacity=2).get(key(1)) is None
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from openai import AsyncOpenAI
+
+from response_cache import ResponseCache
+
+class LLMClient:
+    """
+    Async chat-completions client shared by every request.
+
+    At most max_concurrency completions run at once (the rest wait on a
+    semaphore), each bounded by the client timeout. Responses are cached by
+    prompt hash, and identical prompts already in flight share one call.
+    """
+
+    def __init__(self, client: AsyncOpenAI, cache: ResponseCache, max_concurrency: int):
+        self.client = client
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight = {}  # cache key -> Future
+
+        # Metrics
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.latency_total = 0.0
+
+    async def complete(self, messages: list, model: str, **params) -> str:
+        """Text of the first choice for these messages, from cache when possible."""
+        key = self.cache.key(model, messages, params)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        pending = self._in_flight.get(key)
+        while pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this request was cancelled
+            # The leading request was cancelled: join or lead a new call
+            pending = self._in_flight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            content = await self._call(messages, model, params)
+            await asyncio.to_thread(self.cache.set, key, content)
+            future.set_result(content)
+            return content
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def _call(self, messages: list, model: str, params: dict) -> str:
+        async with self._slots:
+            started = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=model, messages=messages, **params
+                )
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.calls += 1
+                self.latency_total += time.perf_counter() - started
+        return response.choices[0].message.content.strip()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "max_concurrency": self.max_concurrency,
+            "avg_latency_ms": self.latency_total / self.calls * 1000.0 if self.calls else 0.0,
+            "cache": self.cache.stats(),
+        }
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+class ResponseCache:
+    """
+    Prompt-hash keyed cache of LLM responses.
+
+    Keys are sha256 over the model, messages and sampling parameters, so
+    any change to the prompt is a different entry. The in-memory tier is an
+    LRU of max_entries; with disk_path set, responses are also kept in a
+    SQLite file so they survive restarts. Entries older than ttl seconds
+    are ignored (ttl <= 0 keeps them forever).
+    """
+
+    def __init__(self, max_entries: int, ttl: float, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (created_at, response)
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created_at REAL, response TEXT)"
+            )
+            self._db.commit()
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, messages: list, params: dict) -> str:
+        payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _fresh(self, created_at: float) -> bool:
+        return self.ttl <= 0 or time.time() - created_at < self.ttl
+
+    def _remember(self, key: str, created_at: float, response: str):
+        # Caller holds the lock
+        self._entries[key] = (created_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created_at, response FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._fresh(row[0]):
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[1]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, response: str):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, response)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, created_at, response) VALUES (?, ?, ?)",
+                    (key, created_at, response)
+                )
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
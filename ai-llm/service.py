@@ -2,22 +2,60 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from llm_client import LLMClient
+from response_cache import ResponseCache
+from summarizer import MapReduceSummarizer
 
 load_dotenv()
 
 app = FastAPI(title="AI LLM Service")
 
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# Point at any OpenAI-compatible server, e.g. stub_openai.py for local testing
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10_000))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")  # enables the on-disk store (SQLite file)
+
 # Initialize OpenAI Client
 # Expects OPENAI_API_KEY in env
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+llm = LLMClient(
+    AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=OPENAI_BASE_URL,
+        timeout=LLM_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+    ),
+    ResponseCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL, LLM_CACHE_PATH),
+    LLM_MAX_CONCURRENCY,
+)
+
+# Map-reduce summarization of large report sets
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+SUMMARY_BOUNDARY_MOD = int(os.getenv("SUMMARY_BOUNDARY_MOD", 32))  # average items per content-defined chunk
+SUMMARY_MAX_PARALLEL = int(os.getenv("SUMMARY_MAX_PARALLEL", 8))
+
+summarizer = MapReduceSummarizer(
+    llm, LLM_MODEL,
+    chunk_tokens=SUMMARY_CHUNK_TOKENS,
+    boundary_mod=SUMMARY_BOUNDARY_MOD,
+    max_parallel=SUMMARY_MAX_PARALLEL,
+    map_max_tokens=200,
+    final_max_tokens=150,
+)
 
 class SummarizeRequest(BaseModel):
     reports: List[str]
 
 class SummarizeResponse(BaseModel):
     summary: str
+    chunks: int = 1  # map calls (chunks of reports)
+    levels: int = 1  # map + reduce rounds
 
 class SQLRequest(BaseModel):
     query: str
@@ -29,37 +67,26 @@ class SQLResponse(BaseModel):
 def root():
     return {"message": "ai-llm service is running"}
 
+@app.get("/metrics")
+def metrics():
+    return {"llm": llm.stats()}
+
+@app.on_event("shutdown")
+async def shutdown():
+    await llm.client.close()
+
 @app.post("/summarize", response_model=SummarizeResponse)
-def summarize(request: SummarizeRequest):
+async def summarize(request: SummarizeRequest):
     if not request.reports:
         return {"summary": "No reports to summarize."}
     
-    # Combine reports into a single text block
-    text_block = "\n".join([f"- {r}" for r in request.reports])
-    
-    prompt = f"""
-    You are an assistant for a city management system. 
-    Summarize the following citizen reports into a concise 3-sentence overview highlighting the main issues and locations.
-    
-    Reports:
-    {text_block}
-    
-    Summary:
-    """
-    
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=150
-        )
-        summary = response.choices[0].message.content.strip()
-        return {"summary": summary}
+        return await summarizer.summarize(request.reports)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate_sql", response_model=SQLResponse)
-def generate_sql(request: SQLRequest):
+async def generate_sql(request: SQLRequest):
     # Schema context for the LLM
     schema_context = """
     Table: reports
@@ -87,19 +114,17 @@ def generate_sql(request: SQLRequest):
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
+        sql = await llm.complete(
+            [{"role": "user", "content": prompt}], LLM_MODEL, temperature=0
         )
-        sql = response.choices[0].message.content.strip()
-        # Basic safety check
-        if not sql.lower().startswith("select"):
-            raise HTTPException(status_code=400, detail="Generated query was not a SELECT statement.")
-        
-        # Remove markdown if present
-        sql = sql.replace("```sql", "").replace("```", "").strip()
-        
-        return {"sql_query": sql}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    # Remove markdown if present
+    sql = sql.replace("```sql", "").replace("```", "").strip()
+
+    # Basic safety check (the backend validates the query properly before running it)
+    if not sql.lower().startswith(("select", "with")):
+        raise HTTPException(status_code=400, detail="Generated query was not a SELECT statement.")
+
+    return {"sql_query": sql}
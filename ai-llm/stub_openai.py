@@ -0,0 +1,60 @@
+"""
+Minimal OpenAI-compatible server for local testing and benchmarks.
+
+    uvicorn stub_openai:app --port 9010
+    OPENAI_BASE_URL=http://localhost:9010/v1 uvicorn service:app --port 9002
+
+Implements POST /v1/chat/completions with deterministic answers and a
+configurable delay (STUB_LATENCY_MS) standing in for model latency.
+"""
+import asyncio
+import hashlib
+import os
+import time
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+from typing import List, Optional
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", 300))
+
+app = FastAPI(title="Stub OpenAI API")
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+class ChatCompletionRequest(BaseModel):
+    model: str
+    messages: List[Message]
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+def _answer(prompt: str) -> str:
+    if "SQL" in prompt:
+        return "SELECT id, title, category, status, upvotes, created_at FROM reports ORDER BY created_at DESC LIMIT 20"
+    lines = [line for line in prompt.splitlines() if line.strip().startswith("-")]
+    digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+    return f"Stub summary {digest} of {len(lines)} items."
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatCompletionRequest):
+    await asyncio.sleep(STUB_LATENCY_MS / 1000.0)
+    prompt = "\n".join(m.content for m in request.messages)
+    content = _answer(prompt)
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+        },
+    }
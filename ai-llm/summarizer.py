@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+from typing import List
+
+from llm_client import LLMClient
+
+# Rough token count; close enough for budgeting without a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+SINGLE_PROMPT = """
+    You are an assistant for a city management system.
+    Summarize the following citizen reports into a concise 3-sentence overview highlighting the main issues and locations.
+
+    Reports:
+    {items}
+
+    Summary:
+    """
+
+MAP_PROMPT = """
+    You are an assistant for a city management system.
+    Summarize this batch of citizen reports in 2-3 sentences. Keep recurring issues, counts and locations.
+
+    Reports:
+    {items}
+
+    Summary:
+    """
+
+REDUCE_PROMPT = """
+    You are an assistant for a city management system.
+    Merge these partial summaries of citizen reports into one summary of at most {sentences} sentences,
+    highlighting the main issues and locations.
+
+    Partial summaries:
+    {items}
+
+    Summary:
+    """
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def chunk_items(items: List[str], budget: int, boundary_mod: int) -> List[List[str]]:
+    """
+    Split items into chunks of at most `budget` tokens, cutting after any
+    item whose hash is 0 mod boundary_mod (content-defined boundaries), so
+    adding or removing items only changes the chunk they land in and the
+    other chunks' prompts stay cached.
+    """
+    max_chars = budget * CHARS_PER_TOKEN
+    chunks, current, current_tokens = [], [], 0
+    for item in items:
+        item = item[:max_chars]  # A single oversized item gets its own truncated chunk
+        tokens = estimate_tokens(item)
+        if current and current_tokens + tokens > budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+        digest = hashlib.sha1(item.encode("utf-8")).digest()
+        if int.from_bytes(digest[:4], "big") % boundary_mod == 0:
+            chunks.append(current)
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _bullets(items: List[str]) -> str:
+    return "\n".join(f"- {item}" for item in items)
+
+class MapReduceSummarizer:
+    """
+    Summarize any number of reports within the model's context window.
+
+    Reports that fit in one chunk get a single call. Otherwise they are
+    chunked by token budget, chunks are summarized concurrently (at most
+    max_parallel at a time), and partial summaries are merged level by
+    level with the same chunking until one remains. Every call goes
+    through the LLM client's prompt-hash cache, so unchanged chunks and
+    merges are free on the next request.
+    """
+
+    def __init__(self, llm: LLMClient, model: str, chunk_tokens: int, boundary_mod: int,
+                 max_parallel: int, map_max_tokens: int, final_max_tokens: int):
+        self.llm = llm
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.boundary_mod = boundary_mod
+        self.max_parallel = max_parallel
+        self.map_max_tokens = map_max_tokens
+        self.final_max_tokens = final_max_tokens
+
+    async def _complete(self, slots: asyncio.Semaphore, prompt: str, max_tokens: int) -> str:
+        async with slots:
+            return await self.llm.complete(
+                [{"role": "user", "content": prompt}], self.model, max_tokens=max_tokens
+            )
+
+    async def summarize(self, reports: List[str]) -> dict:
+        chunks = chunk_items(reports, self.chunk_tokens, self.boundary_mod)
+        if len(chunks) == 1:
+            summary = await self.llm.complete(
+                [{"role": "user", "content": SINGLE_PROMPT.format(items=_bullets(chunks[0]))}],
+                self.model, max_tokens=self.final_max_tokens
+            )
+            return {"summary": summary, "chunks": 1, "levels": 1}
+
+        slots = asyncio.Semaphore(self.max_parallel)
+        partials = await asyncio.gather(*(
+            self._complete(slots, MAP_PROMPT.format(items=_bullets(chunk)), self.map_max_tokens)
+            for chunk in chunks
+        ))
+        levels = 1
+        while True:
+            levels += 1
+            groups = chunk_items(partials, self.chunk_tokens, self.boundary_mod)
+            if len(groups) == 1:
+                summary = await self._complete(
+                    slots, REDUCE_PROMPT.format(sentences=3, items=_bullets(groups[0])), self.final_max_tokens
+                )
+                return {"summary": summary, "chunks": len(chunks), "levels": levels}
+            if len(groups) == len(partials):
+                # Boundaries after every summary would never converge; pair them up
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            partials = await asyncio.gather(*(
+                self._complete(slots, REDUCE_PROMPT.format(sentences="3-5", items=_bullets(group)),
+                               self.map_max_tokens)
+                for group in groups
+            ))
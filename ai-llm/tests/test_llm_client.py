@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+from llm_client import LLMClient
+from response_cache import ResponseCache
+
+class SlowCompletions:
+    """Stands in for client.chat.completions: every call takes `delay` seconds."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def create(self, model, messages, **params):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def make_client(delay: float = 0.05):
+    completions = SlowCompletions(delay)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return LLMClient(client, ResponseCache(max_entries=100, ttl=0), max_concurrency=4), completions
+
+MESSAGES = [{"role": "user", "content": "summarize"}]
+
+def test_identical_prompts_share_one_call():
+    async def run():
+        llm, completions = make_client()
+        results = await asyncio.gather(*(llm.complete(MESSAGES, "m") for _ in range(5)))
+        return results, completions.calls, llm.coalesced
+
+    results, calls, coalesced = asyncio.run(run())
+    assert results == ["answer 1"] * 5
+    assert (calls, coalesced) == (1, 4)
+
+def test_followers_survive_a_cancelled_leader():
+    async def run():
+        llm, completions = make_client()
+        leader = asyncio.create_task(llm.complete(MESSAGES, "m"))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(llm.complete(MESSAGES, "m")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader.cancelled(), results, completions.calls
+
+    leader_cancelled, results, calls = asyncio.run(run())
+    assert leader_cancelled
+    # One follower retries the call and the others join it
+    assert results == ["answer 2"] * 3
+    assert calls == 2
+
+def test_cancelled_follower_leaves_the_call_running():
+    async def run():
+        llm, completions = make_client()
+        leader = asyncio.create_task(llm.complete(MESSAGES, "m"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(llm.complete(MESSAGES, "m"))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader, follower.cancelled(), completions.calls
+
+    result, follower_cancelled, calls = asyncio.run(run())
+    assert result == "answer 1" and follower_cancelled and calls == 1
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import random
+
+from summarizer import CHARS_PER_TOKEN, MapReduceSummarizer, chunk_items, estimate_tokens
+
+def make_reports(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    issues = ["pothole", "broken street light", "garbage pile", "flooded road", "graffiti"]
+    return [f"Report {i}: {rng.choice(issues)} near block {rng.randrange(500)}" for i in range(n)]
+
+def as_set(chunks: list) -> set:
+    return {tuple(chunk) for chunk in chunks}
+
+def test_chunks_keep_every_item_in_order_within_budget():
+    items = make_reports(2000)
+    chunks = chunk_items(items, budget=300, boundary_mod=8)
+    assert [item for chunk in chunks for item in chunk] == items
+    assert all(sum(estimate_tokens(item) for item in chunk) <= 300 for chunk in chunks)
+
+def test_oversized_item_is_truncated_into_its_own_chunk():
+    big = "x" * (100 * CHARS_PER_TOKEN * 3)
+    chunks = chunk_items(["a", big, "b"], budget=100, boundary_mod=10**9)
+    assert chunks[1] == [big[:100 * CHARS_PER_TOKEN]]
+    assert chunks[0] == ["a"] and chunks[2] == ["b"]
+
+def test_boundaries_are_stable_under_insert():
+    items = make_reports(2000)
+    before = chunk_items(items, budget=10_000, boundary_mod=16)
+    for position in (0, 500, 1999):
+        after = chunk_items(items[:position] + ["Report new: fallen tree"] + items[position:], 10_000, 16)
+        # Only the chunk that received the item changes (or splits in two)
+        assert len(as_set(before) - as_set(after)) == 1
+        assert len(as_set(after) - as_set(before)) <= 2
+
+def test_boundaries_are_stable_under_delete():
+    items = make_reports(2000)
+    before = chunk_items(items, budget=10_000, boundary_mod=16)
+    for position in (0, 777, 1999):
+        after = chunk_items(items[:position] + items[position + 1:], 10_000, 16)
+        # The chunk that lost the item changes (or merges with its neighbour)
+        assert len(as_set(after) - as_set(before)) == 1
+        assert len(as_set(before) - as_set(after)) <= 2
+
+class CachingLLM:
+    """Stands in for LLMClient: answers deterministically and counts distinct prompts."""
+
+    def __init__(self):
+        self.prompts = set()
+
+    async def complete(self, messages, model, **params):
+        prompt = messages[-1]["content"]
+        self.prompts.add(prompt)
+        return "summary " + hashlib.sha1(prompt.encode()).hexdigest()[:12]
+
+def summarize(llm, reports):
+    summarizer = MapReduceSummarizer(llm, "test-model", chunk_tokens=400, boundary_mod=8,
+                                     max_parallel=4, map_max_tokens=50, final_max_tokens=50)
+    return asyncio.run(summarizer.summarize(reports))
+
+def test_small_input_is_a_single_call():
+    llm = CachingLLM()
+    result = summarize(llm, make_reports(5))
+    assert (result["chunks"], result["levels"]) == (1, 1)
+    assert len(llm.prompts) == 1
+
+def test_single_oversized_report_is_truncated_to_the_budget():
+    llm = CachingLLM()
+    result = summarize(llm, ["x" * 200_000])
+    assert (result["chunks"], result["levels"]) == (1, 1)
+    (prompt,) = llm.prompts
+    assert estimate_tokens(prompt) < 400 + 200
+
+def test_large_input_reduces_to_one_summary_and_reuses_chunks():
+    llm = CachingLLM()
+    reports = make_reports(3000)
+    result = summarize(llm, reports)
+    assert result["chunks"] > 1 and result["levels"] >= 2
+    calls = len(llm.prompts)
+
+    summarize(llm, reports[:1500] + ["Report new: fallen tree"] + reports[1500:])
+    # The changed map chunk plus one merge per level above it, not a full recompute
+    assert len(llm.prompts) - calls <= 2 * result["levels"]
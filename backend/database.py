@@ -1,20 +1,216 @@
+from fastapi import Request
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from contextvars import ContextVar
+from typing import Optional
+from utils.cache import TTLCache
+from utils.metrics import metrics
+import asyncio
+import hashlib
+import json
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://admin:admin123@db:5432/citizen_ai")
+# Optional read replica for heavy read endpoints; defaults to the primary
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Recycle connections before server/proxy idle timeouts close them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg prepared statement cache per connection (0 disables, e.g. behind pgbouncer)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+# Read routing: clients that wrote within READ_STICKY_SECONDS read from the
+# primary (read-your-writes); everyone reads from the primary while the
+# replica is more than REPLICA_MAX_LAG_SECONDS behind.
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", 5))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", 2))
+
+# Per-request query count and database time; set by main.py's middleware
+_request_queries: ContextVar[Optional[dict]] = ContextVar("request_queries", default=None)
+
+# route -> {"requests", "queries", "db_seconds"}
+route_stats = {}
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(engine_name):
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        stats = _request_queries.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["db_seconds"] += elapsed
+        metrics.observe(f"db.query.{engine_name}", elapsed)
+        if elapsed * 1000.0 >= SLOW_QUERY_MS:
+            metrics.incr("db.slow_queries")
+            print(json.dumps({
+                "event": "slow_query",
+                "engine": engine_name,
+                "path": stats["path"] if stats is not None else None,
+                "duration_ms": round(elapsed * 1000.0, 1),
+                "executemany": executemany,
+                "statement": " ".join(statement.split())[:1000],
+            }))
+    return listener
+
+def _pool_stats(engine):
+    def stats() -> dict:
+        pool = engine.pool
+        capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "capacity": capacity,
+            "saturation": pool.checkedout() / capacity if capacity else 0.0,
+        }
+    return stats
+
+def make_engine(url: str, name: str):
+    """
+    Pooled async engine configured from the DB_* settings, with query
+    timing/slow-query listeners and a pool gauge ("db_pool.<name>").
+    """
+    engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+    )
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute(name))
+    metrics.gauge(f"db_pool.{name}", _pool_stats(engine.sync_engine))
+    return engine
+
+engine = make_engine(DATABASE_URL, "primary")
+read_engine = make_engine(READ_DATABASE_URL, "replica") if READ_DATABASE_URL else engine
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+ReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 Base = declarative_base()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+# sha1(Authorization header) of clients that wrote recently
+_recent_writers = TTLCache(maxsize=100_000, ttl=READ_STICKY_SECONDS)
+# Seconds the replica is behind, None until the first check
+replica_lag: Optional[float] = None
+
+def _client_key(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha1(authorization.encode()).hexdigest()
+
+def note_write(request: Request):
+    """Pin this client's reads to the primary for READ_STICKY_SECONDS."""
+    key = _client_key(request)
+    if key is not None:
+        _recent_writers.set(key, True)
+
+def read_sessionmaker(request: Optional[Request] = None):
+    """Session factory for a read: the replica unless stickiness or lag says otherwise."""
+    if read_engine is engine:
+        return AsyncSessionLocal
+    if request is not None:
+        key = _client_key(request)
+        if key is not None and _recent_writers.get(key):
+            metrics.incr("db.reads.primary_sticky")
+            return AsyncSessionLocal
+    if replica_lag is None or replica_lag > REPLICA_MAX_LAG_SECONDS:
+        metrics.incr("db.reads.primary_lagging")
+        return AsyncSessionLocal
+    metrics.incr("db.reads.replica")
+    return ReadSessionLocal
+
+async def get_read_db(request: Request):
+    """Session for read-only endpoints; see read_sessionmaker."""
+    async with read_sessionmaker(request)() as session:
+        yield session
+
+async def check_replica_lag() -> float:
+    # Zero when the replica has replayed everything it received (an idle
+    # primary otherwise looks like growing lag), else time since the last replay
+    async with read_engine.connect() as conn:
+        result = await conn.execute(text(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        ))
+        return float(result.scalar() or 0)
+
+async def run_replica_lag_monitor():
+    """Refresh replica_lag every REPLICA_LAG_CHECK_INTERVAL seconds (started in main.py)."""
+    global replica_lag
+    while True:
+        try:
+            replica_lag = await check_replica_lag()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Replica lag check failed: {e}")
+            replica_lag = None
+        await asyncio.sleep(REPLICA_LAG_CHECK_INTERVAL)
+
+metrics.gauge("db_replica", lambda: {
+    "configured": read_engine is not engine,
+    "lag_seconds": replica_lag,
+    "max_lag_seconds": REPLICA_MAX_LAG_SECONDS,
+    "sticky_clients": _recent_writers.stats()["entries"],
+})
+
+def begin_request(path: str):
+    """Start counting queries for the current request; pass the result to end_request."""
+    request = {"path": path, "queries": 0, "db_seconds": 0.0}
+    return _request_queries.set(request), request
+
+def end_request(handle, route: str, elapsed: float):
+    """Fold the request's query count/time into route_stats under its route template."""
+    token, request = handle
+    try:
+        _request_queries.reset(token)
+    except ValueError:
+        pass  # Finished from another context (a streamed body closed elsewhere)
+
+    stats = route_stats.setdefault(route, {"requests": 0, "queries": 0, "db_seconds": 0.0})
+    stats["requests"] += 1
+    stats["queries"] += request["queries"]
+    stats["db_seconds"] += request["db_seconds"]
+    metrics.observe(f"http.{route}", elapsed)
+
+def route_stats_snapshot() -> dict:
+    return {
+        route: {
+            "requests": s["requests"],
+            "queries": s["queries"],
+            "queries_per_request": s["queries"] / s["requests"],
+            "db_ms_per_request": s["db_seconds"] / s["requests"] * 1000.0,
+        }
+        for route, s in list(route_stats.items())
+    }
+
+metrics.gauge("db_routes", route_stats_snapshot)
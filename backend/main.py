@@ -1,7 +1,25 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, reports, analytics, votes
+from database import (
+    engine, read_engine, Base, begin_request, end_request, note_write, run_replica_lag_monitor,
+)
+from init_db import ensure_schema
+from rebuild_aggregates import backfill_empty_aggregates
+from routers import auth, reports, analytics, votes, teams
+from utils.ai_client import start_ai_client, close_ai_client
+from utils.hotspots import run_hotspot_scheduler
+from utils.vote_buffer import vote_buffer, VOTE_WRITE_BEHIND
+from utils.priority import priority_worker
+from utils.departments import department_registry
+from utils.dispatch import team_index
+from utils.cache import analytics_cache
+from utils.metrics import metrics
+from utils.security import PasswordHashBusy, PASSWORD_HASH_RETRY_AFTER
+import asyncio
+import time
+
+background_tasks = []
 
 app = FastAPI(title="Citizen AI System API")
 
@@ -20,13 +38,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def query_metrics(request: Request, call_next):
+    """
+    Per-route request latency plus the number and time of DB queries it ran.
+    Accounting ends when the response body is done, so queries run while
+    streaming (exports, /analytics/ask) are counted too.
+    """
+    handle = begin_request(request.url.path)
+    started = time.perf_counter()
+
+    def finish():
+        route = request.scope.get("route")
+        name = f"{request.method} {route.path}" if route is not None else "unmatched"
+        end_request(handle, name, time.perf_counter() - started)
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        finish()
+        raise
+    finally:
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            note_write(request)
+
+    body = response.body_iterator
+
+    async def counted_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish()
+
+    response.body_iterator = counted_body()
+    return response
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(reports.router)
 app.include_router(votes.router)
 app.include_router(analytics.router)
+app.include_router(teams.router)
+
+@app.exception_handler(PasswordHashBusy)
+async def password_hash_busy(request: Request, exc: PasswordHashBusy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many sign-in attempts in progress, please retry"},
+        headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+    )
+
+metrics.gauge("auth_user_cache", auth.user_cache.stats)
+metrics.gauge("analytics_cache", analytics_cache.stats)
+metrics.gauge("vote_buffer", vote_buffer.stats)
+metrics.gauge("priority_worker", priority_worker.stats)
+metrics.gauge("dispatch", team_index.stats)
 
 @app.on_event("startup")
 async def startup():
@@ -34,7 +104,30 @@ async def startup():
     async with engine.begin() as conn:
         # await conn.run_sync(Base.metadata.drop_all) # Uncomment to reset DB
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_schema(conn)
+    await backfill_empty_aggregates()
+    await start_ai_client()
+    await department_registry.refresh()
+    await team_index.reload()
+    background_tasks.append(asyncio.create_task(run_hotspot_scheduler()))
+    background_tasks.append(asyncio.create_task(priority_worker.run()))
+    if read_engine is not engine:
+        background_tasks.append(asyncio.create_task(run_replica_lag_monitor()))
+    if VOTE_WRITE_BEHIND:
+        background_tasks.append(asyncio.create_task(vote_buffer.run()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_ai_client()
 
 @app.get("/")
 def read_root():
     return {"message": "Citizen AI System Backend is running"}
+
+@app.get("/metrics")
+def get_metrics():
+    """Counters, timings and cache/worker gauges for this process."""
+    return metrics.snapshot()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Enum, Text, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from geoalchemy2 import Geometry
@@ -62,6 +62,8 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     role = Column(Enum(UserRole), default=UserRole.citizen)
+    # Bumped by a trigger on role/email/password changes; tokens carry the version they were issued for
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     reports = relationship("Report", back_populates="owner")
@@ -77,6 +79,7 @@ class Report(Base):
     status = Column(Enum(ReportStatus), default=ReportStatus.pending)
     severity = Column(Enum(ReportSeverity), default=ReportSeverity.medium)
     priority = Column(Enum(ReportPriority), default=ReportPriority.medium, index=True)
+    priority_text_score = Column(Float, nullable=True) # Upvote-independent part of the priority score
     
     image_url = Column(String, nullable=True)
     resolution_image_url = Column(String, nullable=True) # Proof of work
@@ -87,10 +90,12 @@ class Report(Base):
     
     # Embedding for duplicate detection
     embedding = Column(Vector(384))
+    embedding_model = Column(String, nullable=True) # Model that produced the embedding
     
-    upvotes = Column(Integer, default=0)
+    upvotes = Column(Integer, default=0, server_default="0", nullable=False) # Keyset sort key, never NULL
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    resolved_at = Column(DateTime(timezone=True), nullable=True) # When it entered resolved/closed
 
     user_id = Column(Integer, ForeignKey("users.id"))
     department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
@@ -110,3 +115,51 @@ class Vote(Base):
 
     user = relationship("User", back_populates="votes")
     report = relationship("Report", back_populates="votes")
+
+class HeatmapCell(Base):
+    """Report counts per map grid cell, maintained incrementally (see utils/heatmap.py)."""
+    __tablename__ = "heatmap_cells"
+
+    # Cells are web-mercator tiles at zoom `level` (tile zoom + HEATMAP_CELL_BITS)
+    level = Column(Integer, primary_key=True)
+    cell_x = Column(Integer, primary_key=True)
+    cell_y = Column(Integer, primary_key=True)
+    status = Column(Enum(ReportStatus), primary_key=True)
+    priority = Column(Enum(ReportPriority), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class HotspotCluster(Base):
+    """Dense cluster of recent reports of one category (see utils/hotspots.py)."""
+    __tablename__ = "hotspot_clusters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    category = Column(String, index=True)
+    report_count = Column(Integer)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    radius_m = Column(Float) # Distance from the centroid to the farthest report
+    priority = Column(Enum(ReportPriority)) # Highest priority in the cluster
+    first_report_at = Column(DateTime(timezone=True))
+    last_report_at = Column(DateTime(timezone=True))
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ReportDailyRollup(Base):
+    """Report counts per creation day and dimensions (see utils/rollups.py)."""
+    __tablename__ = "report_daily_rollups"
+
+    day = Column(Date, primary_key=True) # DATE(created_at)
+    category = Column(String, primary_key=True)
+    status = Column(Enum(ReportStatus), primary_key=True)
+    priority = Column(Enum(ReportPriority), primary_key=True)
+    department_id = Column(Integer, primary_key=True) # 0 = unassigned
+    count = Column(Integer, nullable=False, default=0)
+
+class ResolutionRollup(Base):
+    """Resolved/closed report counts per resolution day and time-to-resolve bucket."""
+    __tablename__ = "report_resolution_rollups"
+
+    day = Column(Date, primary_key=True) # DATE(resolved_at)
+    category = Column(String, primary_key=True)
+    department_id = Column(Integer, primary_key=True) # 0 = unassigned
+    bucket = Column(String, primary_key=True) # under_24h, under_7d, under_30d, over_30d
+    count = Column(Integer, nullable=False, default=0)
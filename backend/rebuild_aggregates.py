@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+from sqlalchemy import text
+from database import AsyncSessionLocal, engine
+from utils.heatmap import rebuild_heatmap
+from utils.hotspots import refresh_hotspots
+from utils.rollups import rebuild_rollups
+
+AGGREGATES = ["heatmap", "rollups", "hotspots"]
+
+# Only one worker process backfills at startup
+BACKFILL_LOCK_ID = 727002
+
+# Table whose emptiness (while reports exist) means the aggregate was never built
+BACKFILL_TABLES = {
+    "heatmap": "heatmap_cells",
+    "rollups": "report_daily_rollups",
+}
+
+async def _rebuild(db, targets: list):
+    if "heatmap" in targets:
+        await rebuild_heatmap(db)
+        print("Rebuilt heatmap cells")
+    if "rollups" in targets:
+        await rebuild_rollups(db)
+        print("Rebuilt daily and resolution rollups")
+    if "hotspots" in targets:
+        if await refresh_hotspots(db):
+            print("Re-clustered hotspots")
+        else:
+            print("Hotspots are being refreshed by another process, skipped")
+
+async def rebuild(targets: list):
+    """Recompute derived tables from the reports table."""
+    async with AsyncSessionLocal() as db:
+        await _rebuild(db, targets)
+        await db.commit()
+
+async def backfill_empty_aggregates():
+    """
+    Build aggregates that are still empty while reports exist, e.g. on the
+    first start after upgrading an existing database (called from main.py
+    startup). Hotspots need no backfill: the scheduler re-clusters on start.
+    """
+    async with AsyncSessionLocal() as db:
+        # Other workers wait here, then find the tables filled
+        await db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": BACKFILL_LOCK_ID})
+        if not await db.scalar(text("SELECT EXISTS (SELECT 1 FROM reports)")):
+            return
+        targets = [
+            name for name, table in BACKFILL_TABLES.items()
+            if not await db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {table})"))
+        ]
+        if targets:
+            print(f"Backfilling empty aggregates: {', '.join(targets)}")
+            await _rebuild(db, targets)
+            await db.commit()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild aggregates derived from reports.")
+    parser.add_argument("targets", nargs="*",
+                        help=f"Aggregates to rebuild: {', '.join(AGGREGATES)} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(AGGREGATES)
+    if unknown:
+        parser.error(f"unknown aggregates: {', '.join(sorted(unknown))}")
+
+    try:
+        await rebuild(args.targets or AGGREGATES)
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import time
+from sqlalchemy import or_, update
+from sqlalchemy.future import select
+from database import AsyncSessionLocal, engine
+from models import Report
+from utils.ai_client import embed_batch, close_ai_client, EMBEDDING_MODEL
+
+async def fetch_chunk(last_id: int, chunk_size: int, model_name: str, reembed_all: bool):
+    """Next chunk of reports needing an embedding, keyset-paginated on id."""
+    query = select(Report.id, Report.title, Report.description).where(Report.id > last_id)
+    if not reembed_all:
+        query = query.where(or_(
+            Report.embedding.is_(None),
+            Report.embedding_model.is_distinct_from(model_name)
+        ))
+    query = query.order_by(Report.id).limit(chunk_size)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(query)
+        return result.all()
+
+async def embed_chunk(rows, model_name: str):
+    texts = [f"{r.title}. {r.description}" for r in rows]
+    served_model, matrix = await embed_batch(texts)
+    if served_model != model_name:
+        raise RuntimeError(
+            f"ai-duplicate serves '{served_model}' but EMBEDDING_MODEL is '{model_name}'"
+        )
+    return rows, matrix
+
+async def write_chunk(rows, matrix, model_name: str):
+    """Write a chunk back with one executemany'd UPDATE by primary key."""
+    params = [
+        {"id": r.id, "embedding": vector, "embedding_model": model_name}
+        for r, vector in zip(rows, matrix)
+    ]
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Report), params)
+        await db.commit()
+
+async def reembed(chunk_size: int, concurrency: int, model_name: str, reembed_all: bool):
+    """
+    Backfill missing or stale report embeddings.
+
+    Reports are read in keyset-paginated chunks (id > last seen id), up to
+    `concurrency` chunks are embedded in parallel through /embed_batch and
+    each chunk is written back as a bulk UPDATE.
+    """
+    started = time.perf_counter()
+    last_id = 0
+    total = 0
+
+    while True:
+        # Read the next few chunks; keyset pagination keeps each read cheap
+        chunks = []
+        for _ in range(concurrency):
+            rows = await fetch_chunk(last_id, chunk_size, model_name, reembed_all)
+            if not rows:
+                break
+            chunks.append(rows)
+            last_id = rows[-1].id
+        if not chunks:
+            break
+
+        for rows, matrix in await asyncio.gather(*(embed_chunk(rows, model_name) for rows in chunks)):
+            await write_chunk(rows, matrix, model_name)
+            total += len(rows)
+
+        elapsed = time.perf_counter() - started
+        print(f"Embedded {total} reports (last id {last_id}, {total / elapsed:.0f} reports/s)")
+
+    print(f"Re-embedding complete: {total} reports in {time.perf_counter() - started:.1f}s")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill or refresh report embeddings in bulk.")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Reports per /embed_batch call")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chunks embedded in parallel")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Expected embedding model name")
+    parser.add_argument("--all", action="store_true", help="Re-embed every report, not just missing/stale ones")
+    args = parser.parse_args()
+
+    try:
+        await reembed(args.chunk_size, args.concurrency, args.model, args.all)
+    finally:
+        await close_ai_client()
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,239 +1,332 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text, func
+from sqlalchemy import func
 from sqlalchemy.future import select
-from database import get_db
-from models import User, UserRole, Report, ReportStatus, ReportPriority
-from routers.auth import get_current_user
+from database import get_read_db
+from models import (
+    UserRole, ReportStatus, ReportPriority, HotspotCluster,
+    ReportDailyRollup, ResolutionRollup,
+)
+from routers.auth import get_current_user, CurrentUser
+from utils.cache import analytics_cache
+from utils.rollups import RESOLUTION_BUCKETS
+from utils.heatmap import get_tile, get_densest_cells, HEATMAP_MAX_ZOOM, HEATMAP_CELL_BITS
+from utils.ai_client import generate_sql
+from utils.text_to_sql import normalize_question, validate_sql, stream_query, sql_cache, ask_engine, UnsafeQuery
+from utils.metrics import metrics
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
+import hashlib
+import json
+import os
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+HEATMAP_TILE_MAX_AGE = int(os.getenv("HEATMAP_TILE_MAX_AGE", 30))
+HEATMAP_DEFAULT_ZOOM = 12
+HEATMAP_DEFAULT_LIMIT = 500
+
+async def cached(key: tuple, compute):
+    """Return a cached analytics result, computing it on a miss."""
+    value = analytics_cache.get(key)
+    if value is None:
+        value = await compute()
+        analytics_cache.set(key, value)
+    return value
+
+async def _report_counts(db: AsyncSession) -> dict:
+    """
+    Total, per-status and per-priority report counts in a single pass over
+    the daily rollups, using one SUM(count) FILTER (WHERE ...) per bucket.
+    """
+    total = func.coalesce(func.sum(ReportDailyRollup.count), 0)
+    columns = [total.label("total")]
+    for s in ReportStatus:
+        columns.append(func.coalesce(
+            func.sum(ReportDailyRollup.count).filter(ReportDailyRollup.status == s), 0
+        ).label(f"status_{s.value}"))
+    for p in ReportPriority:
+        columns.append(func.coalesce(
+            func.sum(ReportDailyRollup.count).filter(ReportDailyRollup.priority == p), 0
+        ).label(f"priority_{p.value}"))
+
+    result = await db.execute(select(*columns))
+    row = result.one()._mapping
+    return {
+        "total": int(row["total"]),
+        "status": {s.value: int(row[f"status_{s.value}"]) for s in ReportStatus},
+        "priority": {p.value: int(row[f"priority_{p.value}"]) for p in ReportPriority},
+    }
+
+async def report_counts(db: AsyncSession) -> dict:
+    return await cached(("report_counts",), lambda: _report_counts(db))
+
 @router.get("/status-distribution")
 async def get_status_distribution(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get count of reports by status"""
-    query = select(
-        Report.status,
-        func.count(Report.id).label('count')
-    ).group_by(Report.status)
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    distribution = {row.status.value: row.count for row in rows}
+    counts = await report_counts(db)
+    distribution = {status: count for status, count in counts["status"].items() if count}
     
     return {"status_distribution": distribution}
 
 @router.get("/priority-distribution")
 async def get_priority_distribution(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get count of reports by priority"""
+    counts = await report_counts(db)
+    distribution = {priority: count for priority, count in counts["priority"].items() if count}
+    
+    return {"priority_distribution": distribution}
+
+async def _time_bound_stats(db: AsyncSession) -> dict:
+    # Resolved/closed reports by time-to-resolve, from the resolution rollups
     query = select(
-        Report.priority,
-        func.count(Report.id).label('count')
-    ).group_by(Report.priority)
+        ResolutionRollup.bucket,
+        func.sum(ResolutionRollup.count).label("count")
+    ).group_by(ResolutionRollup.bucket)
     
     result = await db.execute(query)
     rows = result.all()
     
-    distribution = {row.priority.value: row.count for row in rows}
+    stats = {row.bucket: int(row.count) for row in rows}
     
-    return {"priority_distribution": distribution}
+    # Ensure all categories exist
+    for category in RESOLUTION_BUCKETS:
+        if category not in stats:
+            stats[category] = 0
+    return stats
 
 @router.get("/time-bound-stats")
 async def get_time_bound_stats(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get resolution statistics within time bounds
     Categories: < 24h, < 7d, < 30d, > 30d
     """
-    # Query for resolved/closed reports with resolution time
-    query = text("""
-        SELECT 
-            CASE
-                WHEN updated_at - created_at < INTERVAL '1 day' THEN 'under_24h'
-                WHEN updated_at - created_at < INTERVAL '7 days' THEN 'under_7d'
-                WHEN updated_at - created_at < INTERVAL '30 days' THEN 'under_30d'
-                ELSE 'over_30d'
-            END as time_category,
-            COUNT(*) as count
-        FROM reports
-        WHERE status IN ('resolved', 'closed')
-        AND updated_at IS NOT NULL
-        GROUP BY time_category
-    """)
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    stats = {row.time_category: row.count for row in rows}
-    
-    # Ensure all categories exist
-    for category in ['under_24h', 'under_7d', 'under_30d', 'over_30d']:
-        if category not in stats:
-            stats[category] = 0
-    
+    stats = await cached(("time_bound_stats",), lambda: _time_bound_stats(db))
     return {"time_bound_stats": stats}
 
+def _parse_filters(status: Optional[str], priority: Optional[str]):
+    try:
+        status_enum = ReportStatus[status] if status else None
+        priority_enum = ReportPriority[priority] if priority else None
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Unknown status or priority")
+    return status_enum, priority_enum
+
 @router.get("/heatmap-data")
 async def get_heatmap_data(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
     status: Optional[str] = None,
-    priority: Optional[str] = None
+    priority: Optional[str] = None,
+    zoom: int = Query(HEATMAP_DEFAULT_ZOOM, ge=0, le=HEATMAP_MAX_ZOOM, description="Map zoom the grid cells are sized for"),
+    limit: int = Query(HEATMAP_DEFAULT_LIMIT, ge=1, le=5000)
 ):
     """
     Get geographic data for heatmap visualization
-    Returns lat/lon coordinates with intensity (report count)
+    Returns the densest grid cells (center lat/lon) with intensity (report count)
     """
-    # Build query with optional filters
-    conditions = []
-    if status:
-        conditions.append(f"status = '{status}'")
-    if priority:
-        conditions.append(f"priority = '{priority}'")
-    
-    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-    
-    query = text(f"""
-        SELECT 
-            ST_Y(location::geometry) as latitude,
-            ST_X(location::geometry) as longitude,
-            COUNT(*) as intensity,
-            priority,
-            status
-        FROM reports
-        {where_clause}
-        GROUP BY ST_Y(location::geometry), ST_X(location::geometry), priority, status
-        ORDER BY intensity DESC
-        LIMIT 500
-    """)
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    heatmap_points = [
-        {
-            "latitude": row.latitude,
-            "longitude": row.longitude,
-            "intensity": row.intensity,
-            "priority": row.priority,
-            "status": row.status
-        }
-        for row in rows
-    ]
-    
+    status_enum, priority_enum = _parse_filters(status, priority)
+    heatmap_points = await cached(
+        ("heatmap_data", zoom, limit, status_enum, priority_enum),
+        lambda: get_densest_cells(db, zoom, limit, status_enum, priority_enum)
+    )
     return {"heatmap_data": heatmap_points}
 
+@router.get("/heatmap/{z}/{x}/{y}")
+async def get_heatmap_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    status: Optional[str] = None,
+    priority: Optional[str] = None
+):
+    """
+    Heatmap tile z/x/y (web-mercator / slippy map numbering).
+    Cells come from the incrementally maintained heatmap_cells table, so a
+    tile costs one index range scan no matter how many reports it covers.
+    """
+    if not 0 <= z <= HEATMAP_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    status_enum, priority_enum = _parse_filters(status, priority)
+
+    cells = await get_tile(db, z, x, y, status_enum, priority_enum)
+    body = json.dumps({"z": z, "x": x, "y": y, "cell_bits": HEATMAP_CELL_BITS, "cells": cells})
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={HEATMAP_TILE_MAX_AGE}"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/trend-analysis")
 async def get_trend_analysis(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-    days: int = Query(30, description="Number of days to analyze")
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    days: int = Query(30, ge=1, le=3650, description="Number of days to analyze")
 ):
-    """Get report trends over time"""
-    query = text(f"""
-        SELECT 
-            DATE(created_at) as date,
-            COUNT(*) as count,
-            status
-        FROM reports
-        WHERE created_at >= NOW() - INTERVAL '{days} days'
-        GROUP BY DATE(created_at), status
-        ORDER BY date DESC
-    """)
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
-    # Group by date
-    trends = {}
-    for row in rows:
-        date_str = row.date.isoformat()
-        if date_str not in trends:
-            trends[date_str] = {}
-        trends[date_str][row.status] = row.count
-    
+    """Get report trends over time (from the daily rollups: O(days), not O(reports))"""
+    async def compute():
+        query = select(
+            ReportDailyRollup.day,
+            ReportDailyRollup.status,
+            func.sum(ReportDailyRollup.count).label("count")
+        ).where(
+            ReportDailyRollup.day >= func.current_date() - days
+        ).group_by(
+            ReportDailyRollup.day, ReportDailyRollup.status
+        ).having(
+            func.sum(ReportDailyRollup.count) > 0
+        ).order_by(ReportDailyRollup.day.desc())
+
+        result = await db.execute(query)
+        rows = result.all()
+
+        # Group by date
+        trends = {}
+        for row in rows:
+            date_str = row.day.isoformat()
+            if date_str not in trends:
+                trends[date_str] = {}
+            trends[date_str][row.status.value] = int(row.count)
+        return trends
+
+    trends = await cached(("trend_analysis", days), compute)
     return {"trend_data": trends, "days": days}
 
 @router.get("/predictive-maintenance")
 async def predictive_maintenance(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    category: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
 ):
     """
     Identify hotspots for predictive maintenance.
-    Aggregates reports by location and category to find recurring issues.
+    Reads the density clusters of recent reports precomputed per category
+    (utils/hotspots.py), largest first.
     """
     if current_user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Query to find clusters of reports
-    query = text("""
-        SELECT 
-            category,
-            COUNT(*) as count,
-            AVG(ST_X(location::geometry)) as avg_lon,
-            AVG(ST_Y(location::geometry)) as avg_lat,
-            priority
-        FROM reports
-        WHERE created_at > NOW() - INTERVAL '30 days'
-        GROUP BY category, priority
-        HAVING COUNT(*) > 2
-        ORDER BY count DESC, priority DESC
-    """)
-    
+    query = select(HotspotCluster)
+    if category:
+        query = query.where(HotspotCluster.category == category)
+    query = query.order_by(
+        HotspotCluster.report_count.desc(), HotspotCluster.priority.desc()
+    ).limit(limit)
+
     result = await db.execute(query)
     hotspots = []
-    for row in result:
+    for cluster in result.scalars().all():
         hotspots.append({
-            "category": row.category,
-            "report_count": row.count,
-            "location": {"lat": row.avg_lat, "lon": row.avg_lon},
-            "priority": row.priority,
-            "recommendation": f"Schedule maintenance for {row.category} in this area."
+            "category": cluster.category,
+            "report_count": cluster.report_count,
+            "location": {"lat": cluster.latitude, "lon": cluster.longitude},
+            "radius_m": cluster.radius_m,
+            "priority": cluster.priority.value if cluster.priority else None,
+            "first_report_at": cluster.first_report_at,
+            "last_report_at": cluster.last_report_at,
+            "computed_at": cluster.computed_at,
+            "recommendation": f"Schedule maintenance for {cluster.category} in this area."
         })
         
     return {"hotspots": hotspots}
 
+def _summary(counts: dict) -> dict:
+    total_reports = counts["total"]
+    resolved_reports = counts["status"]["resolved"] + counts["status"]["closed"]
+    return {
+        "total_reports": total_reports,
+        "pending_reports": counts["status"]["pending"],
+        "in_progress_reports": counts["status"]["in_progress"],
+        "resolved_reports": resolved_reports,
+        "critical_reports": counts["priority"]["critical"],
+        "resolution_rate": (resolved_reports / total_reports * 100) if total_reports > 0 else 0
+    }
+
 @router.get("/summary")
 async def get_summary_stats(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get overall summary statistics"""
-    # Total reports
-    total_query = select(func.count(Report.id))
-    total_result = await db.execute(total_query)
-    total_reports = total_result.scalar()
-    
-    # Pending reports
-    pending_query = select(func.count(Report.id)).where(Report.status == ReportStatus.pending)
-    pending_result = await db.execute(pending_query)
-    pending_reports = pending_result.scalar()
-    
-    # Resolved reports
-    resolved_query = select(func.count(Report.id)).where(Report.status.in_([ReportStatus.resolved, ReportStatus.closed]))
-    resolved_result = await db.execute(resolved_query)
-    resolved_reports = resolved_result.scalar()
-    
-    # Critical priority reports
-    critical_query = select(func.count(Report.id)).where(Report.priority == ReportPriority.critical)
-    critical_result = await db.execute(critical_query)
-    critical_reports = critical_result.scalar()
-    
+    return _summary(await report_counts(db))
+
+@router.get("/dashboard")
+async def get_dashboard(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Everything the admin dashboard shows, in one response: summary,
+    status/priority distributions, resolution times and heatmap points.
+    """
+    counts = await report_counts(db)
+    time_bound = await cached(("time_bound_stats",), lambda: _time_bound_stats(db))
+    heatmap_points = await cached(
+        ("heatmap_data", HEATMAP_DEFAULT_ZOOM, HEATMAP_DEFAULT_LIMIT, None, None),
+        lambda: get_densest_cells(db, HEATMAP_DEFAULT_ZOOM, HEATMAP_DEFAULT_LIMIT, None, None)
+    )
     return {
-        "total_reports": total_reports,
-        "pending_reports": pending_reports,
-        "resolved_reports": resolved_reports,
-        "critical_reports": critical_reports,
-        "resolution_rate": (resolved_reports / total_reports * 100) if total_reports > 0 else 0
+        "summary": _summary(counts),
+        "status_distribution": {k: v for k, v in counts["status"].items() if v},
+        "priority_distribution": {k: v for k, v in counts["priority"].items() if v},
+        "time_bound_stats": time_bound,
+        "heatmap_data": heatmap_points,
     }
+
+class AskRequest(BaseModel):
+    question: str
+
+@router.post("/ask")
+async def ask(
+    request: AskRequest,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Answer a natural-language question with a generated, validated,
+    read-only SQL query. Streams NDJSON: a header with the SQL and columns,
+    one line per row, then a footer (row_count, truncated).
+    """
+    if current_user.role != UserRole.admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if ask_engine is None:
+        raise HTTPException(status_code=503, detail="Ask is disabled: ASK_DATABASE_URL is not configured")
+    question = normalize_question(request.question)
+    if not question:
+        raise HTTPException(status_code=400, detail="Question is empty")
+
+    sql = sql_cache.get(question)
+    sql_cached = sql is not None
+    if sql is None:
+        metrics.incr("ask.sql_generated")
+        try:
+            generated = await generate_sql(question)
+        except Exception as e:
+            print(f"SQL generation failed: {e}")
+            raise HTTPException(status_code=502, detail="Could not generate SQL for this question")
+        try:
+            sql = validate_sql(generated)
+        except UnsafeQuery as e:
+            metrics.incr("ask.rejected")
+            raise HTTPException(status_code=400, detail=f"Generated query rejected: {e}")
+        sql_cache.set(question, sql)
+
+    return StreamingResponse(
+        stream_query(sql, {"question": question, "sql_cached": sql_cached}),
+        media_type="application/x-ndjson",
+    )
@@ -3,23 +3,88 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
 from database import get_db
 from models import User, UserRole
 from schemas import UserCreate, UserResponse, Token
-from utils.security import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.security import verify_password_async, get_password_hash_async, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from jose import JWTError, jwt
 from utils.security import SECRET_KEY, ALGORITHM
 import os
 import httpx
 from fastapi.responses import RedirectResponse
+from sqlalchemy import event
+from utils.cache import TTLCache
+from utils.metrics import metrics
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: AsyncSession = Depends(get_db)):
+# Each request checks its token against the user's current id, role and
+# token_version, looked up by email through this cache. An entry is at most
+# AUTH_USER_CACHE_TTL seconds old, which bounds how long another worker
+# keeps honouring a token after a role change, password change or deletion.
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 15))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+user_cache = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL)
+
+class CurrentUser:
+    """
+    The authenticated user as seen by request handlers: a read-only
+    snapshot of the users row, not an ORM instance (load User by id to
+    change it).
+    """
+    __slots__ = ("id", "email", "name", "role", "token_version")
+
+    def __init__(self, id: int, email: str, name: Optional[str], role: UserRole, token_version: int):
+        self.id = id
+        self.email = email
+        self.name = name
+        self.role = role
+        self.token_version = token_version
+
+def invalidate_user(email: str):
+    """Drop this process's cached snapshot of a user (other processes expire theirs by TTL)."""
+    user_cache.pop(email)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.email)
+
+def token_access_claims(user: User) -> dict:
+    """Claims tying the token to the user's current token_version."""
+    return {"sub": user.email, "uid": user.id, "role": user.role.value, "ver": user.token_version or 0}
+
+async def load_current_user(db: AsyncSession, email: str) -> Optional[CurrentUser]:
+    cached = user_cache.get(email)
+    if cached is not None:
+        metrics.incr("auth.cache_hit")
+        return cached
+
+    metrics.incr("auth.cache_miss")
+    result = await db.execute(
+        select(User.id, User.email, User.name, User.role, User.token_version).where(User.email == email)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    user = CurrentUser(row.id, row.email, row.name, row.role, row.token_version)
+    user_cache.set(email, user)
+    return user
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: AsyncSession = Depends(get_db)) -> CurrentUser:
+    """
+    Resolve the bearer token to the current user, usually without a query.
+
+    The token is only accepted while its `ver` claim matches the user's
+    token_version, which the database bumps on every role, email or
+    password change (see init_db.ensure_schema), so demotions and deleted
+    accounts take effect within AUTH_USER_CACHE_TTL in every process. The
+    role always comes from the database, never from the token.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -32,11 +97,15 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: As
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    result = await db.execute(select(User).where(User.email == email))
-    user = result.scalars().first()
+
+    user = await load_current_user(db, email)
     if user is None:
         raise credentials_exception
+    uid = payload.get("uid")
+    # Tokens from before token_version existed carry no `ver`: valid until the first change
+    if payload.get("ver", 0) != user.token_version or (uid is not None and uid != user.id):
+        metrics.incr("auth.revoked")
+        raise credentials_exception
     return user
 
 @router.post("/register", response_model=UserResponse)
@@ -45,7 +114,7 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     if result.scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     new_user = User(
         email=user.email, 
         hashed_password=hashed_password,
@@ -62,7 +131,7 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db:
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -71,7 +140,7 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db:
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_access_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -143,7 +212,7 @@ async def google_callback(code: str, db: AsyncSession = Depends(get_db)):
             # unless they do a "forgot password" flow later (if implemented)
             import secrets
             random_password = secrets.token_urlsafe(32)
-            hashed_password = get_password_hash(random_password)
+            hashed_password = await get_password_hash_async(random_password)
             
             user = User(
                 email=email,
@@ -158,7 +227,7 @@ async def google_callback(code: str, db: AsyncSession = Depends(get_db)):
         # 4. Create JWT token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         jwt_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data=token_access_claims(user), expires_delta=access_token_expires
         )
         
         # 5. Redirect to frontend with token
@@ -1,122 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, or_, and_
 from geoalchemy2 import WKTElement
-from geoalchemy2.shape import to_shape
 from typing import List, Optional
-import httpx
+from datetime import datetime
+import base64
+import csv
+import enum
+import io
+import json
 import os
-from database import get_db
-from models import Report, User, UserRole, ReportStatus, ReportSeverity, ReportPriority, Department, FieldTeam
-from schemas import ReportCreate, ReportResponse, ReportUpdate
-from routers.auth import get_current_user
+from database import get_db, get_read_db, read_sessionmaker
+from models import Report, UserRole, ReportStatus, ReportPriority, FieldTeam
+from schemas import ReportCreate, ReportResponse, ReportUpdate, DuplicateResponse
+from routers.auth import get_current_user, CurrentUser
+from utils.ai_client import enrich_report, EMBEDDING_MODEL
+from utils import report_events
+from utils.duplicates import find_duplicates, DUPLICATE_RADIUS_M, DUPLICATE_MIN_SIMILARITY, DUPLICATE_LIMIT
+from utils.departments import department_registry
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
-# AI Service URLs
-AI_DUPLICATE_URL = os.getenv("AI_DUPLICATE_URL", "http://ai-duplicate:9001")
-
-async def auto_assign_department(category: str, db: AsyncSession) -> Optional[int]:
-    """Map category to department."""
-    # Simple mapping for MVP
-    mapping = {
-        "pothole": "Roads",
-        "street_light": "Electrical",
-        "garbage": "Sanitation",
-        "flooding": "Drainage",
-        "graffiti": "Sanitation"
-    }
-    dept_name = mapping.get(category)
-    if dept_name:
-        result = await db.execute(select(Department).where(Department.name == dept_name))
-        dept = result.scalars().first()
-        if dept:
-            return dept.id
-    return None
-
-async def predict_severity(text: str) -> ReportSeverity:
-    """Predict severity using AI service."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{AI_DUPLICATE_URL}/predict_severity",
-                json={"text": text},
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                result = response.json()
-                severity_str = result['severity']
-                # Map string to enum
-                if severity_str in ReportSeverity.__members__:
-                    return ReportSeverity[severity_str]
-    except Exception as e:
-        print(f"Severity prediction failed: {e}")
-
-    # Fallback logic
-    text_lower = text.lower()
-    if "danger" in text_lower or "accident" in text_lower or "huge" in text_lower:
-        return ReportSeverity.critical
-    if "urgent" in text_lower:
-        return ReportSeverity.high
-    return ReportSeverity.medium
+async def auto_assign_department(category: str) -> Optional[int]:
+    """Map category to department (in-memory, see utils/departments.py)."""
+    return await department_registry.department_id(category)
 
 @router.post("/", response_model=ReportResponse)
 async def create_report(
     report: ReportCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     # Create WKT point from lat/lon
     # Note: PostGIS uses (lon, lat) order for points
     location_wkt = f"POINT({report.longitude} {report.latitude})"
     
-    # Auto-predict category if not provided or is generic
-    predicted_category = report.category
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{AI_DUPLICATE_URL}/predict_category",
-                json={"text": f"{report.title}. {report.description}"},
-                timeout=10.0
-            )
-            if response.status_code == 200:
-                result = response.json()
-                if result['confidence'] > 0.6:  # Only use if confident
-                    predicted_category = result['category']
-    except Exception as e:
-        print(f"Category prediction failed: {e}")
-    
+    # Category, severity, priority and embedding are predicted concurrently
+    # under one deadline; each field falls back independently on failure.
+    enrichment = await enrich_report(
+        report.title, report.description, report.category,
+        report.latitude, report.longitude
+    )
+    predicted_category = enrichment["category"]
+    severity = enrichment["severity"]
+    priority = enrichment["priority"]
 
-    
     # Auto-assign Department
-    department_id = await auto_assign_department(predicted_category, db)
-    
-    # Predict Severity
-    severity = await predict_severity(f"{report.title}. {report.description}")
-
-    # Predict Priority (location-based + upvotes)
-    priority = ReportPriority.medium  # Default
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{AI_DUPLICATE_URL}/predict_priority",
-                json={
-                    "text": f"{report.title}. {report.description}",
-                    "latitude": report.latitude,
-                    "longitude": report.longitude,
-                    "upvotes": 0  # New report, no upvotes yet
-                },
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                result = response.json()
-                priority_str = result['priority']
-                if priority_str in ReportPriority.__members__:
-                    priority = ReportPriority[priority_str]
-                print(f"Priority prediction: {priority_str}, factors: {result.get('factors', {})}")
-    except Exception as e:
-        print(f"Priority prediction failed: {e}")
+    department_id = await auto_assign_department(predicted_category)
 
     new_report = Report(
         title=report.title,
@@ -124,6 +56,7 @@ async def create_report(
         category=predicted_category,
         severity=severity,
         priority=priority,
+        priority_text_score=enrichment["priority_text_score"],
         status=ReportStatus.pending,
         image_url=report.image_url,
         location=WKTElement(location_wkt, srid=4326),
@@ -131,43 +64,68 @@ async def create_report(
         department_id=department_id
     )
     
-    # TODO: Trigger AI duplicate check here (async task or direct call)
-    # For now, we'll add it as a synchronous call for MVP
-    try:
-        async with httpx.AsyncClient() as client:
-            # Get embedding for the new report
-            embed_response = await client.post(
-                f"{AI_DUPLICATE_URL}/embed",
-                json={"text": f"{report.title}. {report.description}"},
-                timeout=10.0
-            )
-            if embed_response.status_code == 200:
-                embedding = embed_response.json()["embedding"]
-                new_report.embedding = embedding
-    except Exception as e:
-        print(f"Embedding generation failed: {e}")
+    if enrichment["embedding"] is not None:
+        new_report.embedding = enrichment["embedding"]
+        new_report.embedding_model = EMBEDDING_MODEL
     
     db.add(new_report)
+    await db.flush()
+    await report_events.report_created(db, new_report)
     await db.commit()
     await db.refresh(new_report)
+
+    new_report.latitude = report.latitude
+    new_report.longitude = report.longitude
+    if new_report.embedding is not None:
+        new_report.possible_duplicates = await find_duplicates(
+            db, new_report.embedding, report.latitude, report.longitude,
+            exclude_id=new_report.id
+        )
     return new_report
 
-@router.get("/", response_model=List[ReportResponse])
-async def get_reports(
+# Columns of ReportResponse, with lat/lon computed in SQL so the
+# geometry and the 384-float embedding never leave the database
+REPORT_COLUMNS = (
+    Report.id,
+    Report.title,
+    Report.description,
+    Report.category,
+    Report.status,
+    Report.severity,
+    Report.priority,
+    Report.image_url,
+    Report.resolution_image_url,
+    Report.citizen_feedback,
+    Report.upvotes,
+    Report.created_at,
+    Report.user_id,
+    Report.department_id,
+    Report.assigned_team_id,
+    func.coalesce(func.ST_Y(Report.location), 0.0).label("latitude"),
+    func.coalesce(func.ST_X(Report.location), 0.0).label("longitude"),
+)
+
+REPORTS_PAGE_DEFAULT = int(os.getenv("REPORTS_PAGE_DEFAULT", 200))
+REPORTS_PAGE_MAX = int(os.getenv("REPORTS_PAGE_MAX", 1000))
+
+SORT_COLUMNS = {
+    "created_at": Report.created_at,
+    "upvotes": Report.upvotes,
+    "priority": Report.priority,  # Enum order: low < medium < high < critical
+}
+
+def filter_reports(
+    query,
     lat: Optional[float] = None,
     lon: Optional[float] = None,
-    radius: Optional[float] = Query(None, description="Radius in meters"),
+    radius: Optional[float] = None,
     category: Optional[str] = None,
     status: Optional[str] = None,
     priority: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    sort_by: Optional[str] = Query("created_at", description="Sort by: created_at, upvotes, priority"),
-    sort_order: Optional[str] = Query("desc", description="asc or desc"),
-    db: AsyncSession = Depends(get_db)
 ):
-    query = select(Report)
-    
+    """Apply the report list filters shared by listing and export."""
     # Category filter
     if category:
         query = query.where(Report.category == category)
@@ -194,70 +152,231 @@ async def get_reports(
     if end_date:
         query = query.where(Report.created_at <= end_date)
         
-    # Location-based filter
+    # Location-based filter (served by the geography(location) index)
     if lat is not None and lon is not None and radius is not None:
-        pt = WKTElement(f"POINT({lon} {lat})", srid=4326)
         query = query.where(
             func.ST_DWithin(
-                Report.location.cast(func.geography),
-                func.ST_GeogFromText(f"SRID=4326;POINT({lon} {lat})"),
+                func.geography(Report.location),
+                func.geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326)),
                 radius
             )
         )
-    
-    # Sorting
-    if sort_by == "upvotes":
-        order_col = Report.upvotes
+    return query
+
+def encode_cursor(row, sort_by: str) -> str:
+    value = getattr(row, sort_by)
+    if sort_by == "created_at":
+        value = value.isoformat()
     elif sort_by == "priority":
-        # Custom ordering for priority enum
-        order_col = Report.priority
-    else:
-        order_col = Report.created_at
-    
-    if sort_order == "asc":
-        query = query.order_by(order_col.asc())
-    else:
-        query = query.order_by(order_col.desc())
-    
-    result = await db.execute(query)
-    reports = result.scalars().all()
+        value = value.name
+    payload = json.dumps([value, row.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(cursor: str, sort_by: str):
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_by == "created_at":
+            value = datetime.fromisoformat(value)
+        elif sort_by == "priority":
+            value = ReportPriority[value]
+        return value, int(last_id)
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_report(db: AsyncSession, report_id: int):
+    """One report, projected to the ReportResponse columns."""
+    result = await db.execute(select(*REPORT_COLUMNS).where(Report.id == report_id))
+    return result.first()
+
+@router.get("/", response_model=List[ReportResponse])
+async def get_reports(
+    response: Response,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    radius: Optional[float] = Query(None, description="Radius in meters"),
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    sort_by: Optional[str] = Query("created_at", description="Sort by: created_at, upvotes, priority"),
+    sort_order: Optional[str] = Query("desc", description="asc or desc"),
+    limit: int = Query(REPORTS_PAGE_DEFAULT, ge=1, le=REPORTS_PAGE_MAX, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List reports, one page at a time.
+
+    Pages are keyset-paginated on (sort column, id): pass the X-Next-Cursor
+    response header back as `cursor` to get the next page. The header is
+    absent on the last page.
+    """
+    query = filter_reports(
+        select(*REPORT_COLUMNS),
+        lat, lon, radius, category, status, priority, start_date, end_date
+    )
     
-    # Convert geometry to lat/lon
-    response_reports = []
-    for r in reports:
-        if r.location is not None:
-            point = to_shape(r.location)
-            r.latitude = point.y
-            r.longitude = point.x
+    # Sorting (id breaks ties so the cursor position is unique)
+    if sort_by not in SORT_COLUMNS:
+        sort_by = "created_at"
+    order_col = SORT_COLUMNS[sort_by]
+    descending = sort_order != "asc"
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by)
+        if descending:
+            query = query.where(or_(order_col < value, and_(order_col == value, Report.id < last_id)))
         else:
-            r.latitude = 0.0
-            r.longitude = 0.0
-        
-        response_reports.append(r)
+            query = query.where(or_(order_col > value, and_(order_col == value, Report.id > last_id)))
+
+    if descending:
+        query = query.order_by(order_col.desc(), Report.id.desc())
+    else:
+        query = query.order_by(order_col.asc(), Report.id.asc())
+
+    # Fetch one extra row to know whether there is a next page
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1], sort_by)
+
+    return [dict(row._mapping) for row in rows]
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
 
-    return response_reports
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "geojson": ("application/geo+json", "geojson"),
+}
+
+EXPORT_FIELDS = [column.key for column in REPORT_COLUMNS]
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def _export_chunk(rows, fmt: str, first: bool) -> str:
+    """Serialize one chunk of rows in the requested format."""
+    records = [{key: _export_value(value) for key, value in row._mapping.items()} for row in rows]
+    if fmt == "ndjson":
+        return "".join(json.dumps(record) + "\n" for record in records)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writerows(records)
+        return buffer.getvalue()
+    # GeoJSON features, comma-separated across chunks
+    features = []
+    for record in records:
+        lon, lat = record.pop("longitude"), record.pop("latitude")
+        features.append(json.dumps({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": record,
+        }))
+    return ("" if first else ",") + ",".join(features)
+
+async def stream_export(query, fmt: str, session_factory):
+    """
+    Yield the export incrementally from a server-side cursor.
+
+    Runs in its own session: the request's get_db session is closed before
+    a streaming response body is sent.
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS).writeheader()
+        yield buffer.getvalue()
+    elif fmt == "geojson":
+        yield '{"type": "FeatureCollection", "features": ['
+
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        first = True
+        async for rows in result.partitions():
+            yield _export_chunk(rows, fmt, first)
+            first = False
+
+    if fmt == "geojson":
+        yield "]}"
+
+@router.get("/export")
+async def export_reports(
+    request: Request,
+    format: str = Query("ndjson", description="ndjson, csv or geojson"),
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    radius: Optional[float] = Query(None, description="Radius in meters"),
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """
+    Bulk export of reports, with the same filters as GET /reports.
+    Rows are streamed as they are read, so memory stays flat for any size.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    media_type, extension = EXPORT_FORMATS[format]
+
+    query = filter_reports(
+        select(*REPORT_COLUMNS),
+        lat, lon, radius, category, status, priority, start_date, end_date
+    ).order_by(Report.id)
+
+    return StreamingResponse(
+        stream_export(query, format, read_sessionmaker(request)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="reports.{extension}"'},
+    )
 
 @router.get("/{report_id}", response_model=ReportResponse)
 async def get_report(report_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Report).where(Report.id == report_id))
-    report = result.scalars().first()
+    report = await fetch_report(db, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
-    
-    if report.location is not None:
-        point = to_shape(report.location)
-        report.latitude = point.y
-        report.longitude = point.x
-    else:
-        report.latitude = 0.0
-        report.longitude = 0.0
-    return report
+    return dict(report._mapping)
+
+@router.get("/{report_id}/duplicates", response_model=List[DuplicateResponse])
+async def get_report_duplicates(
+    report_id: int,
+    radius: float = Query(DUPLICATE_RADIUS_M, description="Radius in meters"),
+    min_similarity: float = Query(DUPLICATE_MIN_SIMILARITY, ge=0.0, le=1.0),
+    limit: int = Query(DUPLICATE_LIMIT, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """Likely duplicates of a report: similar open reports nearby."""
+    result = await db.execute(
+        select(
+            Report.embedding,
+            func.ST_Y(Report.location).label("latitude"),
+            func.ST_X(Report.location).label("longitude"),
+        ).where(Report.id == report_id)
+    )
+    report = result.first()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if report.embedding is None or report.latitude is None:
+        return []
+
+    return await find_duplicates(
+        db, report.embedding, report.latitude, report.longitude,
+        radius=radius, min_similarity=min_similarity, limit=limit, exclude_id=report_id
+    )
 
 @router.post("/{report_id}/verify", response_model=ReportResponse)
 async def verify_report(
     report_id: int,
     feedback: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Citizen verifies the resolution."""
@@ -272,17 +391,19 @@ async def verify_report(
     if report.status != ReportStatus.resolved:
         raise HTTPException(status_code=400, detail="Report is not in resolved state")
 
+    old_status = report.status
     report.status = ReportStatus.closed
     report.citizen_feedback = feedback
+    await db.flush()
+    await report_events.report_status_changed(db, report, old_status)
     await db.commit()
-    await db.refresh(report)
-    return report
+    return dict((await fetch_report(db, report_id))._mapping)
 
 @router.post("/{report_id}/reopen", response_model=ReportResponse)
 async def reopen_report(
     report_id: int,
     feedback: str,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Citizen rejects resolution and reopens report."""
@@ -294,8 +415,10 @@ async def reopen_report(
     if report.user_id != current_user.id and current_user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    old_status = report.status
     report.status = ReportStatus.reopened
     report.citizen_feedback = feedback
+    await db.flush()
+    await report_events.report_status_changed(db, report, old_status)
     await db.commit()
-    await db.refresh(report)
-    return report
+    return dict((await fetch_report(db, report_id))._mapping)
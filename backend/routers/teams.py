@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, update
+from typing import List
+from database import get_db
+from models import UserRole, Report, FieldTeam
+from schemas import TeamLocationUpdate, FieldTeamResponse, NearestTeamResponse, DispatchResponse
+from routers.auth import get_current_user, CurrentUser
+from utils.dispatch import team_index, dispatch_pending
+import time
+
+router = APIRouter(prefix="/teams", tags=["teams"])
+
+TEAM_STATUSES = ("active", "busy", "offline")
+
+def require_admin(current_user: CurrentUser):
+    if current_user.role != UserRole.admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+@router.post("/{team_id}/location", response_model=FieldTeamResponse)
+async def update_team_location(
+    team_id: int,
+    ping: TeamLocationUpdate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Location (and optionally status) ping from a field team."""
+    require_admin(current_user)
+    if ping.status is not None and ping.status not in TEAM_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(TEAM_STATUSES)}")
+
+    values = {"current_lat": ping.latitude, "current_lon": ping.longitude}
+    if ping.status is not None:
+        values["status"] = ping.status
+    result = await db.execute(
+        update(FieldTeam).where(FieldTeam.id == team_id).values(**values).returning(
+            FieldTeam.id, FieldTeam.name, FieldTeam.status,
+            FieldTeam.current_lat, FieldTeam.current_lon, FieldTeam.department_id
+        )
+    )
+    team = result.first()
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+    await db.commit()
+
+    await team_index.ensure_fresh()
+    team_index.upsert(team.id, team.name, team.department_id, team.status, team.current_lat, team.current_lon)
+    return dict(team._mapping)
+
+@router.get("/nearest", response_model=List[NearestTeamResponse])
+async def nearest_teams(
+    report_id: int,
+    k: int = Query(5, ge=1, le=50),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """The k nearest free teams of the report's department."""
+    require_admin(current_user)
+    result = await db.execute(
+        select(
+            Report.department_id,
+            func.ST_Y(Report.location).label("latitude"),
+            func.ST_X(Report.location).label("longitude"),
+        ).where(Report.id == report_id)
+    )
+    report = result.first()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if report.department_id is None or report.latitude is None:
+        return []
+
+    await team_index.ensure_fresh()
+    return [
+        {
+            "id": team.id,
+            "name": team.name,
+            "department_id": team.department_id,
+            "latitude": team.lat,
+            "longitude": team.lon,
+            "open_assignments": team.load,
+            "distance_m": distance,
+        }
+        for distance, team in team_index.nearest(report.department_id, report.latitude, report.longitude, k)
+    ]
+
+@router.post("/dispatch", response_model=DispatchResponse)
+async def dispatch_reports(
+    limit: int = Query(1000, ge=1, le=10000, description="Pending reports to consider"),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Assign pending reports, highest priority first, to their nearest free team."""
+    require_admin(current_user)
+    started = time.perf_counter()
+    assignments = await dispatch_pending(db, limit)
+    return {
+        "assigned": [
+            {"report_id": report_id, "team_id": team_id, "distance_m": distance}
+            for report_id, team_id, distance in assignments
+        ],
+        "elapsed_ms": (time.perf_counter() - started) * 1000.0,
+    }
@@ -1,90 +1,99 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from sqlalchemy import text
 from database import get_db
-from models import Vote, Report, User
-from routers.auth import get_current_user
+from routers.auth import get_current_user, CurrentUser
+from utils.vote_buffer import vote_buffer, VOTE_WRITE_BEHIND
+from utils.priority import priority_worker
 
 router = APIRouter(prefix="/reports", tags=["votes"])
 
+# Serializes votes by the same user on the same report. It must be its own
+# statement: the vote statement below then takes a fresh snapshot that sees
+# the other vote's row. Without it, two concurrent first votes both find no
+# previous vote, the second upsert turns into an update, and both count +1.
+VOTE_LOCK_SQL = text("SELECT pg_advisory_xact_lock(:user_id, :report_id)")
+
+# Records a vote and computes its effect on reports.upvotes in one statement
+# (run after VOTE_LOCK_SQL, in the same transaction).
+# Casting the same vote again removes it; casting the opposite vote flips it.
+# `delta` is the change in upvotes: +1 when an upvote appears, -1 when one
+# goes away, 0 for downvote-only changes. The report row is only touched
+# by the final UPDATE, which applies the delta atomically.
+VOTE_CTE = """
+    WITH target AS (
+        SELECT id FROM reports WHERE id = :report_id
+    ),
+    previous AS (
+        SELECT value FROM votes
+        WHERE user_id = :user_id AND report_id = :report_id
+    ),
+    removed AS (
+        DELETE FROM votes
+        WHERE user_id = :user_id AND report_id = :report_id AND value = :value
+        RETURNING value
+    ),
+    upserted AS (
+        INSERT INTO votes (user_id, report_id, value)
+        SELECT :user_id, :report_id, :value FROM target
+        WHERE NOT EXISTS (SELECT 1 FROM previous WHERE value = :value)
+        ON CONFLICT (user_id, report_id) DO UPDATE SET value = EXCLUDED.value
+        RETURNING value
+    ),
+    delta AS (
+        SELECT (SELECT COUNT(*) FROM upserted WHERE value = 1)
+             - (SELECT COUNT(*) FROM previous WHERE value = 1) AS upvotes
+    )
+"""
+
+VOTE_SQL = text(VOTE_CTE + """
+    UPDATE reports SET upvotes = GREATEST(COALESCE(upvotes, 0) + (SELECT upvotes FROM delta), 0)
+    WHERE id = :report_id
+    RETURNING upvotes, (SELECT upvotes FROM delta) AS delta
+""")
+
+# Write-behind variant: record the vote, return the delta, leave the counter
+# to the vote buffer so the hot report row isn't locked by every vote
+VOTE_BUFFERED_SQL = text(VOTE_CTE + """
+    SELECT COALESCE(upvotes, 0) AS upvotes, (SELECT upvotes FROM delta) AS delta
+    FROM reports WHERE id = :report_id
+""")
+
+async def cast_vote(db: AsyncSession, report_id: int, user_id: int, value: int) -> int:
+    """Apply a vote and return the report's upvote count."""
+    buffered = VOTE_WRITE_BEHIND and vote_buffer.is_hot(report_id)
+    params = {"report_id": report_id, "user_id": user_id, "value": value}
+
+    await db.execute(VOTE_LOCK_SQL, {"user_id": user_id, "report_id": report_id})
+    result = await db.execute(VOTE_BUFFERED_SQL if buffered else VOTE_SQL, params)
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    await db.commit()
+
+    if buffered:
+        vote_buffer.add(report_id, row.delta)
+    if row.delta:
+        # Priority depends on upvotes; re-scored in the background
+        priority_worker.mark(report_id)
+    return max(0, row.upvotes + vote_buffer.pending(report_id))
+
 @router.post("/{report_id}/upvote")
 async def upvote_report(
     report_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Upvote a report. Creates or updates vote."""
-    # Check if report exists
-    result = await db.execute(select(Report).where(Report.id == report_id))
-    report = result.scalars().first()
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-    
-    # Check if user already voted
-    vote_result = await db.execute(
-        select(Vote).where(
-            Vote.user_id == current_user.id,
-            Vote.report_id == report_id
-        )
-    )
-    existing_vote = vote_result.scalars().first()
-    
-    if existing_vote:
-        if existing_vote.value == 1:
-            # Already upvoted, remove vote
-            await db.delete(existing_vote)
-            report.upvotes = max(0, report.upvotes - 1)
-        else:
-            # Was downvote, change to upvote
-            existing_vote.value = 1
-            report.upvotes += 1
-    else:
-        # New upvote
-        new_vote = Vote(user_id=current_user.id, report_id=report_id, value=1)
-        db.add(new_vote)
-        report.upvotes += 1
-    
-    await db.commit()
-    await db.refresh(report)
-    
-    return {"message": "Vote recorded", "upvotes": report.upvotes}
+    """Upvote a report. Creates, flips or (if repeated) removes the vote."""
+    upvotes = await cast_vote(db, report_id, current_user.id, 1)
+    return {"message": "Vote recorded", "upvotes": upvotes}
 
 @router.post("/{report_id}/downvote")
 async def downvote_report(
     report_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Downvote a report. Creates or updates vote."""
-    # Check if report exists
-    result = await db.execute(select(Report).where(Report.id == report_id))
-    report = result.scalars().first()
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-    
-    # Check if user already voted
-    vote_result = await db.execute(
-        select(Vote).where(
-            Vote.user_id == current_user.id,
-            Vote.report_id == report_id
-        )
-    )
-    existing_vote = vote_result.scalars().first()
-    
-    if existing_vote:
-        if existing_vote.value == -1:
-            # Already downvoted, remove vote
-            await db.delete(existing_vote)
-        else:
-            # Was upvote, change to downvote
-            existing_vote.value = -1
-            report.upvotes = max(0, report.upvotes - 1)
-    else:
-        # New downvote (doesn't affect upvote count)
-        new_vote = Vote(user_id=current_user.id, report_id=report_id, value=-1)
-        db.add(new_vote)
-    
-    await db.commit()
-    await db.refresh(report)
-    
-    return {"message": "Vote recorded", "upvotes": report.upvotes}
+    """Downvote a report. Creates, flips or (if repeated) removes the vote."""
+    upvotes = await cast_vote(db, report_id, current_user.id, -1)
+    return {"message": "Vote recorded", "upvotes": upvotes}
@@ -49,6 +49,29 @@ class FieldTeamResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class TeamLocationUpdate(BaseModel):
+    latitude: float
+    longitude: float
+    status: Optional[str] = None  # active, busy, offline
+
+class NearestTeamResponse(BaseModel):
+    id: int
+    name: Optional[str]
+    department_id: int
+    latitude: float
+    longitude: float
+    open_assignments: int
+    distance_m: float
+
+class DispatchAssignment(BaseModel):
+    report_id: int
+    team_id: int
+    distance_m: float
+
+class DispatchResponse(BaseModel):
+    assigned: List[DispatchAssignment]
+    elapsed_ms: float
+
 # Report Schemas
 class ReportBase(BaseModel):
     title: str
@@ -61,6 +84,14 @@ class ReportBase(BaseModel):
 class ReportCreate(ReportBase):
     pass
 
+class DuplicateResponse(BaseModel):
+    id: int
+    title: str
+    category: str
+    status: ReportStatus
+    similarity: float
+    distance_m: float
+
 class ReportResponse(ReportBase):
     id: int
     status: ReportStatus
@@ -73,6 +104,7 @@ class ReportResponse(ReportBase):
     assigned_team_id: Optional[int]
     resolution_image_url: Optional[str]
     citizen_feedback: Optional[str]
+    possible_duplicates: List[DuplicateResponse] = []
     
     class Config:
         from_attributes = True
@@ -1,4 +1,461 @@
-        print("Seeding complete!")
+"""
+Synthetic data for development and load testing.
+
+Generates users, reports and votes with numpy from a fixed seed and loads
+them with COPY (asyncpg copy_to_table, CSV), several connections at a
+time while the next batch is generated. Reports cluster around random
+hotspots with realistic category, status, priority and timestamp
+distributions; derived aggregates are rebuilt at the end.
+
+    python seed_data.py --reports 1000000
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import time
+
+import asyncpg
+import numpy as np
+
+from database import DATABASE_URL, engine
+from init_db import init_db
+from rebuild_aggregates import rebuild, AGGREGATES
+from utils.departments import DEPARTMENT_MAPPING_PATH
+from utils.security import get_password_hash
+
+CATEGORIES = ["pothole", "street_light", "garbage", "flooding", "graffiti"]
+CATEGORY_WEIGHTS = np.array([0.35, 0.20, 0.25, 0.10, 0.10])
+# P(low, medium, high, critical) per category
+SEVERITY_WEIGHTS = np.array([
+    [0.15, 0.45, 0.30, 0.10],
+    [0.25, 0.50, 0.20, 0.05],
+    [0.30, 0.45, 0.20, 0.05],
+    [0.05, 0.25, 0.40, 0.30],
+    [0.60, 0.30, 0.08, 0.02],
+])
+SEVERITIES = np.array(["low", "medium", "high", "critical"])
+PRIORITIES = np.array(["low", "medium", "high", "critical"])
+OPEN_STATUSES = np.array(["pending", "assigned", "in_progress", "reopened", "rejected"])
+OPEN_STATUS_WEIGHTS = np.array([0.60, 0.12, 0.20, 0.05, 0.03])
+
+TITLES = {
+    "pothole": ["Pothole on {}", "Large pothole near {}", "Road damage at {}", "Crater-sized hole on {}"],
+    "street_light": ["Street light out on {}", "Flickering lamp at {}", "Dark stretch on {}", "Broken light pole near {}"],
+    "garbage": ["Garbage pile-up on {}", "Overflowing bin at {}", "Waste dumped near {}", "Uncollected trash on {}"],
+    "flooding": ["Waterlogging on {}", "Blocked drain at {}", "Flooded underpass near {}", "Sewage overflow on {}"],
+    "graffiti": ["Graffiti on wall at {}", "Vandalised signboard on {}", "Spray paint near {}", "Defaced bus stop on {}"],
+}
+DESCRIPTIONS = [
+    "Reported by residents, getting worse every day.",
+    "This is dangerous for two-wheelers, especially at night.",
+    "Has been like this for over a week, please fix urgently.",
+    "Kids walk past here to school every morning.",
+    "Causing traffic to back up during rush hour.",
+    "Second time reporting this issue.",
+    "Right outside the hospital entrance, ambulances have to slow down.",
+    "Next to the park where children play in the evening.",
+]
+STREETS = [
+    f"{name} {kind}"
+    for name in ["MG", "Brigade", "Residency", "Church", "Hosur", "Bannerghatta", "Sarjapur", "Old Airport",
+                 "Bellary", "Tumkur", "Mysore", "Kanakapura", "Outer Ring", "Cunningham", "Infantry", "Richmond"]
+    for kind in ["Road", "Main Road", "Cross", "Layout", "Junction"]
+]
+
+# Priority scoring as in score_priority (ai-duplicate/service.py) and
+# utils/priority.py: location 40% + urgency 30% is the stored text score,
+# upvotes add up to 30% (capped at 20), and the total maps to a level
+SENSITIVE_KEYWORDS = [
+    (0.8, ["school", "college", "university", "education", "campus", "institute",
+           "hospital", "clinic", "medical", "health center", "emergency"]),
+    (0.6, ["park", "playground", "community center", "library", "temple", "mosque", "church"]),
+]
+MAX_TEXT_SCORE = 0.8 * 0.4 + 1.0 * 0.3
+PRIORITY_THRESHOLDS = [0.3, 0.5, 0.7]
+
+REPORT_COLUMNS = [
+    "id", "title", "description", "category", "status", "severity", "priority", "priority_text_score", "location",
+    "embedding", "embedding_model", "upvotes", "created_at", "updated_at", "resolved_at",
+    "user_id", "department_id", "assigned_team_id",
+]
+USER_COLUMNS = ["id", "name", "email", "hashed_password", "role", "created_at"]
+VOTE_COLUMNS = ["user_id", "report_id", "value"]
+
+EMBEDDING_DIM = 384
+SYNTHETIC_EMBEDDING_MODEL = "synthetic"
+
+# Fixed accounts for trying the app and for the bench suite
+DEMO_ACCOUNTS = [("admin@example.com", "Admin", "admin"), ("citizen@example.com", "Citizen", "citizen")]
+
+def asyncpg_dsn(url: str) -> str:
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+def to_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+def location_factor(text: str) -> float:
+    lowered = text.lower()
+    return next((factor for factor, words in SENSITIVE_KEYWORDS if any(w in lowered for w in words)), 0.0)
+
+def iso(timestamps: np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(timestamps.astype("datetime64[s]"), unit="s", timezone="UTC")
+
+class Generator:
+    """Deterministic batches: batch i only depends on (seed, i)."""
+
+    def __init__(self, args, user_base: int, report_base: int, departments: dict, teams: dict):
+        self.args = args
+        self.user_base = user_base
+        self.report_base = report_base
+        self.departments = departments  # category -> department id
+        self.teams = teams  # department id -> array of team ids
+        self.now = np.datetime64("now", "s")
+
+        rng = np.random.default_rng([args.seed, 0])
+        # Hotspots: centers spread around the city, sizes heavy-tailed, each
+        # with a dominant category
+        km_lat = 1 / 110.54
+        km_lon = 1 / (111.32 * np.cos(np.radians(args.center_lat)))
+        radius = args.radius_km * np.sqrt(rng.random(args.hotspots))
+        angle = rng.random(args.hotspots) * 2 * np.pi
+        self.hotspot_lat = args.center_lat + radius * np.sin(angle) * km_lat
+        self.hotspot_lon = args.center_lon + radius * np.cos(angle) * km_lon
+        self.hotspot_sigma_km = rng.uniform(0.05, 0.4, args.hotspots)
+        weights = rng.pareto(1.5, args.hotspots) + 1
+        self.hotspot_weights = weights / weights.sum()
+        self.hotspot_category = rng.choice(len(CATEGORIES), args.hotspots, p=CATEGORY_WEIGHTS)
+        self.km_lat, self.km_lon = km_lat, km_lon
+
+        # Day weights over the window: gentle growth plus a weekday bump
+        days = np.arange(args.days)
+        # 1970-01-01 was a Thursday; weekday 0 = Monday
+        weekday = ((self.now.astype("datetime64[D]") - days).astype(int) + 3) % 7
+        day_weights = (1.0 + 0.5 * (1 - days / max(args.days, 1))) * np.where(weekday < 5, 1.15, 0.8)
+        self.day_weights = day_weights / day_weights.sum()
+        hours = np.arange(24)
+        hour_weights = 0.2 + np.exp(-((hours - 10) ** 2) / 18) + 0.8 * np.exp(-((hours - 18) ** 2) / 8)
+        self.hour_weights = hour_weights / hour_weights.sum()
+
+        self.titles = {c: np.array([t.format(s) for t in TITLES[c] for s in STREETS], dtype=object)
+                       for c in CATEGORIES}
+        self.descriptions = np.array(DESCRIPTIONS, dtype=object)
+        self.title_location = {c: np.array([location_factor(t) for t in self.titles[c]]) for c in CATEGORIES}
+        self.description_location = np.array([location_factor(d) for d in DESCRIPTIONS])
+
+        self.embeddings = None
+        if args.embeddings == "synthetic":
+            # A few vectors per category: nearby same-category reports look alike
+            prototypes = rng.normal(size=(len(CATEGORIES), EMBEDDING_DIM))
+            variants = prototypes[:, None, :] + 0.5 * rng.normal(
+                size=(len(CATEGORIES), args.embedding_variants, EMBEDDING_DIM))
+            variants /= np.linalg.norm(variants, axis=2, keepdims=True)
+            self.embeddings = np.array([
+                ["[" + ",".join(f"{x:.4f}" for x in v) + "]" for v in category]
+                for category in variants
+            ], dtype=object)
+
+    def users(self, start: int, count: int) -> bytes:
+        rng = np.random.default_rng([self.args.seed, 1, start])
+        ids = np.arange(self.user_base + start + 1, self.user_base + start + count + 1)
+        age_days = rng.integers(self.args.days, self.args.days + 365, count)
+        created = iso(self.now - age_days.astype("timedelta64[D]"))
+        return to_csv(
+            (i, f"Seed User {i}", f"user{i}@seed.example", self.args.password_hash, "citizen", c)
+            for i, c in zip(ids.tolist(), created.tolist())
+        )
+
+    def reports(self, batch: int, start: int, count: int) -> tuple:
+        """(reports CSV, votes CSV) for reports start .. start + count."""
+        args = self.args
+        rng = np.random.default_rng([args.seed, 2, batch])
+        ids = np.arange(self.report_base + start + 1, self.report_base + start + count + 1)
+
+        # Location: around a hotspot, or anywhere in the city
+        hotspot = rng.choice(args.hotspots, count, p=self.hotspot_weights)
+        clustered = rng.random(count) < args.clustered_fraction
+        sigma = self.hotspot_sigma_km[hotspot]
+        lat = self.hotspot_lat[hotspot] + rng.normal(size=count) * sigma * self.km_lat
+        lon = self.hotspot_lon[hotspot] + rng.normal(size=count) * sigma * self.km_lon
+        radius = args.radius_km * np.sqrt(rng.random(count))
+        angle = rng.random(count) * 2 * np.pi
+        lat = np.where(clustered, lat, args.center_lat + radius * np.sin(angle) * self.km_lat)
+        lon = np.where(clustered, lon, args.center_lon + radius * np.cos(angle) * self.km_lon)
+
+        # Category: mostly the hotspot's own
+        category = np.where(
+            clustered & (rng.random(count) < 0.7),
+            self.hotspot_category[hotspot],
+            rng.choice(len(CATEGORIES), count, p=CATEGORY_WEIGHTS),
+        )
+        severity = np.empty(count, dtype=int)
+        for c in range(len(CATEGORIES)):
+            mask = category == c
+            severity[mask] = rng.choice(4, mask.sum(), p=SEVERITY_WEIGHTS[c])
+
+        # Created: day by weight, hour by time of day
+        age_days = rng.choice(args.days, count, p=self.day_weights)
+        seconds = rng.choice(24, count, p=self.hour_weights) * 3600 + rng.integers(0, 3600, count)
+        created = (self.now.astype("datetime64[D]") - age_days.astype("timedelta64[D]")).astype("datetime64[s]") \
+            + seconds.astype("timedelta64[s]")
+        created = np.minimum(created, self.now)
+        age_hours = (self.now - created).astype(float) / 3600
+
+        # Status: older reports are more likely resolved (time to resolve is
+        # lognormal); a share of reports stays open however old it is
+        resolve_hours = rng.lognormal(np.log(72), 1.2, count)
+        resolved = (resolve_hours < age_hours) & (rng.random(count) >= args.backlog_fraction)
+        status = np.where(
+            resolved,
+            np.where(rng.random(count) < 0.7, "closed", "resolved"),
+            rng.choice(OPEN_STATUSES, count, p=OPEN_STATUS_WEIGHTS),
+        )
+        resolved_at = created + (resolve_hours * 3600).astype("timedelta64[s]")
+
+        # Votes: heavy-tailed, more for severe reports; mostly upvotes
+        votes = np.minimum(rng.zipf(2.2, count) - 1 + severity, args.max_votes_per_report)
+        votes = np.minimum(votes, args.total_users)
+        vote_values = np.where(rng.random(votes.sum()) < 0.92, 1, -1)
+        vote_report = np.repeat(ids, votes)
+        upvotes = np.bincount(np.repeat(np.arange(count), votes), weights=vote_values == 1, minlength=count)
+        # Distinct voters per report: consecutive user ids from a random offset
+        first = np.repeat(rng.integers(0, self.args.total_users, count), votes)
+        offset = np.arange(votes.sum()) - np.repeat(np.cumsum(votes) - votes, votes)
+        vote_user = self.args.first_user_id + (first + offset) % self.args.total_users
+
+        # Priority from severity and upvotes, as the model would roughly score it
+        score = severity + 0.8 * np.log1p(upvotes) + rng.normal(0, 0.5, count)
+        priority = np.clip(np.digitize(score, [1.0, 2.2, 3.4]), 0, 3)
+
+        user_id = self.args.first_user_id + (rng.zipf(1.6, count) - 1 + rng.integers(0, self.args.total_users, count)) \
+            % self.args.total_users
+        categories = np.array(CATEGORIES, dtype=object)[category]
+        department = np.array([self.departments.get(c) for c in CATEGORIES], dtype=object)[category]
+        team = np.full(count, None, dtype=object)
+        for c, department_id in enumerate(self.departments.get(name) for name in CATEGORIES):
+            team_ids = self.teams.get(department_id)
+            mask = resolved & (category == c)
+            if team_ids is not None and len(team_ids) and mask.any():
+                team[mask] = rng.choice(team_ids, mask.sum())
+
+        title = np.empty(count, dtype=object)
+        location_score = np.zeros(count)
+        for c, name in enumerate(CATEGORIES):
+            mask = category == c
+            pick = rng.integers(0, len(self.titles[name]), mask.sum())
+            title[mask] = self.titles[name][pick]
+            location_score[mask] = self.title_location[name][pick]
+        pick = rng.integers(0, len(self.descriptions), count)
+        description = self.descriptions[pick]
+        location_score = np.maximum(location_score, self.description_location[pick])
+
+        # Text score: the location factor comes from the text, urgency is
+        # drawn so the total lands in the generated priority's band where it
+        # can; the level is then recomputed so it matches what utils/priority.py
+        # derives from the stored score on the next upvote
+        upvote_score = np.minimum(upvotes / 20.0, 1.0) * 0.3
+        bounds = np.array([0.0, *PRIORITY_THRESHOLDS, np.inf])
+        low = np.clip(bounds[priority] - upvote_score, 0.0, MAX_TEXT_SCORE)
+        high = np.clip(bounds[priority + 1] - upvote_score, 0.0, MAX_TEXT_SCORE)
+        target = low + (high - low) * rng.random(count)
+        urgency = np.clip((target - location_score * 0.4) / 0.3, 0.0, 1.0)
+        text_score = (location_score * 0.4 + urgency * 0.3).round(4)
+        priority = np.digitize(text_score + upvote_score, PRIORITY_THRESHOLDS)
+
+        if self.embeddings is not None:
+            embedding = self.embeddings[category, hotspot % self.args.embedding_variants]
+            embedding_model = np.full(count, SYNTHETIC_EMBEDDING_MODEL, dtype=object)
+        else:
+            embedding = embedding_model = np.full(count, None, dtype=object)
+
+        created_iso = iso(created)
+        resolved_iso = np.where(resolved, iso(resolved_at), None)
+        location = [f"SRID=4326;POINT({x:.6f} {y:.6f})" for x, y in zip(lon.tolist(), lat.tolist())]
+        reports_csv = to_csv(zip(
+            ids.tolist(), title.tolist(), description.tolist(), categories.tolist(), status.tolist(),
+            SEVERITIES[severity].tolist(), PRIORITIES[priority].tolist(), text_score.tolist(), location,
+            embedding.tolist(), embedding_model.tolist(), upvotes.astype(int).tolist(),
+            created_iso.tolist(), resolved_iso.tolist(), resolved_iso.tolist(),
+            user_id.tolist(), department.tolist(), team.tolist(),
+        ))
+        votes_csv = to_csv(zip(vote_user.tolist(), vote_report.tolist(), vote_values.tolist()))
+        return reports_csv, votes_csv, int(votes.sum())
+
+async def setup_reference_data(conn, args) -> tuple:
+    """Departments (from the mapping file), field teams and demo accounts."""
+    with open(DEPARTMENT_MAPPING_PATH) as f:
+        mapping = json.load(f)
+    names = sorted(set(mapping.values()))
+    await conn.executemany(
+        "INSERT INTO departments (name, slug) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+        [(name, name.lower().replace(" ", "-")) for name in names],
+    )
+    ids_by_name = {r["name"]: r["id"] for r in await conn.fetch("SELECT id, name FROM departments")}
+    departments = {category: ids_by_name[name] for category, name in mapping.items()}
+
+    rng = np.random.default_rng([args.seed, 3])
+    km_lat = 1 / 110.54
+    km_lon = 1 / (111.32 * np.cos(np.radians(args.center_lat)))
+    teams = {}
+    for name in names:
+        department_id = ids_by_name[name]
+        existing = await conn.fetch("SELECT id FROM field_teams WHERE department_id = $1", department_id)
+        missing = args.teams_per_department - len(existing)
+        if missing > 0:
+            radius = args.radius_km * np.sqrt(rng.random(missing))
+            angle = rng.random(missing) * 2 * np.pi
+            await conn.executemany(
+                "INSERT INTO field_teams (name, status, current_lat, current_lon, department_id) "
+                "VALUES ($1, 'active', $2, $3, $4)",
+                [
+                    (f"{name} Team {len(existing) + i + 1}",
+                     float(args.center_lat + radius[i] * np.sin(angle[i]) * km_lat),
+                     float(args.center_lon + radius[i] * np.cos(angle[i]) * km_lon),
+                     department_id)
+                    for i in range(missing)
+                ],
+            )
+        rows = await conn.fetch("SELECT id FROM field_teams WHERE department_id = $1", department_id)
+        teams[department_id] = np.array([r["id"] for r in rows])
+
+    for email, name, role in DEMO_ACCOUNTS:
+        await conn.execute(
+            "INSERT INTO users (name, email, hashed_password, role) VALUES ($1, $2, $3, $4) "
+            "ON CONFLICT (email) DO NOTHING",
+            name, email, args.password_hash, role,
+        )
+    return departments, teams
+
+async def copy_batches(pool, batches, workers: int, on_done=None):
+    """COPY CSV batches from an async iterator using up to `workers` connections."""
+    queue = asyncio.Queue(maxsize=workers)
+
+    async def consume():
+        async with pool.acquire() as conn:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                for target, target_columns, data in item["copies"]:
+                    await conn.copy_to_table(target, source=data, columns=target_columns, format="csv")
+                if on_done:
+                    on_done(item)
+
+    consumers = [asyncio.create_task(consume()) for _ in range(workers)]
+    try:
+        async for item in batches:
+            await queue.put(item)
+        for _ in consumers:
+            await queue.put(None)
+        await asyncio.gather(*consumers)
+    finally:
+        for task in consumers:
+            task.cancel()
+
+async def seed(args):
+    await init_db()
+    args.password_hash = get_password_hash(args.password)
+    pool = await asyncpg.create_pool(asyncpg_dsn(DATABASE_URL), min_size=1, max_size=args.workers)
+    started = time.perf_counter()
+    try:
+        async with pool.acquire() as conn:
+            if args.truncate:
+                await conn.execute(
+                    "TRUNCATE votes, reports, heatmap_cells, report_daily_rollups, "
+                    "report_resolution_rollups, hotspot_clusters"
+                )
+            departments, teams = await setup_reference_data(conn, args)
+            user_base = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM users")
+            report_base = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM reports")
+
+        args.first_user_id = user_base + 1
+        args.total_users = args.users
+        generator = Generator(args, user_base, report_base, departments, teams)
+
+        async def user_batches():
+            for start in range(0, args.users, args.batch_size):
+                count = min(args.batch_size, args.users - start)
+                data = await asyncio.to_thread(generator.users, start, count)
+                yield {"copies": [("users", USER_COLUMNS, data)], "rows": count}
+
+        await copy_batches(pool, user_batches(), args.workers)
+        print(f"Loaded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+        loaded = {"reports": 0, "votes": 0}
+
+        def progress(item):
+            loaded["reports"] += item["rows"]
+            loaded["votes"] += item["votes"]
+            elapsed = time.perf_counter() - started
+            print(f"Loaded {loaded['reports']}/{args.reports} reports, {loaded['votes']} votes "
+                  f"({loaded['reports'] / elapsed * 60:,.0f} reports/min)")
+
+        async def report_batches():
+            for batch, start in enumerate(range(0, args.reports, args.batch_size)):
+                count = min(args.batch_size, args.reports - start)
+                reports_csv, votes_csv, votes = await asyncio.to_thread(generator.reports, batch, start, count)
+                yield {
+                    "copies": [("reports", REPORT_COLUMNS, reports_csv), ("votes", VOTE_COLUMNS, votes_csv)],
+                    "rows": count,
+                    "votes": votes,
+                }
+
+        await copy_batches(pool, report_batches(), args.workers, progress)
+
+        async with pool.acquire() as conn:
+            for table in ("users", "reports"):
+                await conn.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                )
+            await conn.execute("ANALYZE users; ANALYZE reports; ANALYZE votes;")
+    finally:
+        await pool.close()
+
+    load_seconds = time.perf_counter() - started
+    print(f"Loaded {args.reports} reports in {load_seconds:.1f}s "
+          f"({args.reports / load_seconds * 60:,.0f} reports/min)")
+
+    if not args.skip_aggregates:
+        try:
+            await rebuild(AGGREGATES)
+        finally:
+            await engine.dispose()
+        print(f"Rebuilt aggregates in {time.perf_counter() - started - load_seconds:.1f}s")
+
+    print("Seeding complete!")
+    print(f"Demo accounts: {', '.join(email for email, _, _ in DEMO_ACCOUNTS)} (password: {args.password})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and bulk-load synthetic users, reports and votes.")
+    parser.add_argument("--reports", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=None, help="Default: reports / 20 (at least 100)")
+    parser.add_argument("--hotspots", type=int, default=300)
+    parser.add_argument("--clustered-fraction", type=float, default=0.8, help="Share of reports near a hotspot")
+    parser.add_argument("--backlog-fraction", type=float, default=0.25, help="Share of reports never resolved")
+    parser.add_argument("--days", type=int, default=365, help="Reports are spread over the last N days")
+    parser.add_argument("--center-lat", type=float, default=12.9716)
+    parser.add_argument("--center-lon", type=float, default=77.5946)
+    parser.add_argument("--radius-km", type=float, default=15.0)
+    parser.add_argument("--max-votes-per-report", type=int, default=500)
+    parser.add_argument("--teams-per-department", type=int, default=10)
+    parser.add_argument("--embeddings", choices=["none", "synthetic"], default="none",
+                        help="synthetic: category vectors (~3 KB per row in COPY); "
+                             "run reembed.py afterwards for real ones")
+    parser.add_argument("--embedding-variants", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent COPY connections")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="password123", help="Password for every seeded account")
+    parser.add_argument("--truncate", action="store_true", help="Delete existing reports, votes and aggregates first")
+    parser.add_argument("--skip-aggregates", action="store_true")
+    args = parser.parse_args()
+    if args.users is None:
+        args.users = max(args.reports // 20, 100)
+
+    asyncio.run(seed(args))
 
 if __name__ == "__main__":
-    asyncio.run(seed())
+    main()
@@ -0,0 +1,111 @@
+import asyncio
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from init_db import TOKEN_VERSION_TRIGGER
+from models import User, UserRole
+from routers.auth import CurrentUser, get_current_user, token_access_claims, user_cache
+from utils.security import create_access_token
+
+EMAIL = "admin@example.com"
+
+def issue(user: User) -> str:
+    return create_access_token(data=token_access_claims(user), expires_delta=timedelta(minutes=5))
+
+async def authenticate(sessions, token: str):
+    async with sessions() as db:
+        return await get_current_user(token, db)
+
+def run_with_users(database_url: str, scenario):
+    """Run scenario(sessions) against a throwaway schema with the users table and its trigger."""
+    async def main():
+        schema = f"auth_test_{uuid.uuid4().hex[:8]}"
+        admin = create_async_engine(database_url)
+        async with admin.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        engine = create_async_engine(database_url, connect_args={"server_settings": {"search_path": schema}})
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(lambda sync_conn: User.__table__.create(sync_conn))
+                for statement in TOKEN_VERSION_TRIGGER:
+                    await conn.execute(text(statement))
+            user_cache.clear()
+            await scenario(async_sessionmaker(engine, expire_on_commit=False))
+        finally:
+            user_cache.clear()
+            await engine.dispose()
+            async with admin.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            await admin.dispose()
+
+    asyncio.run(main())
+
+async def add_admin(sessions) -> User:
+    async with sessions() as db:
+        user = User(email=EMAIL, name="Admin", hashed_password="x", role=UserRole.admin)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+
+def test_returns_a_snapshot_not_an_orm_instance(database_url):
+    async def scenario(sessions):
+        user = await add_admin(sessions)
+        current = await authenticate(sessions, issue(user))
+        assert isinstance(current, CurrentUser)
+        assert (current.id, current.email, current.name, current.role) == (user.id, EMAIL, "Admin", UserRole.admin)
+
+    run_with_users(database_url, scenario)
+
+def test_core_update_of_role_revokes_token(database_url):
+    async def scenario(sessions):
+        user = await add_admin(sessions)
+        token = issue(user)
+        await authenticate(sessions, token)
+
+        # A bulk/Core UPDATE bypasses ORM events; the trigger still bumps the version
+        async with sessions() as db:
+            await db.execute(update(User).where(User.email == EMAIL).values(role=UserRole.citizen))
+            await db.commit()
+        user_cache.clear()  # what AUTH_USER_CACHE_TTL does in other processes
+
+        with pytest.raises(HTTPException) as excinfo:
+            await authenticate(sessions, token)
+        assert excinfo.value.status_code == 401
+
+        async with sessions() as db:
+            demoted = await db.get(User, user.id)
+        current = await authenticate(sessions, issue(demoted))
+        assert current.role == UserRole.citizen
+
+    run_with_users(database_url, scenario)
+
+def test_unrelated_update_keeps_token_valid(database_url):
+    async def scenario(sessions):
+        user = await add_admin(sessions)
+        token = issue(user)
+        async with sessions() as db:
+            await db.execute(update(User).where(User.email == EMAIL).values(name="Renamed"))
+            await db.commit()
+        user_cache.clear()
+        assert (await authenticate(sessions, token)).name == "Renamed"
+
+    run_with_users(database_url, scenario)
+
+def test_deleted_user_is_rejected(database_url):
+    async def scenario(sessions):
+        user = await add_admin(sessions)
+        token = issue(user)
+        async with sessions() as db:
+            await db.execute(delete(User).where(User.email == EMAIL))
+            await db.commit()
+        user_cache.clear()
+        with pytest.raises(HTTPException):
+            await authenticate(sessions, token)
+
+    run_with_users(database_url, scenario)
@@ -0,0 +1,77 @@
+import random
+
+from utils.dispatch import TeamIndex, distance_m
+
+CELL_DEG = 0.01
+CENTER = (12.9716, 77.5946)
+
+def make_index(capacity: int = 3) -> TeamIndex:
+    return TeamIndex(CELL_DEG, capacity, ttl=60)
+
+def brute_force(index: TeamIndex, department_id: int, lat: float, lon: float, k: int) -> list:
+    free = [t for t in index.teams.values() if t.department_id == department_id and index._is_free(t)]
+    return sorted(free, key=lambda t: distance_m(lat, lon, t.lat, t.lon))[:k]
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    index = make_index()
+    for team_id in range(300):
+        index.upsert(team_id, f"team {team_id}", rng.choice([1, 2]), "active",
+                     CENTER[0] + rng.uniform(-0.2, 0.2), CENTER[1] + rng.uniform(-0.2, 0.2))
+    for _ in range(200):
+        lat, lon = CENTER[0] + rng.uniform(-0.3, 0.3), CENTER[1] + rng.uniform(-0.3, 0.3)
+        department_id, k = rng.choice([1, 2]), rng.randint(1, 5)
+        found = index.nearest(department_id, lat, lon, k)
+        expected = brute_force(index, department_id, lat, lon, k)
+        assert [d for d, _ in found] == [distance_m(lat, lon, t.lat, t.lon) for t in expected]
+
+def test_team_across_a_cell_border_beats_one_in_the_same_cell():
+    index = make_index()
+    # Query just below a cell border; one team just above it, one at the far side of the query's own cell
+    border = 1300 * CELL_DEG
+    index.upsert(1, "across", 1, "active", border + 0.0001, CENTER[1])
+    index.upsert(2, "same cell", 1, "active", border - CELL_DEG + 0.0001, CENTER[1])
+    (distance, team), = index.nearest(1, border - 0.0001, CENTER[1], 1)
+    assert team.id == 1
+    assert distance < 30
+
+def test_search_crosses_empty_rings():
+    index = make_index()
+    index.upsert(1, "far", 1, "active", CENTER[0] + 0.5, CENTER[1] + 0.5)  # ~50 rings away
+    index.upsert(2, "farther", 1, "active", CENTER[0] - 0.8, CENTER[1])
+    found = index.nearest(1, CENTER[0], CENTER[1], 2)
+    assert [team.id for _, team in found] == [1, 2]
+
+def test_no_free_team_in_department():
+    index = make_index()
+    assert index.nearest(1, *CENTER) == []
+    index.upsert(1, "other department", 2, "active", *CENTER)
+    index.upsert(2, "off duty", 1, "inactive", *CENTER)
+    index.upsert(3, "no location", 1, "active", None, None)
+    assert index.nearest(1, *CENTER) == []
+
+def test_capacity_removes_and_release_restores_a_team():
+    index = make_index(capacity=2)
+    index.upsert(1, "near", 1, "active", *CENTER)
+    index.upsert(2, "far", 1, "active", CENTER[0] + 0.05, CENTER[1])
+    index.assign(1)
+    index.assign(1)
+    assert index.nearest(1, *CENTER)[0][1].id == 2
+    index.release(1)
+    assert index.nearest(1, *CENTER)[0][1].id == 1
+    assert index.stats()["free_teams"] == 2
+
+def test_moving_a_team_reindexes_it():
+    index = make_index()
+    index.upsert(1, "mover", 1, "active", CENTER[0] + 0.1, CENTER[1])
+    index.upsert(2, "stays", 1, "active", CENTER[0] + 0.05, CENTER[1])
+    index.upsert(1, "mover", 1, "active", *CENTER)
+    assert index.nearest(1, *CENTER)[0][1].id == 1
+    assert sum(len(members) for members in index.grids[1].values()) == 2
+
+def test_plan_spreads_reports_over_capacity():
+    index = make_index(capacity=1)
+    index.upsert(1, "a", 1, "active", *CENTER)
+    index.upsert(2, "b", 1, "active", CENTER[0] + 0.01, CENTER[1])
+    assignments = index.plan([(10, 1, *CENTER), (11, 1, *CENTER), (12, 1, *CENTER)])
+    assert [(report_id, team_id) for report_id, team_id, _ in assignments] == [(10, 1), (11, 2)]
@@ -0,0 +1,39 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import database
+from main import query_metrics
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.middleware("http")(query_metrics)
+
+    def run_query():
+        # What the cursor execute events do for each statement
+        database._request_queries.get()["queries"] += 1
+
+    @app.get("/plain")
+    def plain():
+        run_query()
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        async def rows():
+            for i in range(3):
+                run_query()  # e.g. fetching the next chunk from a server-side cursor
+                yield f"{i}\n"
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    return app
+
+def test_queries_made_while_streaming_are_counted():
+    database.route_stats.clear()
+    with TestClient(make_app()) as client:
+        assert client.get("/stream").text == "0\n1\n2\n"
+        assert client.get("/plain").json() == {"ok": True}
+
+    assert database.route_stats["GET /stream"]["requests"] == 1
+    assert database.route_stats["GET /stream"]["queries"] == 3
+    assert database.route_stats["GET /plain"]["queries"] == 1
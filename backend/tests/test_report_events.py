@@ -0,0 +1,52 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from utils import report_events
+from utils.cache import analytics_cache
+
+KEY = ("report_counts",)
+
+async def write_and_finish(database_url: str, commit: bool) -> tuple:
+    """(cached before the transaction ends, cached after) for a report write."""
+    engine = create_async_engine(database_url)
+    try:
+        async with async_sessionmaker(engine)() as db:
+            await db.execute(text("SELECT 1"))
+            analytics_cache.set(KEY, "before")
+            report_events._clear_analytics_on_commit(db)
+            # A concurrent analytics request re-fills the cache before the commit
+            analytics_cache.set(KEY, "pre-commit")
+            during = analytics_cache.get(KEY)
+            if commit:
+                await db.commit()
+            else:
+                await db.rollback()
+            return during, analytics_cache.get(KEY)
+    finally:
+        await engine.dispose()
+
+def test_analytics_cache_is_cleared_after_commit(database_url):
+    during, after = asyncio.run(write_and_finish(database_url, commit=True))
+    assert during == "pre-commit"
+    assert after is None
+
+def test_rollback_forgets_the_write(database_url):
+    async def run():
+        engine = create_async_engine(database_url)
+        try:
+            async with async_sessionmaker(engine)() as db:
+                await db.execute(text("SELECT 1"))
+                report_events._clear_analytics_on_commit(db)
+                await db.rollback()
+                analytics_cache.set(KEY, "fresh")
+                # A later read-only transaction on the same session clears nothing
+                await db.execute(text("SELECT 1"))
+                await db.commit()
+                return analytics_cache.get(KEY)
+        finally:
+            await engine.dispose()
+            analytics_cache.clear()
+
+    assert asyncio.run(run()) == "fresh"
@@ -0,0 +1,73 @@
+import pytest
+
+from utils.text_to_sql import validate_sql, UnsafeQuery
+
+REJECTED = [
+    # More than one statement
+    "SELECT 1 FROM reports; DELETE FROM reports",
+    "SELECT id FROM reports; SELECT id FROM users",
+    # Writes and DDL, including inside a CTE
+    "WITH x AS (DELETE FROM reports RETURNING id) SELECT * FROM x",
+    "WITH x AS (UPDATE reports SET upvotes = 0 RETURNING id) SELECT * FROM x",
+    "WITH x AS (INSERT INTO reports (title) VALUES ('a') RETURNING id) SELECT * FROM x",
+    "DELETE FROM reports",
+    "DROP TABLE reports",
+    "SELECT * INTO stolen FROM reports",
+    "SELECT id FROM reports FOR UPDATE",
+    "SELECT id FROM reports FOR SHARE",
+    # Functions with side effects or that stall the server
+    "SELECT pg_sleep(10)",
+    "SELECT id FROM reports WHERE pg_sleep(1) IS NULL",
+    "SELECT pg_read_file('/etc/passwd')",
+    "SELECT * FROM dblink('host=evil', 'SELECT 1') AS t(x int)",
+    "SELECT lo_import('/etc/passwd')",
+    "SELECT set_config('statement_timeout', '0', false)",
+    "SELECT current_setting('data_directory')",
+    "SELECT query_to_xml('SELECT * FROM users', true, true, '')",
+    "SELECT PG_SLEEP(1)",
+    "SELECT nextval('reports_id_seq')",
+    "SELECT setval('reports_id_seq', 1)",
+    # Tables outside the allowlist, however they are reached
+    "SELECT * FROM users",
+    "SELECT id FROM reports WHERE user_id IN (SELECT id FROM users)",
+    "SELECT r.id FROM reports r JOIN users u ON u.id = r.user_id",
+    "SELECT * FROM (SELECT * FROM users) AS u",
+    "SELECT EXISTS (SELECT 1 FROM users)",
+    "SELECT id FROM reports UNION SELECT id FROM users",
+    "WITH reports AS (SELECT * FROM users) SELECT * FROM reports",
+    # A CTE defined in a subquery doesn't hide the real table outside it
+    "SELECT a.id FROM (WITH users AS (SELECT 1 AS id) SELECT id FROM users) AS a, users",
+    "SELECT id FROM reports WHERE id IN (WITH users AS (SELECT 1 AS id) SELECT id FROM users) UNION SELECT id FROM users",
+    "SELECT * FROM pg_catalog.pg_user",
+    "SELECT * FROM information_schema.tables",
+    "SELECT * FROM other.reports",
+    "SELECT * FROM citizen_ai.public.reports",
+    "SELECT * FROM pg_shadow",
+    # Not SQL at all
+    "",
+    "show me the reports",
+]
+
+ACCEPTED = [
+    "SELECT COUNT(*) FROM reports",
+    "SELECT status, COUNT(*) FROM reports GROUP BY status ORDER BY 2 DESC",
+    "SELECT * FROM public.reports LIMIT 10",
+    "SELECT d.name, COUNT(r.id) FROM departments d LEFT JOIN reports r ON r.department_id = d.id GROUP BY d.name",
+    "WITH recent AS (SELECT * FROM reports WHERE created_at > NOW() - INTERVAL '7 days') SELECT category, COUNT(*) FROM recent GROUP BY category",
+    "WITH a AS (SELECT id FROM reports), b AS (SELECT id FROM a) SELECT COUNT(*) FROM b",
+    "SELECT COUNT(*) FROM reports WHERE id IN (WITH top AS (SELECT id FROM reports ORDER BY upvotes DESC LIMIT 10) SELECT id FROM top)",
+    "SELECT id FROM reports WHERE department_id IN (SELECT id FROM departments WHERE name = 'Roads')",
+    "SELECT day, SUM(created) FROM report_daily_rollups GROUP BY day UNION ALL SELECT NULL, 0",
+    "```sql\nSELECT title FROM reports WHERE upvotes > 5;\n```",
+]
+
+@pytest.mark.parametrize("sql", REJECTED)
+def test_rejects(sql):
+    with pytest.raises(UnsafeQuery):
+        validate_sql(sql)
+
+@pytest.mark.parametrize("sql", ACCEPTED)
+def test_accepts(sql):
+    canonical = validate_sql(sql)
+    # The canonical text is itself valid and stable
+    assert validate_sql(canonical) == canonical
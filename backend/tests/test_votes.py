@@ -0,0 +1,75 @@
+import asyncio
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from routers.votes import VOTE_LOCK_SQL, VOTE_SQL, cast_vote
+
+REPORT_ID = 1
+
+async def make_sessions(database_url: str):
+    """Engine on a throwaway schema holding just the tables votes touch."""
+    schema = f"vote_test_{uuid.uuid4().hex[:8]}"
+    admin = create_async_engine(database_url)
+    async with admin.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.execute(text(f"CREATE TABLE {schema}.reports (id integer PRIMARY KEY, upvotes integer NOT NULL DEFAULT 0)"))
+        await conn.execute(text(
+            f"CREATE TABLE {schema}.votes (user_id integer, report_id integer, value integer, "
+            "PRIMARY KEY (user_id, report_id))"
+        ))
+        await conn.execute(text(f"INSERT INTO {schema}.reports (id) VALUES ({REPORT_ID})"))
+    engine = create_async_engine(
+        database_url, pool_size=30, connect_args={"server_settings": {"search_path": schema}}
+    )
+    return admin, engine, schema, async_sessionmaker(engine, expire_on_commit=False)
+
+async def counts(sessions) -> tuple:
+    async with sessions() as db:
+        upvotes = await db.scalar(text("SELECT upvotes FROM reports WHERE id = :id"), {"id": REPORT_ID})
+        rows = await db.scalar(text("SELECT COUNT(*) FROM votes WHERE value = 1"))
+    return upvotes, rows
+
+async def drop(admin, engine, schema):
+    await engine.dispose()
+    async with admin.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    await admin.dispose()
+
+def test_second_concurrent_first_vote_toggles_off(database_url):
+    async def main():
+        admin, engine, schema, sessions = await make_sessions(database_url)
+        try:
+            params = {"report_id": REPORT_ID, "user_id": 7, "value": 1}
+            async with sessions() as first, sessions() as second:
+                # First vote is in flight (row inserted, not committed) when the second arrives
+                await first.execute(VOTE_LOCK_SQL, {"user_id": 7, "report_id": REPORT_ID})
+                await first.execute(VOTE_SQL, params)
+                racing = asyncio.create_task(cast_vote(second, REPORT_ID, 7, 1))
+                await asyncio.sleep(0.2)
+                assert not racing.done()
+                await first.commit()
+                assert await asyncio.wait_for(racing, 5) == 0
+            return await counts(sessions)
+        finally:
+            await drop(admin, engine, schema)
+
+    assert asyncio.run(main()) == (0, 0)
+
+def test_repeated_concurrent_votes_by_one_user_stay_consistent(database_url):
+    async def vote(sessions, user_id):
+        async with sessions() as db:
+            await cast_vote(db, REPORT_ID, user_id, 1)
+
+    async def main():
+        admin, engine, schema, sessions = await make_sessions(database_url)
+        try:
+            # 21 toggles by one user end with one upvote; 10 other users add one each
+            await asyncio.gather(*(vote(sessions, 7) for _ in range(21)),
+                                 *(vote(sessions, 100 + i) for i in range(10)))
+            return await counts(sessions)
+        finally:
+            await drop(admin, engine, schema)
+
+    assert asyncio.run(main()) == (11, 11)
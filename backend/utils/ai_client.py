@@ -0,0 +1,252 @@
+import asyncio
+import base64
+import os
+from typing import Optional
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+
+from models import ReportSeverity, ReportPriority
+
+load_dotenv()
+
+# AI Service URLs
+AI_DUPLICATE_URL = os.getenv("AI_DUPLICATE_URL", "http://ai-duplicate:9001")
+AI_LLM_URL = os.getenv("AI_LLM_URL", "http://ai-llm:9002")
+AI_LLM_TIMEOUT = float(os.getenv("AI_LLM_TIMEOUT", 30.0))
+
+# Must match the model ai-duplicate serves; stored alongside each embedding
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Overall time budget for enriching one report (all AI calls together)
+AI_ENRICH_DEADLINE = float(os.getenv("AI_ENRICH_DEADLINE", 6.0))
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", 100))
+AI_MAX_KEEPALIVE = int(os.getenv("AI_MAX_KEEPALIVE", 20))
+# Use the combined /analyze endpoint (one model pass per report) when available
+AI_USE_ANALYZE = os.getenv("AI_USE_ANALYZE", "true").lower() == "true"
+
+# Shared client for the whole app lifespan (opened/closed in main.py)
+_client: Optional[httpx.AsyncClient] = None
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=AI_MAX_CONNECTIONS,
+            max_keepalive_connections=AI_MAX_KEEPALIVE,
+        ),
+        timeout=httpx.Timeout(AI_ENRICH_DEADLINE),
+    )
+
+async def start_ai_client():
+    """Open the pooled client used for all calls to the AI services."""
+    get_ai_client()
+
+async def close_ai_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_ai_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily (e.g. in scripts)."""
+    global _client
+    if _client is None:
+        _client = _new_client()
+    return _client
+
+def fallback_severity(text: str) -> ReportSeverity:
+    """Keyword-based severity used when the AI service is unavailable."""
+    text_lower = text.lower()
+    if "danger" in text_lower or "accident" in text_lower or "huge" in text_lower:
+        return ReportSeverity.critical
+    if "urgent" in text_lower:
+        return ReportSeverity.high
+    return ReportSeverity.medium
+
+def _parse_category(result: Optional[dict], default: str) -> str:
+    if result and result['confidence'] > 0.6:  # Only use if confident
+        return result['category']
+    return default
+
+def _parse_severity(result: dict, text: str) -> ReportSeverity:
+    severity_str = result['severity']
+    # Map string to enum
+    if severity_str in ReportSeverity.__members__:
+        return ReportSeverity[severity_str]
+    return fallback_severity(text)
+
+def _parse_priority(result: dict) -> tuple:
+    """(priority, text_score); text_score is the upvote-independent part of the score."""
+    priority_str = result['priority']
+    factors = result.get('factors', {})
+    print(f"Priority prediction: {priority_str}, factors: {factors}")
+    priority = ReportPriority.medium
+    if priority_str in ReportPriority.__members__:
+        priority = ReportPriority[priority_str]
+    return priority, factors.get('text_score')
+
+async def predict_category(text: str, default: str) -> str:
+    """Predict category, keeping the user's choice unless the model is confident."""
+    try:
+        response = await get_ai_client().post(
+            f"{AI_DUPLICATE_URL}/predict_category",
+            json={"text": text},
+        )
+        if response.status_code == 200:
+            return _parse_category(response.json(), default)
+    except Exception as e:
+        print(f"Category prediction failed: {e}")
+    return default
+
+async def predict_severity(text: str) -> ReportSeverity:
+    """Predict severity using AI service."""
+    try:
+        response = await get_ai_client().post(
+            f"{AI_DUPLICATE_URL}/predict_severity",
+            json={"text": text},
+        )
+        if response.status_code == 200:
+            return _parse_severity(response.json(), text)
+    except Exception as e:
+        print(f"Severity prediction failed: {e}")
+    return fallback_severity(text)
+
+async def predict_priority(text: str, latitude: float, longitude: float, upvotes: int = 0) -> tuple:
+    """Predict priority (location-based + upvotes). Returns (priority, text_score)."""
+    try:
+        response = await get_ai_client().post(
+            f"{AI_DUPLICATE_URL}/predict_priority",
+            json={
+                "text": text,
+                "latitude": latitude,
+                "longitude": longitude,
+                "upvotes": upvotes
+            },
+        )
+        if response.status_code == 200:
+            return _parse_priority(response.json())
+    except Exception as e:
+        print(f"Priority prediction failed: {e}")
+    return ReportPriority.medium, None
+
+async def embed(text: str) -> Optional[list]:
+    """Get the embedding for a report text, or None if unavailable."""
+    try:
+        response = await get_ai_client().post(
+            f"{AI_DUPLICATE_URL}/embed",
+            json={"text": text},
+        )
+        if response.status_code == 200:
+            return response.json()["embedding"]
+    except Exception as e:
+        print(f"Embedding generation failed: {e}")
+    return None
+
+async def embed_batch(texts: list, timeout: float = 120.0):
+    """
+    Embed many texts in one call. Returns (model_name, float32 matrix).
+    Raises on failure; used by batch jobs, not the request path.
+    """
+    response = await get_ai_client().post(
+        f"{AI_DUPLICATE_URL}/embed_batch",
+        json={"texts": texts},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    result = response.json()
+    matrix = np.frombuffer(base64.b64decode(result["data"]), dtype="<f4")
+    return result["model"], matrix.reshape(result["count"], result["dim"])
+
+async def generate_sql(question: str) -> str:
+    """Ask ai-llm to translate a question into SQL. Raises on failure."""
+    response = await get_ai_client().post(
+        f"{AI_LLM_URL}/generate_sql",
+        json={"query": question},
+        timeout=AI_LLM_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["sql_query"]
+
+async def analyze(text: str, category: str, latitude: float, longitude: float) -> Optional[dict]:
+    """
+    Get every prediction from ai-duplicate's combined /analyze endpoint,
+    which runs the NLI model once for all label sets. Returns None if the
+    endpoint is unavailable so the caller can use the per-field calls.
+    """
+    try:
+        response = await get_ai_client().post(
+            f"{AI_DUPLICATE_URL}/analyze",
+            json={
+                "text": text,
+                "latitude": latitude,
+                "longitude": longitude,
+                "upvotes": 0  # New report, no upvotes yet
+            },
+        )
+        if response.status_code == 200:
+            result = response.json()
+            priority, priority_text_score = _parse_priority(result['priority'])
+            return {
+                "category": _parse_category(result['category'], category),
+                "severity": _parse_severity(result['severity'], text),
+                "priority": priority,
+                "priority_text_score": priority_text_score,
+                "embedding": result['embedding'],
+            }
+    except Exception as e:
+        print(f"Combined analysis failed: {e}")
+    return None
+
+async def enrich_report(title: str, description: str, category: str,
+                        latitude: float, longitude: float) -> dict:
+    """
+    Run all AI predictions for a new report concurrently.
+
+    Every call shares one deadline (AI_ENRICH_DEADLINE). Calls that fail or
+    are still running when it expires fall back per field, so a slow model
+    never holds up the whole POST. When AI_USE_ANALYZE is set, the combined
+    /analyze endpoint is tried first and the per-field calls only run (in
+    the remaining budget) if it fails.
+    """
+    text = f"{title}. {description}"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + AI_ENRICH_DEADLINE
+
+    if AI_USE_ANALYZE:
+        try:
+            result = await asyncio.wait_for(
+                analyze(text, category, latitude, longitude), AI_ENRICH_DEADLINE
+            )
+            if result is not None:
+                return result
+        except asyncio.TimeoutError:
+            print(f"Combined analysis exceeded {AI_ENRICH_DEADLINE}s deadline")
+
+    fallbacks = {
+        "category": category,
+        "severity": fallback_severity(text),
+        "priority": (ReportPriority.medium, None),
+        "embedding": None,
+    }
+    tasks = {
+        "category": asyncio.create_task(predict_category(text, category)),
+        "severity": asyncio.create_task(predict_severity(text)),
+        "priority": asyncio.create_task(predict_priority(text, latitude, longitude)),
+        "embedding": asyncio.create_task(embed(text)),
+    }
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=max(deadline - loop.time(), 0))
+    for task in pending:
+        task.cancel()
+
+    result = {}
+    for field, task in tasks.items():
+        if task in done and task.exception() is None:
+            result[field] = task.result()
+        else:
+            if task in pending:
+                print(f"AI enrichment for '{field}' exceeded {AI_ENRICH_DEADLINE}s deadline")
+            result[field] = fallbacks[field]
+    result["priority"], result["priority_text_score"] = result["priority"]
+    return result
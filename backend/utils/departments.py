@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models import Department
+
+# Category -> department name; data, not code
+DEPARTMENT_MAPPING_PATH = os.getenv(
+    "DEPARTMENT_MAPPING_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "department_mapping.json"),
+)
+DEPARTMENT_REGISTRY_TTL = float(os.getenv("DEPARTMENT_REGISTRY_TTL", 300))
+
+class DepartmentRegistry:
+    """
+    In-memory category -> department_id map.
+
+    Built from the mapping file plus one SELECT over departments, at startup
+    and again once it is older than DEPARTMENT_REGISTRY_TTL or invalidated
+    (departments changed through the ORM, or the mapping file changed).
+    """
+
+    def __init__(self, mapping_path: str, ttl: float):
+        self.mapping_path = mapping_path
+        self.ttl = ttl
+        self.category_to_department = {}
+        self.loaded_at = None
+        self._mapping_mtime = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def _stale(self) -> bool:
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            return True
+        try:
+            return os.path.getmtime(self.mapping_path) != self._mapping_mtime
+        except OSError:
+            return False
+
+    def _load_mapping(self) -> dict:
+        self._mapping_mtime = os.path.getmtime(self.mapping_path)
+        with open(self.mapping_path) as f:
+            return json.load(f)
+
+    async def refresh(self):
+        async with self._lock:
+            if not self._stale():
+                return  # Another request refreshed while we waited
+            try:
+                mapping = self._load_mapping()
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(select(Department.id, Department.name))
+                    ids_by_name = {row.name: row.id for row in result.all()}
+            except Exception as e:
+                # Keep serving the previous map; try again on the next lookup after a TTL
+                print(f"Department registry refresh failed: {e}")
+                self.loaded_at = time.monotonic()
+                return
+            self.category_to_department = {
+                category: ids_by_name[name]
+                for category, name in mapping.items() if name in ids_by_name
+            }
+            self.loaded_at = time.monotonic()
+
+    async def department_id(self, category: str) -> Optional[int]:
+        if self._stale():
+            await self.refresh()
+        return self.category_to_department.get(category)
+
+department_registry = DepartmentRegistry(DEPARTMENT_MAPPING_PATH, DEPARTMENT_REGISTRY_TTL)
+
+@event.listens_for(Department, "after_insert")
+@event.listens_for(Department, "after_update")
+@event.listens_for(Department, "after_delete")
+def _department_changed(mapper, connection, target):
+    department_registry.invalidate()
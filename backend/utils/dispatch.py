@@ -0,0 +1,264 @@
+"""
+Field team dispatch.
+
+Active teams are kept in an in-memory grid per department (cells of
+DISPATCH_CELL_DEG degrees), so "nearest free teams" is a ring search over
+a few cells instead of a query. The index is loaded from the database,
+kept current by location pings and assignments, and reloaded every
+DISPATCH_INDEX_TTL seconds to pick up changes made elsewhere.
+"""
+import asyncio
+import heapq
+import math
+import os
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models import FieldTeam, ReportStatus
+from utils.metrics import metrics
+
+DISPATCH_CELL_DEG = float(os.getenv("DISPATCH_CELL_DEG", 0.01))  # ~1.1 km
+# Open reports a team can hold before it stops being offered
+DISPATCH_TEAM_CAPACITY = int(os.getenv("DISPATCH_TEAM_CAPACITY", 3))
+DISPATCH_INDEX_TTL = float(os.getenv("DISPATCH_INDEX_TTL", 60))
+
+# Reports that still occupy their assigned team
+OPEN_ASSIGNMENT_STATUSES = {ReportStatus.assigned, ReportStatus.in_progress, ReportStatus.reopened}
+
+METERS_PER_DEG_LAT = 110_540.0
+METERS_PER_DEG_LON = 111_320.0
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Equirectangular distance; accurate to well under 1% at city scale."""
+    dx = (lon2 - lon1) * METERS_PER_DEG_LON * math.cos(math.radians((lat1 + lat2) / 2))
+    dy = (lat2 - lat1) * METERS_PER_DEG_LAT
+    return math.hypot(dx, dy)
+
+class Team:
+    __slots__ = ("id", "name", "department_id", "status", "lat", "lon", "load", "cell")
+
+    def __init__(self, id, name, department_id, status, lat, lon, load=0):
+        self.id = id
+        self.name = name
+        self.department_id = department_id
+        self.status = status
+        self.lat = lat
+        self.lon = lon
+        self.load = load
+        self.cell = None  # (department_id, grid cell) while the team is free
+
+class TeamIndex:
+    def __init__(self, cell_deg: float, capacity: int, ttl: float):
+        self.cell_deg = cell_deg
+        self.capacity = capacity
+        self.ttl = ttl
+        self.teams = {}
+        self.grids = {}  # department_id -> {(cell_y, cell_x): {team_id, ...}} of free teams
+        self.free_counts = {}  # department_id -> free teams in its grid
+        self.loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _is_free(self, team: Team) -> bool:
+        return (team.status == "active" and team.lat is not None and team.lon is not None
+                and team.department_id is not None and team.load < self.capacity)
+
+    def _reindex(self, team: Team):
+        """Move the team to the cell matching its state (or out of the grid)."""
+        if team.cell is not None:
+            department_id, cell = team.cell
+            members = self.grids[department_id][cell]
+            members.discard(team.id)
+            if not members:
+                del self.grids[department_id][cell]
+            self.free_counts[department_id] -= 1
+            team.cell = None
+        if self._is_free(team):
+            cell = self._cell(team.lat, team.lon)
+            team.cell = (team.department_id, cell)
+            self.grids.setdefault(team.department_id, {}).setdefault(cell, set()).add(team.id)
+            self.free_counts[team.department_id] = self.free_counts.get(team.department_id, 0) + 1
+
+    def upsert(self, team_id: int, name: Optional[str], department_id: Optional[int],
+               status: str, lat: Optional[float], lon: Optional[float]):
+        team = self.teams.get(team_id)
+        if team is None:
+            team = self.teams[team_id] = Team(team_id, name, department_id, status, lat, lon)
+        else:
+            team.name, team.department_id = name, department_id
+            team.status, team.lat, team.lon = status, lat, lon
+        self._reindex(team)
+
+    def assign(self, team_id: int):
+        team = self.teams.get(team_id)
+        if team is not None:
+            team.load += 1
+            self._reindex(team)
+
+    def release(self, team_id: int):
+        team = self.teams.get(team_id)
+        if team is not None and team.load > 0:
+            team.load -= 1
+            self._reindex(team)
+
+    def nearest(self, department_id: int, lat: float, lon: float, k: int = 1) -> List[tuple]:
+        """
+        Up to k free teams of the department closest to (lat, lon), as
+        (distance_m, Team), nearest first.
+
+        Searches rings of cells outward from the point's cell and stops once
+        the next ring can't hold anything closer than the k-th best so far.
+        """
+        grid = self.grids.get(department_id)
+        if not grid:
+            return []
+        free = self.free_counts[department_id]
+        center_y, center_x = self._cell(lat, lon)
+        # Closest a team in ring r + 1 can be, per ring step
+        ring_step_m = self.cell_deg * min(METERS_PER_DEG_LAT, METERS_PER_DEG_LON * math.cos(math.radians(lat)))
+
+        best = []  # max-heap of (-distance, team_id)
+        seen = 0
+        r = 0
+        while True:
+            # Ring r has 8r cells; once that exceeds the occupied cells, scanning them all is cheaper
+            if 8 * r > len(grid):
+                cells = [c for c in grid if max(abs(c[0] - center_y), abs(c[1] - center_x)) >= r]
+            elif r == 0:
+                cells = [(center_y, center_x)]
+            else:
+                cells = [(center_y + dy, center_x + dx)
+                         for dy in range(-r, r + 1) for dx in range(-r, r + 1)
+                         if max(abs(dy), abs(dx)) == r]
+            for cell in cells:
+                for team_id in grid.get(cell, ()):
+                    team = self.teams[team_id]
+                    d = distance_m(lat, lon, team.lat, team.lon)
+                    seen += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, team_id))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, team_id))
+            if 8 * r > len(grid) or seen >= free:
+                break
+            if len(best) >= k and -best[0][0] <= r * ring_step_m:
+                break
+            r += 1
+        return [(-d, self.teams[team_id]) for d, team_id in sorted(best, reverse=True)]
+
+    def plan(self, reports: list) -> List[tuple]:
+        """
+        Greedily give each report (id, department_id, lat, lon), in order,
+        its nearest free team. Returns (report_id, team_id, distance_m) and
+        counts each assignment against the team's capacity immediately.
+        """
+        assignments = []
+        for report_id, department_id, lat, lon in reports:
+            found = self.nearest(department_id, lat, lon, 1)
+            if found:
+                distance, team = found[0]
+                self.assign(team.id)
+                assignments.append((report_id, team.id, distance))
+        return assignments
+
+    async def reload(self):
+        """Rebuild the index from field_teams and the open assignment counts."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(
+                FieldTeam.id, FieldTeam.name, FieldTeam.department_id,
+                FieldTeam.status, FieldTeam.current_lat, FieldTeam.current_lon
+            ))
+            rows = result.all()
+            result = await db.execute(
+                text("""
+                    SELECT assigned_team_id, COUNT(*) AS load FROM reports
+                    WHERE assigned_team_id IS NOT NULL AND status::text = ANY(:statuses)
+                    GROUP BY assigned_team_id
+                """),
+                {"statuses": [s.name for s in OPEN_ASSIGNMENT_STATUSES]}
+            )
+            loads = {row.assigned_team_id: row.load for row in result.all()}
+
+        self.teams, self.grids, self.free_counts = {}, {}, {}
+        for row in rows:
+            team = self.teams[row.id] = Team(
+                row.id, row.name, row.department_id, row.status or "active",
+                row.current_lat, row.current_lon, loads.get(row.id, 0)
+            )
+            self._reindex(team)
+        self.loaded_at = time.monotonic()
+
+    async def ensure_fresh(self):
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at <= self.ttl:
+            return
+        async with self._lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+                await self.reload()
+
+    def stats(self) -> dict:
+        return {
+            "teams": len(self.teams),
+            "free_teams": sum(self.free_counts.values()),
+            "departments": len(self.grids),
+            "capacity": self.capacity,
+        }
+
+team_index = TeamIndex(DISPATCH_CELL_DEG, DISPATCH_TEAM_CAPACITY, DISPATCH_INDEX_TTL)
+
+async def dispatch_pending(db: AsyncSession, limit: int) -> List[tuple]:
+    """
+    Assign up to `limit` pending, unassigned reports (highest priority,
+    then oldest first) to their nearest free team: one SELECT, the
+    in-memory plan, one bulk UPDATE, committed here so the index and the
+    database agree on which teams are taken.
+    """
+    await team_index.ensure_fresh()
+    result = await db.execute(
+        text("""
+            SELECT id, department_id, priority, ST_Y(location) AS lat, ST_X(location) AS lon
+            FROM reports
+            WHERE status = 'pending' AND assigned_team_id IS NULL
+              AND department_id IS NOT NULL AND location IS NOT NULL
+            ORDER BY priority DESC, created_at
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+        """),
+        {"limit": limit}
+    )
+    rows = result.all()
+    priorities = {row.id: row.priority for row in rows}
+
+    started = time.perf_counter()
+    assignments = team_index.plan([(row.id, row.department_id, row.lat, row.lon) for row in rows])
+    metrics.observe("dispatch.plan", time.perf_counter() - started)
+    if not assignments:
+        return []
+
+    try:
+        await db.execute(
+            text("""
+                UPDATE reports r SET assigned_team_id = a.team_id, status = 'assigned'
+                FROM unnest(CAST(:ids AS integer[]), CAST(:team_ids AS integer[])) AS a(report_id, team_id)
+                WHERE r.id = a.report_id
+            """),
+            {"ids": [a[0] for a in assignments], "team_ids": [a[1] for a in assignments]}
+        )
+        # Deferred import: report_events imports this module
+        from utils import report_events
+        await report_events.reports_assigned(
+            db, [(report_id, ReportStatus.pending, priorities[report_id]) for report_id, _, _ in assignments]
+        )
+        await db.commit()
+    except Exception:
+        for _, team_id, _ in assignments:
+            team_index.release(team_id)
+        raise
+    metrics.incr("dispatch.assigned", len(assignments))
+    return assignments
@@ -0,0 +1,66 @@
+import os
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func
+from models import Report, ReportStatus
+
+# Candidate reports must be within this distance of the new one
+DUPLICATE_RADIUS_M = float(os.getenv("DUPLICATE_RADIUS_M", 200))
+# Cosine similarity at or above which a nearby report is a likely duplicate
+DUPLICATE_MIN_SIMILARITY = float(os.getenv("DUPLICATE_MIN_SIMILARITY", 0.6))
+DUPLICATE_LIMIT = int(os.getenv("DUPLICATE_LIMIT", 5))
+
+# Reports in these states can't absorb a new duplicate
+CLOSED_STATUSES = [ReportStatus.closed, ReportStatus.rejected]
+
+async def find_duplicates(
+    db: AsyncSession,
+    embedding,
+    latitude: float,
+    longitude: float,
+    radius: float = DUPLICATE_RADIUS_M,
+    min_similarity: float = DUPLICATE_MIN_SIMILARITY,
+    limit: int = DUPLICATE_LIMIT,
+    exclude_id: Optional[int] = None,
+) -> list:
+    """
+    Nearest open reports by embedding, within `radius` meters.
+
+    Uses the stored vectors: the ST_DWithin pre-filter is served by the
+    geography(location) GiST index and the cosine ORDER BY ... LIMIT by the
+    HNSW index on reports.embedding, so nothing is re-embedded.
+    """
+    distance = Report.embedding.cosine_distance(embedding)
+    point = func.geography(func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326))
+    location = func.geography(Report.location)
+
+    query = select(
+        Report.id,
+        Report.title,
+        Report.category,
+        Report.status,
+        (1 - distance).label("similarity"),
+        func.ST_Distance(location, point).label("distance_m"),
+    ).where(
+        Report.embedding.is_not(None),
+        Report.status.notin_(CLOSED_STATUSES),
+        func.ST_DWithin(location, point, radius),
+    )
+    if exclude_id is not None:
+        query = query.where(Report.id != exclude_id)
+    query = query.order_by(distance).limit(limit)
+
+    result = await db.execute(query)
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "category": row.category,
+            "status": row.status,
+            "similarity": float(row.similarity),
+            "distance_m": float(row.distance_m),
+        }
+        for row in result.all()
+        if row.similarity >= min_similarity
+    ]
@@ -0,0 +1,142 @@
+import math
+import os
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import text, func
+from models import HeatmapCell, ReportStatus, ReportPriority
+
+# Tiles are served for zooms 0..HEATMAP_MAX_ZOOM; each tile is split into
+# 2^HEATMAP_CELL_BITS x 2^HEATMAP_CELL_BITS cells, so counts are kept at
+# grid levels HEATMAP_CELL_BITS .. HEATMAP_MAX_ZOOM + HEATMAP_CELL_BITS.
+HEATMAP_MAX_ZOOM = int(os.getenv("HEATMAP_MAX_ZOOM", 16))
+HEATMAP_CELL_BITS = int(os.getenv("HEATMAP_CELL_BITS", 5))
+MIN_LEVEL = HEATMAP_CELL_BITS
+MAX_LEVEL = HEATMAP_MAX_ZOOM + HEATMAP_CELL_BITS
+
+MAX_LATITUDE = 85.05112878  # web-mercator limit
+
+# Web-mercator tile coordinates of reports.location at grid level l.level
+CELL_X_SQL = """
+    LEAST(FLOOR((ST_X(r.location) + 180.0) / 360.0 * POWER(2, l.level)), POWER(2, l.level) - 1)::int
+"""
+CELL_Y_SQL = f"""
+    LEAST(GREATEST(FLOOR(
+        (1 - LN(TAN(RADIANS(GREATEST(LEAST(ST_Y(r.location), {MAX_LATITUDE}), -{MAX_LATITUDE})))
+              + 1 / COS(RADIANS(GREATEST(LEAST(ST_Y(r.location), {MAX_LATITUDE}), -{MAX_LATITUDE}))))
+         / PI()) / 2 * POWER(2, l.level)
+    ), 0), POWER(2, l.level) - 1)::int
+"""
+
+def cell_center(level: int, cell_x: int, cell_y: int) -> tuple:
+    """(lat, lon) of the center of a grid cell."""
+    n = 2 ** level
+    lon = (cell_x + 0.5) / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (cell_y + 0.5) / n))))
+    return lat, lon
+
+async def adjust_heatmap(db: AsyncSession, changes: list):
+    """
+    Apply count deltas for reports to every grid level.
+
+    changes is a list of (report_id, status, priority, delta); the cells
+    come from the report's stored location. Runs in the caller's
+    transaction so the counts commit with the report write.
+    """
+    if not changes:
+        return
+    await db.execute(
+        text(f"""
+            INSERT INTO heatmap_cells (level, cell_x, cell_y, status, priority, count)
+            SELECT l.level, {CELL_X_SQL}, {CELL_Y_SQL},
+                   c.status::reportstatus, c.priority::reportpriority, SUM(c.delta)
+            FROM unnest(CAST(:ids AS integer[]), CAST(:statuses AS text[]),
+                        CAST(:priorities AS text[]), CAST(:deltas AS integer[]))
+                 AS c(report_id, status, priority, delta)
+            JOIN reports r ON r.id = c.report_id
+            CROSS JOIN generate_series(:min_level, :max_level) AS l(level)
+            WHERE r.location IS NOT NULL
+            GROUP BY 1, 2, 3, 4, 5
+            ON CONFLICT (level, cell_x, cell_y, status, priority)
+            DO UPDATE SET count = heatmap_cells.count + EXCLUDED.count
+        """),
+        {
+            "ids": [c[0] for c in changes],
+            "statuses": [ReportStatus(c[1]).name for c in changes],
+            "priorities": [ReportPriority(c[2]).name for c in changes],
+            "deltas": [c[3] for c in changes],
+            "min_level": MIN_LEVEL,
+            "max_level": MAX_LEVEL,
+        }
+    )
+
+async def rebuild_heatmap(db: AsyncSession):
+    """Recompute every cell from the reports table (repairs drift)."""
+    await db.execute(text("DELETE FROM heatmap_cells"))
+    await db.execute(
+        text(f"""
+            INSERT INTO heatmap_cells (level, cell_x, cell_y, status, priority, count)
+            SELECT l.level, {CELL_X_SQL}, {CELL_Y_SQL}, r.status, r.priority, COUNT(*)
+            FROM reports r
+            CROSS JOIN generate_series(:min_level, :max_level) AS l(level)
+            WHERE r.location IS NOT NULL
+            GROUP BY 1, 2, 3, 4, 5
+        """),
+        {"min_level": MIN_LEVEL, "max_level": MAX_LEVEL}
+    )
+
+def _filtered(query, status, priority):
+    if status:
+        query = query.where(HeatmapCell.status == status)
+    if priority:
+        query = query.where(HeatmapCell.priority == priority)
+    return query
+
+async def get_tile(db: AsyncSession, z: int, x: int, y: int, status=None, priority=None) -> list:
+    """Aggregated cells inside tile z/x/y."""
+    level = z + HEATMAP_CELL_BITS
+    x_min, y_min = x << HEATMAP_CELL_BITS, y << HEATMAP_CELL_BITS
+    x_max, y_max = ((x + 1) << HEATMAP_CELL_BITS) - 1, ((y + 1) << HEATMAP_CELL_BITS) - 1
+
+    total = func.sum(HeatmapCell.count)
+    query = _filtered(
+        select(HeatmapCell.cell_x, HeatmapCell.cell_y, total.label("count")).where(
+            HeatmapCell.level == level,
+            HeatmapCell.cell_x.between(x_min, x_max),
+            HeatmapCell.cell_y.between(y_min, y_max),
+        ),
+        status, priority
+    ).group_by(HeatmapCell.cell_x, HeatmapCell.cell_y).having(total > 0)
+
+    result = await db.execute(query)
+    cells = []
+    for row in result.all():
+        lat, lon = cell_center(level, row.cell_x, row.cell_y)
+        cells.append({
+            "x": row.cell_x - x_min,
+            "y": row.cell_y - y_min,
+            "latitude": lat,
+            "longitude": lon,
+            "count": row.count,
+        })
+    return cells
+
+async def get_densest_cells(db: AsyncSession, zoom: int, limit: int, status=None, priority=None) -> list:
+    """The densest (cell, priority, status) groups at one zoom level."""
+    level = zoom + HEATMAP_CELL_BITS
+    query = _filtered(
+        select(HeatmapCell).where(HeatmapCell.level == level, HeatmapCell.count > 0),
+        status, priority
+    ).order_by(HeatmapCell.count.desc()).limit(limit)
+
+    result = await db.execute(query)
+    points = []
+    for cell in result.scalars().all():
+        lat, lon = cell_center(level, cell.cell_x, cell.cell_y)
+        points.append({
+            "latitude": lat,
+            "longitude": lon,
+            "intensity": cell.count,
+            "priority": cell.priority.value,
+            "status": cell.status.value,
+        })
+    return points
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from database import AsyncSessionLocal
+
+# Reports from the last HOTSPOT_WINDOW_DAYS are clustered per category with
+# DBSCAN: a hotspot is at least HOTSPOT_MIN_POINTS reports, each within
+# HOTSPOT_EPS_M meters of another report in the cluster.
+HOTSPOT_WINDOW_DAYS = int(os.getenv("HOTSPOT_WINDOW_DAYS", 30))
+HOTSPOT_EPS_M = float(os.getenv("HOTSPOT_EPS_M", 150))
+HOTSPOT_MIN_POINTS = int(os.getenv("HOTSPOT_MIN_POINTS", 3))
+# Categories with new reports are re-clustered this often; everything is
+# re-clustered every HOTSPOT_FULL_REFRESH_SECONDS so old reports age out
+HOTSPOT_REFRESH_SECONDS = float(os.getenv("HOTSPOT_REFRESH_SECONDS", 60))
+HOTSPOT_FULL_REFRESH_SECONDS = float(os.getenv("HOTSPOT_FULL_REFRESH_SECONDS", 3600))
+
+# Only one worker process re-clusters at a time
+HOTSPOT_LOCK_ID = 727001
+
+# Categories with reports created since their last clustering (this process)
+_dirty_categories = set()
+
+def mark_category_dirty(category: Optional[str]):
+    if category:
+        _dirty_categories.add(category)
+
+async def refresh_hotspots(db: AsyncSession, categories: Optional[list] = None) -> bool:
+    """
+    Re-cluster recent reports and replace the stored hotspots, for the
+    given categories or all of them. Returns False if another worker is
+    already refreshing.
+
+    Clustering runs in PostGIS with ST_ClusterDBSCAN over web-mercator
+    coordinates; eps is scaled by 1/cos(latitude) so it is in real meters
+    around the reports' mean latitude.
+    """
+    locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": HOTSPOT_LOCK_ID})
+    if not locked:
+        return False
+
+    params = {
+        "days": HOTSPOT_WINDOW_DAYS,
+        "eps": HOTSPOT_EPS_M,
+        "min_points": HOTSPOT_MIN_POINTS,
+        "all_categories": categories is None,
+        "categories": list(categories or []),
+    }
+    category_filter = "(:all_categories OR category = ANY(CAST(:categories AS text[])))"
+
+    await db.execute(text(f"DELETE FROM hotspot_clusters WHERE {category_filter}"), params)
+    await db.execute(text(f"""
+        WITH pts AS (
+            SELECT category, priority, created_at, location,
+                   ST_Transform(location, 3857) AS geom
+            FROM reports
+            WHERE created_at > NOW() - make_interval(days => :days)
+              AND location IS NOT NULL
+              AND {category_filter}
+        ),
+        scale AS (
+            SELECT 1 / COS(RADIANS(AVG(ST_Y(location)))) AS k FROM pts
+        ),
+        clustered AS (
+            SELECT pts.*,
+                   ST_ClusterDBSCAN(geom, eps := :eps * (SELECT k FROM scale), minpoints := :min_points)
+                       OVER (PARTITION BY category) AS cluster_id
+            FROM pts
+        ),
+        clusters AS (
+            SELECT category, cluster_id,
+                   ST_Centroid(ST_Collect(location)) AS center,
+                   COUNT(*) AS report_count,
+                   MAX(priority) AS priority,
+                   MIN(created_at) AS first_report_at,
+                   MAX(created_at) AS last_report_at
+            FROM clustered
+            WHERE cluster_id IS NOT NULL
+            GROUP BY category, cluster_id
+        )
+        INSERT INTO hotspot_clusters
+            (category, report_count, latitude, longitude, radius_m, priority,
+             first_report_at, last_report_at, computed_at)
+        SELECT c.category, c.report_count, ST_Y(c.center), ST_X(c.center),
+               MAX(ST_Distance(geography(p.location), geography(c.center))),
+               c.priority, c.first_report_at, c.last_report_at, NOW()
+        FROM clusters c
+        JOIN clustered p ON p.category = c.category AND p.cluster_id = c.cluster_id
+        GROUP BY c.category, c.cluster_id, c.center, c.report_count, c.priority,
+                 c.first_report_at, c.last_report_at
+    """), params)
+    return True
+
+async def run_hotspot_scheduler():
+    """Background task: keep hotspot_clusters fresh (started from main.py)."""
+    last_full = 0.0
+    while True:
+        full = time.monotonic() - last_full >= HOTSPOT_FULL_REFRESH_SECONDS
+        categories = None if full else sorted(_dirty_categories)
+        if full or categories:
+            _dirty_categories.difference_update(categories or [])
+            try:
+                async with AsyncSessionLocal() as db:
+                    refreshed = await refresh_hotspots(db, categories)
+                    await db.commit()
+                if full and refreshed:
+                    last_full = time.monotonic()
+                elif not refreshed:
+                    _dirty_categories.update(categories or [])
+            except Exception as e:
+                print(f"Hotspot refresh failed: {e}")
+                _dirty_categories.update(categories or [])
+        await asyncio.sleep(HOTSPOT_REFRESH_SECONDS)
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class Timing:
+    """Count, total and max of a duration, plus recent samples for percentiles."""
+
+    def __init__(self, samples: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            return recent[min(int(p * len(recent)), len(recent) - 1)] * 1000.0 if recent else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000.0 if self.count else 0.0,
+            "max_ms": self.max * 1000.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+class Metrics:
+    """In-process counters, timings and gauges, served as JSON at GET /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timings = {}
+        self.gauges = {}
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def gauge(self, name: str, fn):
+        """Register a callable whose value is read at snapshot time."""
+        self.gauges[name] = fn
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            timings = {name: timing.snapshot() for name, timing in self.timings.items()}
+        return {
+            "counters": counters,
+            "timings": timings,
+            "gauges": {name: fn() for name, fn in self.gauges.items()},
+        }
+
+metrics = Metrics()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from database import AsyncSessionLocal
+from models import ReportStatus, ReportPriority
+from utils import report_events
+
+# Re-scores priority as upvotes change. Mirrors score_priority in
+# ai-duplicate/service.py: the text factors (location 40% + urgency 30%)
+# are stored per report as priority_text_score, so only the upvote term
+# (30%, capped at 20 upvotes) is re-evaluated and the model never runs.
+PRIORITY_SCORE_SQL = "r.priority_text_score + LEAST(COALESCE(r.upvotes, 0) / 20.0, 1.0) * 0.3"
+PRIORITY_LEVEL_SQL = f"""
+    CASE
+        WHEN {PRIORITY_SCORE_SQL} >= 0.7 THEN 'critical'
+        WHEN {PRIORITY_SCORE_SQL} >= 0.5 THEN 'high'
+        WHEN {PRIORITY_SCORE_SQL} >= 0.3 THEN 'medium'
+        ELSE 'low'
+    END::reportpriority
+"""
+
+PRIORITY_REFRESH_INTERVAL = float(os.getenv("PRIORITY_REFRESH_INTERVAL", 5.0))
+PRIORITY_BATCH_SIZE = int(os.getenv("PRIORITY_BATCH_SIZE", 1000))
+
+async def reprioritize(db: AsyncSession, report_ids: list) -> list:
+    """
+    Recompute priority for the given reports with one bulk UPDATE.
+    Returns (report_id, status, old_priority, new_priority) for reports
+    whose priority changed; reports without a text score are left alone.
+    """
+    if not report_ids:
+        return []
+    result = await db.execute(
+        text(f"""
+            UPDATE reports SET priority = n.new_priority
+            FROM (
+                SELECT r.id, r.priority AS old_priority, {PRIORITY_LEVEL_SQL} AS new_priority
+                FROM reports r
+                WHERE r.id = ANY(CAST(:ids AS integer[])) AND r.priority_text_score IS NOT NULL
+                FOR UPDATE
+            ) AS n
+            WHERE reports.id = n.id AND reports.priority IS DISTINCT FROM n.new_priority
+            RETURNING reports.id, reports.status, n.old_priority, reports.priority
+        """),
+        {"ids": list(report_ids)}
+    )
+    return [
+        (row.id, ReportStatus(row.status), ReportPriority(row.old_priority), ReportPriority(row.priority))
+        for row in result.all()
+    ]
+
+class PriorityWorker:
+    """
+    Collects ids of reports whose upvotes changed and re-prioritizes them
+    in batches every PRIORITY_REFRESH_INTERVAL seconds, off the vote path.
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._pending = set()
+        self.updated = 0
+        self.batches = 0
+
+    def mark(self, report_id: int):
+        self._pending.add(report_id)
+
+    async def process(self):
+        while self._pending:
+            batch = [self._pending.pop() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                async with AsyncSessionLocal() as db:
+                    changes = await reprioritize(db, batch)
+                    await report_events.report_priorities_changed(db, changes)
+                    await db.commit()
+                self.batches += 1
+                self.updated += len(changes)
+            except Exception as e:
+                print(f"Re-prioritization failed: {e}")
+                self._pending.update(batch)
+                return
+
+    async def run(self):
+        """Background loop (started from main.py)."""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.process()
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "batches": self.batches, "updated": self.updated}
+
+priority_worker = PriorityWorker(PRIORITY_REFRESH_INTERVAL, PRIORITY_BATCH_SIZE)
@@ -0,0 +1,73 @@
+"""
+Hooks for report writes.
+
+Routers call these after flushing a report change and before committing,
+so derived aggregates are updated in the same transaction as the report.
+The analytics cache is cleared once that transaction commits, so a
+concurrent request can't re-fill it from pre-commit data.
+"""
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import Report, ReportStatus
+from utils.heatmap import adjust_heatmap
+from utils.hotspots import mark_category_dirty
+from utils.cache import analytics_cache
+from utils.rollups import adjust_daily_rollups, record_resolution_change
+from utils.dispatch import team_index, OPEN_ASSIGNMENT_STATUSES
+
+def _clear_analytics_on_commit(db: AsyncSession):
+    db.sync_session.info["clear_analytics_cache"] = True
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    if session.info.pop("clear_analytics_cache", False):
+        analytics_cache.clear()
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("clear_analytics_cache", None)
+
+async def report_created(db: AsyncSession, report: Report):
+    changes = [(report.id, report.status, report.priority, 1)]
+    await adjust_heatmap(db, changes)
+    await adjust_daily_rollups(db, changes)
+    mark_category_dirty(report.category)
+    _clear_analytics_on_commit(db)
+
+async def report_status_changed(db: AsyncSession, report: Report, old_status: ReportStatus):
+    if old_status == report.status:
+        return
+    changes = [
+        (report.id, old_status, report.priority, -1),
+        (report.id, report.status, report.priority, 1),
+    ]
+    await adjust_heatmap(db, changes)
+    await adjust_daily_rollups(db, changes)
+    await record_resolution_change(db, report.id, old_status, report.status)
+    if report.assigned_team_id and old_status in OPEN_ASSIGNMENT_STATUSES \
+            and report.status not in OPEN_ASSIGNMENT_STATUSES:
+        team_index.release(report.assigned_team_id)
+    _clear_analytics_on_commit(db)
+
+async def reports_assigned(db: AsyncSession, changes: list):
+    """changes: (report_id, old_status, priority) tuples for reports now 'assigned'."""
+    deltas = []
+    for report_id, old_status, priority in changes:
+        deltas.append((report_id, old_status, priority, -1))
+        deltas.append((report_id, ReportStatus.assigned, priority, 1))
+    await adjust_heatmap(db, deltas)
+    await adjust_daily_rollups(db, deltas)
+    _clear_analytics_on_commit(db)
+
+async def report_priorities_changed(db: AsyncSession, changes: list):
+    """changes: (report_id, status, old_priority, new_priority) tuples."""
+    if not changes:
+        return
+    deltas = []
+    for report_id, status, old_priority, new_priority in changes:
+        deltas.append((report_id, status, old_priority, -1))
+        deltas.append((report_id, status, new_priority, 1))
+    await adjust_heatmap(db, deltas)
+    await adjust_daily_rollups(db, deltas)
+    _clear_analytics_on_commit(db)
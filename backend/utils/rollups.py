@@ -0,0 +1,109 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from models import ReportStatus, ReportPriority
+
+RESOLVED_STATUSES = (ReportStatus.resolved, ReportStatus.closed)
+RESOLUTION_BUCKETS = ["under_24h", "under_7d", "under_30d", "over_30d"]
+
+# Time-to-resolve bucket of a report row `r`
+BUCKET_SQL = """
+    CASE
+        WHEN r.resolved_at - r.created_at < INTERVAL '1 day' THEN 'under_24h'
+        WHEN r.resolved_at - r.created_at < INTERVAL '7 days' THEN 'under_7d'
+        WHEN r.resolved_at - r.created_at < INTERVAL '30 days' THEN 'under_30d'
+        ELSE 'over_30d'
+    END
+"""
+
+async def adjust_daily_rollups(db: AsyncSession, changes: list):
+    """
+    Apply count deltas to the daily rollups.
+
+    changes is a list of (report_id, status, priority, delta); day,
+    category and department come from the report row. Runs in the
+    caller's transaction so the rollups commit with the report write.
+    """
+    if not changes:
+        return
+    await db.execute(
+        text("""
+            INSERT INTO report_daily_rollups (day, category, status, priority, department_id, count)
+            SELECT DATE(r.created_at), COALESCE(r.category, ''),
+                   c.status::reportstatus, c.priority::reportpriority,
+                   COALESCE(r.department_id, 0), SUM(c.delta)
+            FROM unnest(CAST(:ids AS integer[]), CAST(:statuses AS text[]),
+                        CAST(:priorities AS text[]), CAST(:deltas AS integer[]))
+                 AS c(report_id, status, priority, delta)
+            JOIN reports r ON r.id = c.report_id
+            GROUP BY 1, 2, 3, 4, 5
+            ON CONFLICT (day, category, status, priority, department_id)
+            DO UPDATE SET count = report_daily_rollups.count + EXCLUDED.count
+        """),
+        {
+            "ids": [c[0] for c in changes],
+            "statuses": [ReportStatus(c[1]).name for c in changes],
+            "priorities": [ReportPriority(c[2]).name for c in changes],
+            "deltas": [c[3] for c in changes],
+        }
+    )
+
+async def _adjust_resolution(db: AsyncSession, report_id: int, delta: int):
+    await db.execute(
+        text(f"""
+            INSERT INTO report_resolution_rollups (day, category, department_id, bucket, count)
+            SELECT DATE(r.resolved_at), COALESCE(r.category, ''), COALESCE(r.department_id, 0),
+                   {BUCKET_SQL}, :delta
+            FROM reports r
+            WHERE r.id = :id AND r.resolved_at IS NOT NULL
+            ON CONFLICT (day, category, department_id, bucket)
+            DO UPDATE SET count = report_resolution_rollups.count + EXCLUDED.count
+        """),
+        {"id": report_id, "delta": delta}
+    )
+
+async def record_resolution_change(db: AsyncSession, report_id: int,
+                                   old_status: ReportStatus, new_status: ReportStatus):
+    """
+    Track reports entering or leaving resolved/closed: stamp or clear
+    reports.resolved_at and move the report in the resolution rollups.
+    """
+    was_resolved = old_status in RESOLVED_STATUSES
+    is_resolved = new_status in RESOLVED_STATUSES
+    if is_resolved and not was_resolved:
+        await db.execute(text("UPDATE reports SET resolved_at = NOW() WHERE id = :id"), {"id": report_id})
+        await _adjust_resolution(db, report_id, 1)
+    elif was_resolved and not is_resolved:
+        await _adjust_resolution(db, report_id, -1)
+        await db.execute(text("UPDATE reports SET resolved_at = NULL WHERE id = :id"), {"id": report_id})
+
+async def rebuild_rollups(db: AsyncSession):
+    """Recompute both rollup tables from the reports table (repairs drift)."""
+    # Reports resolved before resolved_at existed: best estimate is the last update
+    await db.execute(text("""
+        UPDATE reports SET resolved_at = COALESCE(updated_at, created_at)
+        WHERE status IN ('resolved', 'closed') AND resolved_at IS NULL
+    """))
+    await db.execute(text("""
+        UPDATE reports SET resolved_at = NULL
+        WHERE status NOT IN ('resolved', 'closed') AND resolved_at IS NOT NULL
+    """))
+
+    await db.execute(text("DELETE FROM report_daily_rollups"))
+    await db.execute(text("""
+        INSERT INTO report_daily_rollups (day, category, status, priority, department_id, count)
+        SELECT DATE(r.created_at), COALESCE(r.category, ''), r.status, r.priority,
+               COALESCE(r.department_id, 0), COUNT(*)
+        FROM reports r
+        WHERE r.created_at IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    """))
+
+    await db.execute(text("DELETE FROM report_resolution_rollups"))
+    await db.execute(text(f"""
+        INSERT INTO report_resolution_rollups (day, category, department_id, bucket, count)
+        SELECT DATE(r.resolved_at), COALESCE(r.category, ''), COALESCE(r.department_id, 0),
+               {BUCKET_SQL}, COUNT(*)
+        FROM reports r
+        WHERE r.resolved_at IS NOT NULL AND r.created_at IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """))
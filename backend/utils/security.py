@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from utils.metrics import metrics
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,20 +15,66 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your_super_secret_key_change_this")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+# bcrypt runs on its own small pool (it releases the GIL), never on the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+# Hashes running or queued before new ones are turned away with a 429
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", PASSWORD_HASH_WORKERS * 4))
+PASSWORD_HASH_RETRY_AFTER = 1
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+
+class PasswordHashBusy(Exception):
+    """The password hashing pool is saturated; main.py turns this into a 429."""
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def _timed(name: str, fn, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        metrics.observe(f"password_hash.{name}", time.perf_counter() - started)
+
+async def _run_hash(name: str, fn, *args):
+    if _hash_slots.locked():
+        metrics.incr("password_hash.rejected")
+        raise PasswordHashBusy()
+    async with _hash_slots:
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                _hash_executor, _timed, name, fn, *args
+            )
+        finally:
+            metrics.observe("password_hash.total", time.perf_counter() - started)
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """verify_password on the hashing pool; raises PasswordHashBusy when saturated."""
+    return await _run_hash("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    """get_password_hash on the hashing pool; raises PasswordHashBusy when saturated."""
+    return await _run_hash("hash", get_password_hash, password)
+
+metrics.gauge("password_hash_pool", lambda: {
+    "workers": PASSWORD_HASH_WORKERS,
+    "max_pending": PASSWORD_HASH_MAX_PENDING,
+    "pending": PASSWORD_HASH_MAX_PENDING - _hash_slots._value,
+})
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
@@ -0,0 +1,158 @@
+"""
+Guarded execution of LLM-generated SQL for /analytics/ask.
+
+Questions are normalized and their validated SQL cached; the SQL is parsed
+with sqlglot and must be a single read-only SELECT over ASK_ALLOWED_TABLES.
+It runs as the SELECT-only role in ASK_DATABASE_URL (the endpoint is disabled
+without one), in a READ ONLY transaction with a statement_timeout and a row
+cap, and complete results are cached briefly per SQL.
+"""
+import json
+import os
+import re
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlalchemy import text
+
+from database import make_engine
+from utils.cache import TTLCache
+from utils.metrics import metrics
+
+ASK_ALLOWED_TABLES = {
+    t.strip() for t in os.getenv(
+        "ASK_ALLOWED_TABLES",
+        "reports,departments,field_teams,report_daily_rollups,report_resolution_rollups,hotspot_clusters",
+    ).split(",") if t.strip()
+}
+ASK_STATEMENT_TIMEOUT_MS = int(os.getenv("ASK_STATEMENT_TIMEOUT_MS", 5000))
+ASK_MAX_ROWS = int(os.getenv("ASK_MAX_ROWS", 5000))
+ASK_SQL_CACHE_TTL = float(os.getenv("ASK_SQL_CACHE_TTL", 86400))
+ASK_RESULT_CACHE_TTL = float(os.getenv("ASK_RESULT_CACHE_TTL", 30))
+# Connection string for a SELECT-only role; /analytics/ask is disabled without it
+ASK_DATABASE_URL = os.getenv("ASK_DATABASE_URL", "")
+
+# Functions that reach outside the query (files, sessions, other servers) or stall it
+DENIED_FUNCTION_PREFIXES = (
+    "pg_", "lo_", "dblink", "set_config", "current_setting", "query_to_xml", "nextval", "setval",
+)
+DENIED_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter,
+    exp.Command, exp.Into, exp.Lock,
+)
+
+ask_engine = make_engine(ASK_DATABASE_URL, "ask") if ASK_DATABASE_URL else None
+
+sql_cache = TTLCache(maxsize=1000, ttl=ASK_SQL_CACHE_TTL)
+result_cache = TTLCache(maxsize=256, ttl=ASK_RESULT_CACHE_TTL)
+metrics.gauge("ask_sql_cache", sql_cache.stats)
+metrics.gauge("ask_result_cache", result_cache.stats)
+
+class UnsafeQuery(ValueError):
+    pass
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the question."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.! ").lower()
+
+def _strip_fences(sql: str) -> str:
+    return sql.replace("```sql", "").replace("```", "").strip().rstrip(";").strip()
+
+def _cte_scopes(tree) -> dict:
+    """Map each node that owns a WITH clause to the CTE names visible under it."""
+    scopes = {}
+    for with_ in tree.find_all(exp.With):
+        scopes.setdefault(id(with_.parent), set()).update(cte.alias_or_name for cte in with_.expressions)
+    return scopes
+
+def _is_cte_reference(table, scopes: dict) -> bool:
+    if table.db or table.catalog:
+        return False
+    node = table.parent
+    while node is not None:
+        if table.name in scopes.get(id(node), ()):
+            return True
+        node = node.parent
+    return False
+
+def validate_sql(sql: str) -> str:
+    """
+    Return the canonical (postgres) text of `sql` if it is one SELECT that
+    only reads ASK_ALLOWED_TABLES; raise UnsafeQuery otherwise.
+    """
+    try:
+        statements = sqlglot.parse(_strip_fences(sql), read="postgres")
+    except SqlglotError as e:
+        raise UnsafeQuery(f"Could not parse SQL: {e}")
+    statements = [s for s in statements if s is not None]
+    if len(statements) != 1:
+        raise UnsafeQuery("Exactly one statement is allowed")
+    tree = statements[0]
+    if not isinstance(tree, (exp.Select, exp.Union)):
+        raise UnsafeQuery("Only SELECT queries are allowed")
+
+    denied = tree.find(*DENIED_NODES)
+    if denied is not None:
+        raise UnsafeQuery(f"{denied.key.upper()} is not allowed")
+
+    # A CTE name only shadows a table inside the query that defines it
+    scopes = _cte_scopes(tree)
+    for table in tree.find_all(exp.Table):
+        if (table.db and table.db != "public") or table.catalog:
+            raise UnsafeQuery(f"Table {table.sql(dialect='postgres')} is not allowed")
+        if table.name not in ASK_ALLOWED_TABLES and not _is_cte_reference(table, scopes):
+            raise UnsafeQuery(f"Table {table.name} is not allowed")
+
+    for func in tree.find_all(exp.Func):
+        name = (func.name if isinstance(func, exp.Anonymous) else func.sql_name()).lower()
+        if name.startswith(DENIED_FUNCTION_PREFIXES):
+            raise UnsafeQuery(f"Function {name} is not allowed")
+
+    return tree.sql(dialect="postgres")
+
+def _line(obj) -> str:
+    return json.dumps(obj, default=str) + "\n"
+
+async def stream_query(sql: str, source: dict):
+    """
+    Yield NDJSON: a header line (sql, columns, where the SQL came from), one
+    line per row (at most ASK_MAX_ROWS), then a footer with row_count and
+    whether the cap truncated the result. Errors become an {"error"} line.
+    """
+    cached = result_cache.get(sql)
+    if cached is not None:
+        columns, rows, truncated = cached
+        yield _line({"sql": sql, "columns": columns, "result_cached": True, **source})
+        for row in rows:
+            yield _line(row)
+        yield _line({"row_count": len(rows), "truncated": truncated})
+        return
+
+    # LIMIT cap + 1 tells us whether the cap cut anything off; colons are
+    # escaped so casts and literals aren't taken for bind parameters
+    escaped = sql.replace(":", "\\:")
+    capped = text(f"SELECT * FROM ({escaped}) AS ask_query LIMIT {ASK_MAX_ROWS + 1}")
+    rows, truncated = [], False
+    try:
+        async with ask_engine.connect() as conn:
+            async with conn.begin():
+                await conn.execute(text("SET TRANSACTION READ ONLY"))
+                await conn.execute(text(f"SET LOCAL statement_timeout = {ASK_STATEMENT_TIMEOUT_MS}"))
+                result = await conn.stream(capped)
+                columns = list(result.keys())
+                yield _line({"sql": sql, "columns": columns, "result_cached": False, **source})
+                async for row in result:
+                    if len(rows) == ASK_MAX_ROWS:
+                        truncated = True
+                        break
+                    values = list(row)
+                    rows.append(values)
+                    yield _line(values)
+    except Exception as e:
+        metrics.incr("ask.errors")
+        yield _line({"error": str(e).splitlines()[0]})
+        return
+
+    result_cache.set(sql, (columns, rows, truncated))
+    yield _line({"row_count": len(rows), "truncated": truncated})
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from sqlalchemy import text
+from database import AsyncSessionLocal
+
+# Write-behind for reports.upvotes on very hot reports: votes themselves are
+# always written immediately, but once a report gets VOTE_HOT_THRESHOLD
+# votes within a second its counter deltas are summed in memory and
+# applied every VOTE_FLUSH_INTERVAL seconds in one UPDATE.
+VOTE_WRITE_BEHIND = os.getenv("VOTE_WRITE_BEHIND", "false").lower() == "true"
+VOTE_HOT_THRESHOLD = int(os.getenv("VOTE_HOT_THRESHOLD", 20))
+VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", 1.0))
+
+class VoteBuffer:
+    def __init__(self, hot_threshold: int, flush_interval: float):
+        self.hot_threshold = hot_threshold
+        self.flush_interval = flush_interval
+        self._pending = {}  # report_id -> summed upvote delta
+        self._rates = {}    # report_id -> (second, votes in that second)
+        self.flushes = 0
+        self.buffered_votes = 0
+
+    def is_hot(self, report_id: int) -> bool:
+        """Record a vote and say whether the report is hot right now."""
+        second = int(time.monotonic())
+        window, count = self._rates.get(report_id, (second, 0))
+        count = count + 1 if window == second else 1
+        self._rates[report_id] = (second, count)
+        return count >= self.hot_threshold
+
+    def add(self, report_id: int, delta: int):
+        self.buffered_votes += 1
+        if delta:
+            self._pending[report_id] = self._pending.get(report_id, 0) + delta
+
+    def pending(self, report_id: int) -> int:
+        return self._pending.get(report_id, 0)
+
+    async def flush(self):
+        """Apply all pending deltas with a single UPDATE."""
+        # Old rate windows are useless after a flush interval
+        now = int(time.monotonic())
+        self._rates = {k: v for k, v in self._rates.items() if v[0] >= now - 1}
+
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        UPDATE reports SET upvotes = GREATEST(COALESCE(reports.upvotes, 0) + d.delta, 0)
+                        FROM unnest(CAST(:ids AS integer[]), CAST(:deltas AS integer[])) AS d(id, delta)
+                        WHERE reports.id = d.id
+                    """),
+                    {"ids": list(pending), "deltas": list(pending.values())}
+                )
+                await db.commit()
+            self.flushes += 1
+        except Exception as e:
+            print(f"Vote counter flush failed: {e}")
+            # Keep the deltas for the next flush
+            for report_id, delta in pending.items():
+                self.add(report_id, delta)
+
+    async def run(self):
+        """Background flush loop (started from main.py)."""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_reports": len(self._pending),
+            "buffered_votes": self.buffered_votes,
+            "flushes": self.flushes,
+        }
+
+vote_buffer = VoteBuffer(VOTE_HOT_THRESHOLD, VOTE_FLUSH_INTERVAL)
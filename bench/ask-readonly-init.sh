@@ -0,0 +1,29 @@
+#!/bin/bash
+# Runs once, on a fresh data directory (docker-entrypoint-initdb.d): creates
+# the SELECT-only role /analytics/ask connects as (ASK_DATABASE_URL). The
+# tables don't exist yet, so an event trigger grants SELECT on each table in
+# ASK_ALLOWED_TABLES when the backend creates it.
+set -e
+
+ALLOWED="${ASK_ALLOWED_TABLES:-reports,departments,field_teams,report_daily_rollups,report_resolution_rollups,hotspot_clusters}"
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    CREATE ROLE ask_readonly WITH LOGIN PASSWORD '${ASK_READONLY_PASSWORD:-ask_readonly}';
+    ALTER ROLE ask_readonly SET default_transaction_read_only = on;
+
+    CREATE FUNCTION grant_ask_select() RETURNS event_trigger LANGUAGE plpgsql AS \$\$
+    DECLARE
+        obj record;
+    BEGIN
+        FOR obj IN SELECT * FROM pg_event_trigger_ddl_commands() WHERE command_tag = 'CREATE TABLE' LOOP
+            IF obj.schema_name = 'public'
+               AND split_part(obj.object_identity, '.', 2) = ANY (string_to_array('${ALLOWED}', ',')) THEN
+                EXECUTE format('GRANT SELECT ON %s TO ask_readonly', obj.object_identity);
+            END IF;
+        END LOOP;
+    END
+    \$\$;
+
+    CREATE EVENT TRIGGER grant_ask_select ON ddl_command_end
+        WHEN TAG IN ('CREATE TABLE') EXECUTE FUNCTION grant_ask_select();
+SQL
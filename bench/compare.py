@@ -0,0 +1,94 @@
+"""
+Compare two bench/run.py result files and flag regressions.
+
+    python bench/compare.py bench/results/baseline.json bench/results/candidate.json
+
+For every endpoint in both runs it reports the change in throughput,
+p50/p95/p99 latency, error rate and DB queries per request. A change is
+a regression when latency grows (or throughput drops) by more than
+--threshold and by more than --min-delta-ms, the error rate rises by
+more than --error-margin, or an endpoint runs more queries per request
+than --query-margin allows. Exits 1 if anything regressed, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_FIELDS = ["p50_ms", "p95_ms", "p99_ms"]
+CONFIG_FIELDS = ["concurrency", "duration_s", "mix", "users", "seed"]
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def pct_change(base: float, current: float) -> float:
+    if not base:
+        return 0.0 if not current else float("inf")
+    return (current - base) / base
+
+def compare_endpoint(base: dict, current: dict, args) -> list:
+    """(field, base, current, change, regressed) rows for one endpoint."""
+    rows = []
+
+    change = pct_change(base["throughput_rps"], current["throughput_rps"])
+    rows.append(("throughput_rps", base["throughput_rps"], current["throughput_rps"], change,
+                 change < -args.threshold))
+
+    for field in LATENCY_FIELDS:
+        change = pct_change(base[field], current[field])
+        regressed = change > args.threshold and current[field] - base[field] > args.min_delta_ms
+        rows.append((field, base[field], current[field], change, regressed))
+
+    change = current["error_rate"] - base["error_rate"]
+    rows.append(("error_rate", base["error_rate"], current["error_rate"], change, change > args.error_margin))
+
+    base_q, current_q = base.get("db_queries_per_request"), current.get("db_queries_per_request")
+    if base_q is not None and current_q is not None:
+        rows.append(("db_queries_per_request", base_q, current_q, pct_change(base_q, current_q),
+                     current_q - base_q > args.query_margin))
+    return rows
+
+def main(args) -> int:
+    base, current = load(args.baseline), load(args.current)
+    print(f"baseline: {args.baseline} ({base.get('label') or base['started_at']}, {(base['git'].get('commit') or '?')[:10]})")
+    print(f"current:  {args.current} ({current.get('label') or current['started_at']}, {(current['git'].get('commit') or '?')[:10]})")
+
+    for field in CONFIG_FIELDS:
+        if base["config"].get(field) != current["config"].get(field):
+            print(f"warning: runs differ in {field}: {base['config'].get(field)} vs {current['config'].get(field)}")
+
+    regressions = []
+    for name in sorted(set(base["endpoints"]) | set(current["endpoints"])):
+        if name not in base["endpoints"] or name not in current["endpoints"]:
+            print(f"\n{name}: only in {'current' if name in current['endpoints'] else 'baseline'} run, skipped")
+            continue
+        print(f"\n{name}")
+        for field, before, after, change, regressed in compare_endpoint(
+            base["endpoints"][name], current["endpoints"][name], args
+        ):
+            if field == "error_rate":
+                shown = f"{change * 100:+.2f} pts"
+            else:
+                shown = f"{change * 100:+.1f}%"
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {field:<24}{before:>12.2f}{after:>12.2f}{shown:>14}{flag}")
+            if regressed:
+                regressions.append((name, field))
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): " + ", ".join(f"{n}.{f}" for n, f in regressions))
+        return 1
+    print("\nNo regressions")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two load test result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative latency increase / throughput drop that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="Ignore latency increases smaller than this (noise on fast endpoints)")
+    parser.add_argument("--error-margin", type=float, default=0.01, help="Allowed error rate increase (fraction)")
+    parser.add_argument("--query-margin", type=float, default=0.5, help="Allowed increase in DB queries per request")
+    sys.exit(main(parser.parse_args()))
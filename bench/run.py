@@ -0,0 +1,398 @@
+"""
+Closed-loop load test for the backend API.
+
+    python bench/run.py --concurrency 32 --duration 60 --label baseline
+
+Each of --concurrency workers repeatedly picks an operation from the
+weighted --mix (creating reports, nearby listings, upvotes, analytics),
+sends it and records the latency. After a --warmup phase that isn't
+recorded, it measures for --duration seconds and writes per-endpoint
+throughput, p50/p95/p99 latency, error counts and the backend's DB
+queries per request (from the db_routes gauge on /metrics, diffed over
+the measured window) to a JSON file for bench/compare.py.
+
+Run it against the stack from bench/docker-compose.bench.yml after
+seeding, so the AI services are stubs and results are repeatable. The
+backend should run a single worker process: /metrics is per process.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+DEFAULT_MIX = "list_nearby=40,upvote=25,create_report=10,heatmap_tile=10,dashboard=8,trends=5,ask=2"
+
+# Route template each operation is counted under in the backend's db_routes gauge
+ENDPOINT_ROUTES = {
+    "create_report": "POST /reports/",
+    "list_nearby": "GET /reports/",
+    "upvote": "POST /reports/{report_id}/upvote",
+    "dashboard": "GET /analytics/dashboard",
+    "heatmap_tile": "GET /analytics/heatmap/{z}/{x}/{y}",
+    "trends": "GET /analytics/trend-analysis",
+    "ask": "POST /analytics/ask",
+}
+
+CATEGORIES = ["pothole", "street_light", "garbage", "flooding", "graffiti"]
+ISSUES = {
+    "pothole": ["Deep pothole in the road", "Potholes after the rain", "Road surface broken"],
+    "street_light": ["Street light not working", "Lamp post flickering", "Dark stretch at night"],
+    "garbage": ["Garbage not collected", "Trash pile on the corner", "Overflowing waste bin"],
+    "flooding": ["Water logging on the street", "Blocked drain flooding road", "Flooded underpass"],
+    "graffiti": ["Graffiti on the wall", "Vandalised bus stop", "Paint on public property"],
+}
+PLACES = ["near the school", "outside the hospital", "by the park", "at the junction", "opposite the market", "on the main road"]
+QUESTIONS = [
+    "How many open potholes are there?",
+    "Which categories have the most reports this month?",
+    "Show the 10 most upvoted pending reports",
+    "How many reports were resolved last week?",
+]
+NEARBY_RADII_M = [500, 1000, 2000, 5000]
+TILE_ZOOMS = [12, 13, 14, 15]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}  # endpoint -> [seconds]
+        self.statuses = {}  # endpoint -> {status: count}
+
+    def add(self, endpoint: str, seconds: float, status):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def is_error(status: str) -> bool:
+    return not status.isdigit() or int(status) >= 400
+
+class Context:
+    """Shared state for workers: auth tokens and known report ids."""
+
+    def __init__(self, args, client: httpx.AsyncClient):
+        self.args = args
+        self.client = client
+        self.admin_token = None
+        self.user_tokens = []
+        self.report_ids = []
+
+    def headers(self, token: str) -> dict:
+        return {"Authorization": f"Bearer {token}"}
+
+    def remember(self, report_id: int):
+        if len(self.report_ids) < 10_000:
+            self.report_ids.append(report_id)
+        else:
+            self.report_ids[random.randrange(len(self.report_ids))] = report_id
+
+    def random_point(self, rng: random.Random) -> tuple:
+        """Uniform point within --radius-km of the center."""
+        r = self.args.radius_km * 1000.0 * math.sqrt(rng.random())
+        theta = rng.uniform(0, 2 * math.pi)
+        lat = self.args.center_lat + r * math.sin(theta) / 110_540.0
+        lon = self.args.center_lon + r * math.cos(theta) / (111_320.0 * math.cos(math.radians(self.args.center_lat)))
+        return lat, lon
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def setup(ctx: Context):
+    """Log in the admin, register and log in bench users, and collect report ids."""
+    args = ctx.args
+    ctx.admin_token = await login(ctx.client, args.admin_email, args.password)
+
+    async def bench_user(i: int) -> str:
+        email = f"bench{i}@example.com"
+        response = await ctx.client.post(
+            "/auth/register", json={"email": email, "name": f"Bench {i}", "password": args.password}
+        )
+        if response.status_code not in (200, 400):  # 400: already registered by an earlier run
+            response.raise_for_status()
+        return await login(ctx.client, email, args.password)
+
+    # Sign-ins are bcrypt-bound; a few at a time stays under the backend's hashing limit
+    slots = asyncio.Semaphore(4)
+
+    async def limited(i: int) -> str:
+        async with slots:
+            return await bench_user(i)
+
+    ctx.user_tokens = list(await asyncio.gather(*(limited(i) for i in range(args.users))))
+    if not ctx.user_tokens:
+        ctx.user_tokens = [ctx.admin_token]
+
+    response = await ctx.client.get("/reports/", params={
+        "lat": args.center_lat, "lon": args.center_lon,
+        "radius": args.radius_km * 1000.0, "limit": 1000,
+    })
+    response.raise_for_status()
+    for report in response.json():
+        ctx.remember(report["id"])
+
+async def op_list_nearby(ctx: Context, rng: random.Random) -> httpx.Response:
+    lat, lon = ctx.random_point(rng)
+    response = await ctx.client.get("/reports/", params={
+        "lat": lat, "lon": lon, "radius": rng.choice(NEARBY_RADII_M),
+        "sort_by": rng.choice(["created_at", "created_at", "upvotes", "priority"]),
+        "limit": 50,
+    })
+    if response.status_code == 200:
+        for report in response.json()[:5]:
+            ctx.remember(report["id"])
+    return response
+
+async def op_create_report(ctx: Context, rng: random.Random) -> httpx.Response:
+    category = rng.choice(CATEGORIES)
+    issue = rng.choice(ISSUES[category])
+    place = rng.choice(PLACES)
+    lat, lon = ctx.random_point(rng)
+    response = await ctx.client.post("/reports/", headers=ctx.headers(rng.choice(ctx.user_tokens)), json={
+        "title": f"{issue} {place}",
+        "description": f"{issue} {place}. Reported during load test run {rng.randrange(1_000_000)}.",
+        "category": category,
+        "latitude": lat,
+        "longitude": lon,
+    })
+    if response.status_code == 200:
+        ctx.remember(response.json()["id"])
+    return response
+
+async def op_upvote(ctx: Context, rng: random.Random) -> httpx.Response:
+    report_id = rng.choice(ctx.report_ids)
+    return await ctx.client.post(
+        f"/reports/{report_id}/upvote", headers=ctx.headers(rng.choice(ctx.user_tokens))
+    )
+
+async def op_dashboard(ctx: Context, rng: random.Random) -> httpx.Response:
+    return await ctx.client.get("/analytics/dashboard", headers=ctx.headers(ctx.admin_token))
+
+async def op_heatmap_tile(ctx: Context, rng: random.Random) -> httpx.Response:
+    lat, lon = ctx.random_point(rng)
+    z = rng.choice(TILE_ZOOMS)
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return await ctx.client.get(f"/analytics/heatmap/{z}/{x}/{y}", headers=ctx.headers(ctx.admin_token))
+
+async def op_trends(ctx: Context, rng: random.Random) -> httpx.Response:
+    return await ctx.client.get(
+        "/analytics/trend-analysis", params={"days": rng.choice([7, 30, 90])},
+        headers=ctx.headers(ctx.admin_token)
+    )
+
+async def op_ask(ctx: Context, rng: random.Random) -> httpx.Response:
+    return await ctx.client.post(
+        "/analytics/ask", json={"question": rng.choice(QUESTIONS)}, headers=ctx.headers(ctx.admin_token)
+    )
+
+OPERATIONS = {
+    "list_nearby": op_list_nearby,
+    "create_report": op_create_report,
+    "upvote": op_upvote,
+    "dashboard": op_dashboard,
+    "heatmap_tile": op_heatmap_tile,
+    "trends": op_trends,
+    "ask": op_ask,
+}
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation in --mix: {name!r} (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+async def worker(ctx: Context, mix: dict, rng: random.Random, deadline: float, recorder: Recorder):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        if name == "upvote" and not ctx.report_ids:
+            name = "create_report"
+        started = time.perf_counter()
+        try:
+            response = await OPERATIONS[name](ctx, rng)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = f"error:{type(e).__name__}"
+        recorder.add(name, time.perf_counter() - started, status)
+
+async def run_phase(ctx: Context, mix: dict, seconds: float, seed: int) -> tuple:
+    recorder = Recorder()
+    deadline = time.monotonic() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(ctx, mix, random.Random(seed * 1_000 + i), deadline, recorder)
+        for i in range(ctx.args.concurrency)
+    ))
+    return recorder, time.perf_counter() - started
+
+async def server_metrics(client: httpx.AsyncClient) -> dict:
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    return response.json()
+
+def db_route_deltas(before: dict, after: dict) -> dict:
+    """Per-route queries and DB time over the window between two /metrics snapshots."""
+    before_routes = before.get("gauges", {}).get("db_routes", {})
+    deltas = {}
+    for route, stats in after.get("gauges", {}).get("db_routes", {}).items():
+        prev = before_routes.get(route, {"requests": 0, "queries": 0, "db_ms_per_request": 0.0})
+        requests = stats["requests"] - prev["requests"]
+        if requests <= 0:
+            continue
+        db_ms = stats["db_ms_per_request"] * stats["requests"] - prev["db_ms_per_request"] * prev["requests"]
+        deltas[route] = {
+            "requests": requests,
+            "queries_per_request": (stats["queries"] - prev["queries"]) / requests,
+            "db_ms_per_request": db_ms / requests,
+        }
+    return deltas
+
+def summarize(recorder: Recorder, elapsed: float, db_routes: dict) -> dict:
+    endpoints = {}
+    for name, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        statuses = recorder.statuses[name]
+        errors = sum(count for status, count in statuses.items() if is_error(status))
+        db = db_routes.get(ENDPOINT_ROUTES[name], {})
+        endpoints[name] = {
+            "route": ENDPOINT_ROUTES[name],
+            "requests": len(latencies),
+            "errors": errors,
+            "error_rate": errors / len(latencies),
+            "throughput_rps": len(latencies) / elapsed,
+            "mean_ms": sum(latencies) / len(latencies) * 1000.0,
+            "p50_ms": percentile(latencies, 50) * 1000.0,
+            "p95_ms": percentile(latencies, 95) * 1000.0,
+            "p99_ms": percentile(latencies, 99) * 1000.0,
+            "max_ms": latencies[-1] * 1000.0,
+            "db_queries_per_request": db.get("queries_per_request"),
+            "db_ms_per_request": db.get("db_ms_per_request"),
+            "statuses": statuses,
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    all_latencies = sorted(s for latencies in recorder.latencies.values() for s in latencies)
+    totals = {
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": total / elapsed,
+        "p50_ms": percentile(all_latencies, 50) * 1000.0,
+        "p95_ms": percentile(all_latencies, 95) * 1000.0,
+        "p99_ms": percentile(all_latencies, 99) * 1000.0,
+    }
+    return {"endpoints": endpoints, "totals": totals}
+
+def git_revision() -> dict:
+    def git(*cmd):
+        return subprocess.run(
+            ["git", *cmd], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+def print_table(result: dict):
+    print(f"{'endpoint':<15}{'reqs':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'q/req':>7}")
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["totals"])]
+    for name, e in rows:
+        queries = e.get("db_queries_per_request")
+        print(f"{name:<15}{e['requests']:>8}{e['throughput_rps']:>9.1f}{e['p50_ms']:>9.1f}"
+              f"{e['p95_ms']:>9.1f}{e['p99_ms']:>9.1f}{e['errors']:>8}"
+              f"{'' if queries is None else format(queries, '.1f'):>7}")
+
+async def main(args):
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        ctx = Context(args, client)
+        await setup(ctx)
+        print(f"Logged in {len(ctx.user_tokens)} users, {len(ctx.report_ids)} reports to vote on")
+
+        if args.warmup > 0:
+            print(f"Warming up for {args.warmup:g}s...")
+            await run_phase(ctx, mix, args.warmup, args.seed + 1)
+
+        before = await server_metrics(client)
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        print(f"Measuring for {args.duration:g}s at concurrency {args.concurrency}...")
+        recorder, elapsed = await run_phase(ctx, mix, args.duration, args.seed)
+        after = await server_metrics(client)
+
+    db_routes = db_route_deltas(before, after)
+    result = {
+        "label": args.label,
+        "started_at": started_at.isoformat(),
+        "elapsed_s": elapsed,
+        "git": git_revision(),
+        "host": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": mix,
+            "users": args.users,
+            "seed": args.seed,
+            "center": [args.center_lat, args.center_lon],
+            "radius_km": args.radius_km,
+        },
+        **summarize(recorder, elapsed, db_routes),
+        "db_routes": db_routes,
+        "server_gauges": {k: v for k, v in after.get("gauges", {}).items() if k != "db_routes"},
+    }
+
+    out = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = args.label or started_at.strftime("%Y%m%dT%H%M%SZ")
+        out = os.path.join(RESULTS_DIR, f"{name}.json")
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print_table(result)
+    print(f"Results written to {out}")
+    return 1 if result["totals"]["errors"] and args.fail_on_errors else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the backend API and record per-endpoint results")
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent closed-loop workers")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="Unrecorded seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operations, e.g. list_nearby=3,upvote=1")
+    parser.add_argument("--users", type=int, default=20, help="Bench citizens to register and vote/report as")
+    parser.add_argument("--admin-email", default="admin@example.com")
+    parser.add_argument("--password", default="password123", help="Password of the admin and bench users")
+    parser.add_argument("--center-lat", type=float, default=12.9716)
+    parser.add_argument("--center-lon", type=float, default=77.5946)
+    parser.add_argument("--radius-km", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (s)")
+    parser.add_argument("--label", default=None, help="Names the results file (default: start time)")
+    parser.add_argument("--out", default=None, help="Results path (default: bench/results/<label>.json)")
+    parser.add_argument("--fail-on-errors", action="store_true", help="Exit 1 if any request failed")
+    sys.exit(asyncio.run(main(parser.parse_args())))
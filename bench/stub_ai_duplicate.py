@@ -0,0 +1,186 @@
+"""
+Stand-in for the ai-duplicate service in load tests.
+
+    uvicorn stub_ai_duplicate:app --port 9001
+
+Serves the same endpoints and response shapes without loading any model:
+categories come from keywords in the text, embeddings are unit vectors
+seeded by the text's hash (identical text gives identical vectors), and
+every call waits STUB_LATENCY_MS to stand in for inference time.
+"""
+import asyncio
+import base64
+import hashlib
+import math
+import os
+import random
+import struct
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+from typing import List, Optional
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", 25))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 384))
+
+CATEGORIES = ["pothole", "garbage", "street_light", "graffiti", "flooding", "noise_complaint", "broken_infrastructure", "other"]
+CATEGORY_KEYWORDS = {
+    "pothole": ["pothole", "road", "crater"],
+    "garbage": ["garbage", "trash", "waste", "dump"],
+    "street_light": ["light", "lamp", "dark"],
+    "graffiti": ["graffiti", "paint", "vandal"],
+    "flooding": ["flood", "water", "drain"],
+    "noise_complaint": ["noise", "loud"],
+    "broken_infrastructure": ["broken", "bridge", "pipe"],
+}
+SEVERITY_KEYWORDS = {
+    "critical": ["danger", "accident", "collapse", "fire"],
+    "high": ["urgent", "large", "deep", "blocked"],
+}
+SENSITIVE_WORDS = ["school", "college", "hospital", "clinic", "park", "playground"]
+
+app = FastAPI(title="Stub AI Duplicate Service")
+
+calls = {}
+
+def _count(endpoint: str):
+    calls[endpoint] = calls.get(endpoint, 0) + 1
+
+async def _latency():
+    if STUB_LATENCY_MS > 0:
+        await asyncio.sleep(STUB_LATENCY_MS / 1000.0)
+
+def _embedding(text: str) -> List[float]:
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(EMBEDDING_DIM)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def _category(text: str) -> dict:
+    lowered = text.lower()
+    label = next(
+        (category for category, words in CATEGORY_KEYWORDS.items() if any(w in lowered for w in words)),
+        "other"
+    )
+    rest = (1.0 - 0.8) / (len(CATEGORIES) - 1)
+    return {
+        "category": label,
+        "confidence": 0.8,
+        "all_scores": {c: 0.8 if c == label else rest for c in CATEGORIES},
+    }
+
+def _severity(text: str) -> dict:
+    lowered = text.lower()
+    for severity, words in SEVERITY_KEYWORDS.items():
+        if any(w in lowered for w in words):
+            return {"severity": severity, "confidence": 0.7}
+    return {"severity": "medium", "confidence": 0.5}
+
+def _priority(text: str, upvotes: int) -> dict:
+    lowered = text.lower()
+    location_priority = 1.0 if any(w in lowered for w in SENSITIVE_WORDS) else 0.0
+    content_priority = 0.8 if _severity(text)["severity"] == "critical" else 0.0
+    text_score = location_priority * 0.4 + content_priority * 0.3
+    score = text_score + min(upvotes / 20.0, 1.0) * 0.3
+    if score >= 0.7:
+        level = "critical"
+    elif score >= 0.5:
+        level = "high"
+    elif score >= 0.3:
+        level = "medium"
+    else:
+        level = "low"
+    return {"priority": level, "confidence": score, "factors": {"text_score": text_score, "total_score": score}}
+
+class TextRequest(BaseModel):
+    text: str
+
+class EmbedBatchRequest(BaseModel):
+    texts: List[str]
+
+class PriorityRequest(BaseModel):
+    text: str
+    latitude: float
+    longitude: float
+    upvotes: int = 0
+
+class Candidate(BaseModel):
+    id: int
+    text: Optional[str] = None
+    embedding: Optional[List[float]] = None
+
+class DuplicateCheckRequest(BaseModel):
+    new_report_text: Optional[str] = None
+    new_report_embedding: Optional[List[float]] = None
+    candidates: List[Candidate]
+
+@app.get("/")
+def root():
+    return {"message": "stub ai-duplicate service is running"}
+
+@app.get("/metrics")
+def metrics():
+    return {"stub": {"latency_ms": STUB_LATENCY_MS, "calls": calls}}
+
+@app.post("/embed")
+async def embed(request: TextRequest):
+    _count("embed")
+    await _latency()
+    return {"embedding": _embedding(request.text)}
+
+@app.post("/embed_batch")
+async def embed_batch(request: EmbedBatchRequest):
+    _count("embed_batch")
+    await _latency()
+    data = b"".join(struct.pack(f"<{EMBEDDING_DIM}f", *_embedding(text)) for text in request.texts)
+    return {
+        "model": EMBEDDING_MODEL,
+        "count": len(request.texts),
+        "dim": EMBEDDING_DIM,
+        "dtype": "float32",
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+@app.post("/check_duplicates")
+async def check_duplicates(request: DuplicateCheckRequest):
+    _count("check_duplicates")
+    await _latency()
+    target = request.new_report_embedding or _embedding(request.new_report_text or "")
+    matches = []
+    for candidate in request.candidates:
+        vector = candidate.embedding or _embedding(candidate.text or "")
+        score = sum(a * b for a, b in zip(target, vector))
+        if score > 0.8:
+            matches.append({"id": candidate.id, "score": score})
+    return {"matches": matches}
+
+@app.post("/predict_category")
+async def predict_category(request: TextRequest):
+    _count("predict_category")
+    await _latency()
+    return _category(request.text)
+
+@app.post("/predict_severity")
+async def predict_severity(request: TextRequest):
+    _count("predict_severity")
+    await _latency()
+    return _severity(request.text)
+
+@app.post("/predict_priority")
+async def predict_priority(request: PriorityRequest):
+    _count("predict_priority")
+    await _latency()
+    return _priority(request.text, request.upvotes)
+
+@app.post("/analyze")
+async def analyze(request: PriorityRequest):
+    _count("analyze")
+    await _latency()
+    return {
+        "category": _category(request.text),
+        "severity": _severity(request.text),
+        "priority": _priority(request.text, request.upvotes),
+        "embedding": _embedding(request.text),
+    }
@@ -4,4 +4,18 @@ const api = axios.create({
     baseURL: import.meta.env.VITE_API_URL || 'http://localhost:8000',
 });
 
+// GET /reports/ returns one page at a time; follow X-Next-Cursor until the last page
+export const fetchAllReports = async (params = {}) => {
+    const reports = [];
+    let cursor;
+    do {
+        const response = await api.get('/reports/', {
+            params: { ...params, limit: 1000, ...(cursor ? { cursor } : {}) }
+        });
+        reports.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return reports;
+};
+
 export default api;
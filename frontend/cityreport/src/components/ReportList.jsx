@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import api from '../api';
+import { fetchAllReports } from '../api';
 
 function ReportList() {
     const [reports, setReports] = useState([]);
@@ -7,8 +7,7 @@ function ReportList() {
     useEffect(() => {
         const fetchReports = async () => {
             try {
-                const response = await api.get('/reports/');
-                setReports(response.data);
+                setReports(await fetchAllReports());
             } catch (error) {
                 console.error('Error fetching reports:', error);
             }
@@ -32,19 +32,13 @@ const Analytics = () => {
         try {
             setLoading(true);
 
-            // Fetch all analytics data
-            const [summaryRes, statusRes, priorityRes, timeRes, heatmapRes] = await Promise.all([
-                api.get('/analytics/summary'),
-                api.get('/analytics/status-distribution'),
-                api.get('/analytics/priority-distribution'),
-                api.get('/analytics/time-bound-stats'),
-                api.get('/analytics/heatmap-data')
-            ]);
+            // Fetch all analytics data in one request
+            const { data } = await api.get('/analytics/dashboard');
 
-            setSummary(summaryRes.data);
+            setSummary(data.summary);
 
             // Transform status distribution for charts
-            const statusData = Object.entries(statusRes.data.status_distribution).map(([key, value]) => ({
+            const statusData = Object.entries(data.status_distribution).map(([key, value]) => ({
                 name: key.replace('_', ' ').toUpperCase(),
                 value,
                 color: COLORS[key] || '#6B7280'
@@ -52,7 +46,7 @@ const Analytics = () => {
             setStatusDist(statusData);
 
             // Transform priority distribution
-            const priorityData = Object.entries(priorityRes.data.priority_distribution).map(([key, value]) => ({
+            const priorityData = Object.entries(data.priority_distribution).map(([key, value]) => ({
                 name: key.toUpperCase(),
                 value,
                 color: COLORS[key] || '#6B7280'
@@ -61,14 +55,14 @@ const Analytics = () => {
 
             // Transform time-bound stats
             const timeData = [
-                { name: '< 24 Hours', value: timeRes.data.time_bound_stats.under_24h || 0 },
-                { name: '< 7 Days', value: timeRes.data.time_bound_stats.under_7d || 0 },
-                { name: '< 30 Days', value: timeRes.data.time_bound_stats.under_30d || 0 },
-                { name: '> 30 Days', value: timeRes.data.time_bound_stats.over_30d || 0 }
+                { name: '< 24 Hours', value: data.time_bound_stats.under_24h || 0 },
+                { name: '< 7 Days', value: data.time_bound_stats.under_7d || 0 },
+                { name: '< 30 Days', value: data.time_bound_stats.under_30d || 0 },
+                { name: '> 30 Days', value: data.time_bound_stats.over_30d || 0 }
             ];
             setTimeBoundStats(timeData);
 
-            setHeatmapData(heatmapRes.data.heatmap_data || []);
+            setHeatmapData(data.heatmap_data || []);
         } catch (err) {
             console.error('Error fetching analytics:', err);
         } finally {
@@ -6,7 +6,7 @@ import FilterBar from '../../components/shared/FilterBar';
 import ReportCard from '../../components/citizen/ReportCard';
 import Button from '../../components/shared/Button';
 import Card from '../../components/shared/Card';
-import api from '../../api';
+import api, { fetchAllReports } from '../../api';
 
 const CitizenDashboard = () => {
     const navigate = useNavigate();
@@ -23,8 +23,7 @@ const CitizenDashboard = () => {
     const fetchReports = async () => {
         try {
             setLoading(true);
-            const response = await api.get('/reports/');
-            setReports(response.data);
+            setReports(await fetchAllReports());
             setError('');
         } catch (err) {
             console.error('Error fetching reports:', err);
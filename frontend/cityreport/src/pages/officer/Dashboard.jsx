@@ -5,7 +5,7 @@ import Navbar from '../../components/shared/Navbar';
 import Card from '../../components/shared/Card';
 import Badge from '../../components/shared/Badge';
 import Button from '../../components/shared/Button';
-import api from '../../api';
+import api, { fetchAllReports } from '../../api';
 import './OfficerDashboard.css';
 
 const OfficerDashboard = () => {
@@ -15,6 +15,7 @@ const OfficerDashboard = () => {
     const [filter, setFilter] = useState('all');
     const [priorityFilter, setPriorityFilter] = useState('');
     const [categoryFilter, setCategoryFilter] = useState('');
+    const [stats, setStats] = useState({ pending: 0, inProgress: 0, resolved: 0, critical: 0 });
 
     useEffect(() => {
         fetchReports();
@@ -38,8 +39,17 @@ const OfficerDashboard = () => {
                 params.category = categoryFilter;
             }
 
-            const response = await api.get('/reports/', { params });
-            setReports(response.data);
+            const [allReports, summary] = await Promise.all([
+                fetchAllReports(params),
+                api.get('/analytics/summary')
+            ]);
+            setReports(allReports);
+            setStats({
+                pending: summary.data.pending_reports,
+                inProgress: summary.data.in_progress_reports,
+                resolved: summary.data.resolved_reports,
+                critical: summary.data.critical_reports
+            });
         } catch (err) {
             console.error('Error fetching reports:', err);
         } finally {
@@ -47,13 +57,6 @@ const OfficerDashboard = () => {
         }
     };
 
-    const stats = {
-        pending: reports.filter(r => r.status === 'pending').length,
-        inProgress: reports.filter(r => r.status === 'in_progress').length,
-        resolved: reports.filter(r => r.status === 'resolved' || r.status === 'closed').length,
-        critical: reports.filter(r => r.priority === 'critical').length
-    };
-
     const getStatusVariant = (status) => {
         switch (status.toLowerCase()) {
             case 'resolved':
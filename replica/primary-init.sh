@@ -0,0 +1,10 @@
+#!/bin/bash
+# Runs once, on a fresh primary data directory (docker-entrypoint-initdb.d):
+# creates the streaming replication role and lets it connect.
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD '${REPLICATION_PASSWORD:-replicator}';
+SQL
+
+echo "host replication replicator all md5" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,20 @@
+#!/bin/bash
+# Hot standby for local testing: clone the primary with pg_basebackup on
+# first start, then run postgres in recovery (streaming replication).
+set -e
+
+export PGDATA=/var/lib/postgresql/data
+export PGPASSWORD="${REPLICATION_PASSWORD:-replicator}"
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_isready -h "$PRIMARY_HOST" -p 5432; do
+        echo "Waiting for primary at $PRIMARY_HOST..."
+        sleep 1
+    done
+    rm -rf "$PGDATA"/*
+    # -R writes standby.signal and primary_conninfo
+    pg_basebackup -h "$PRIMARY_HOST" -U replicator -D "$PGDATA" -X stream -R -P
+    chmod 700 "$PGDATA"
+fi
+
+exec postgres -c hot_standby=on